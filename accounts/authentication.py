@@ -0,0 +1,112 @@
+"""JWT-аутентификация с кешированием пользователя.
+
+В кеше Django по ключу (id, версия токенов) хранятся только поля
+``CACHED_FIELDS``; пользователь загружается из базы не чаще раза в
+``AUTH_USER_CACHE_TTL`` секунд, остальные поля модели читаются из базы при
+первом обращении. Запросы на изменение (не GET/HEAD/OPTIONS) и запросы
+администраторов всегда проверяют пользователя по базе: удалённый,
+отключённый или лишённый прав пользователь не выполнит их по данным кеша
+другого воркера. Изменение или удаление пользователя сбрасывает запись (см.
+signals), а увеличение ``token_version`` делает недействительными все ранее
+выданные токены.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+TOKEN_VERSION_CLAIM = "ver"
+# Поля пользователя в кеше: права и версия токенов, имя — для журналов и путей
+CACHED_FIELDS = ("id", "username", "token_version", "is_active", "is_staff", "is_admin")
+
+
+def user_cache_key(user_id, version):
+    return f"accounts:auth:{user_id}:{version}"
+
+
+def invalidate_user_cache(user):
+    # Запись с предыдущей версией тоже удаляется: версия могла только что вырасти
+    cache.delete_many([
+        user_cache_key(user.pk, user.token_version),
+        user_cache_key(user.pk, user.token_version - 1),
+    ])
+
+
+class VersionedRefreshToken(RefreshToken):
+    """Refresh-токен с версией токенов пользователя; access-токен наследует её."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+class VersionedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = VersionedRefreshToken
+
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Не обновляет токены, выданные до отзыва (устаревшая версия)."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        from .models import User
+
+        current = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}
+        ).values_list("token_version", flat=True).first()
+        if current is None or current != refresh.get(TOKEN_VERSION_CLAIM, 0):
+            raise InvalidToken("Токен отозван")
+        return super().validate(attrs)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, который не читает пользователя из базы на каждый запрос чтения."""
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None:
+            return None
+        user, validated_token = result
+        if request.method not in SAFE_METHODS or user.is_admin or user.is_staff:
+            # Изменения и права администратора — только по свежим данным из базы
+            user = self._load_user(validated_token)
+        return user, validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Токен не содержит идентификатора пользователя") from None
+        version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+
+        fields = cache.get(user_cache_key(user_id, version))
+        if fields is not None:
+            return _cached_user(fields)
+        return self._load_user(validated_token)
+
+    def _load_user(self, validated_token):
+        version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+        user = super().get_user(validated_token)
+        if user.token_version != version:
+            raise AuthenticationFailed("Токен отозван", code="token_revoked")
+        cache.set(
+            user_cache_key(user.pk, version),
+            {name: getattr(user, name) for name in CACHED_FIELDS},
+            settings.AUTH_USER_CACHE_TTL,
+        )
+        return user
+
+
+def _cached_user(fields):
+    """Пользователь из полей кеша; остальные поля модели загружаются отложенно."""
+    from .models import User
+
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in fields]
+    return User.from_db(DEFAULT_DB_ALIAS, names, [fields[name] for name in names])
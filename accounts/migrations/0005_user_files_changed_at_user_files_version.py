@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_user_full_name_alter_user_storage_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='files_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='files_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_files_changed_at_user_files_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='bytes_used',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='quota_bytes',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -6,6 +6,21 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     is_admin = models.BooleanField(default=False)
     storage_path = models.CharField(max_length=500, blank=True)
+    # Версия списка файлов пользователя: растёт при любом изменении, для ETag листинга
+    files_version = models.PositiveBigIntegerField(default=0)
+    files_changed_at = models.DateTimeField(null=True, blank=True)
+    # Квота (байты; пусто — FILES_USER_QUOTA из настроек) и счётчики занятого места,
+    # которые поддерживаются при загрузке и удалении файлов
+    quota_bytes = models.PositiveBigIntegerField(null=True, blank=True)
+    bytes_used = models.PositiveBigIntegerField(default=0)
+    file_count = models.PositiveIntegerField(default=0)
+    # Версия JWT-токенов: увеличение отзывает все выданные токены пользователя
+    token_version = models.PositiveIntegerField(default=0)
+
+    def revoke_tokens(self):
+        """Делает недействительными все выданные пользователю токены."""
+        self.token_version += 1
+        self.save(update_fields=["token_version"])
 
     def save(self, *args, **kwargs):
         if not self.storage_path:
@@ -15,7 +15,11 @@ class UserSerializer(serializers.ModelSerializer):
             "password",
             "is_admin",
             "storage_path",
+            "quota_bytes",
+            "bytes_used",
+            "file_count",
         ]
+        read_only_fields = ["bytes_used", "file_count"]
         extra_kwargs = {"password": {"write_only": True}}
 
     def validate_username(self, value):
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .authentication import CachedJWTAuthentication
+from .models import User
+
+
+def user_reads(queries):
+    return [q["sql"] for q in queries if q["sql"].startswith("SELECT") and 'FROM "accounts_user"' in q["sql"]]
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username="alice", password="Qwe123!", email="alice@test.com")
+        self.client = APIClient()
+        self.refresh, self.access = self.login("alice")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def login(self, username):
+        response = APIClient().post("/api/token/", {"username": username, "password": "Qwe123!"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data["refresh"], response.data["access"]
+
+    def test_reads_use_cached_user(self):
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.client.get("/api/accounts/users/").status_code, 403)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.client.get("/api/accounts/users/").status_code, 403)
+        self.assertEqual(len(user_reads(first)), 1)
+        self.assertEqual(user_reads(second), [])
+
+    def test_cached_user_defers_other_fields(self):
+        authentication = CachedJWTAuthentication()
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        authentication.authenticate(request)
+        user, _ = authentication.authenticate(request)
+        self.assertIn("password", user.get_deferred_fields())
+        self.assertEqual((user.pk, user.username), (self.user.pk, "alice"))
+        # Отложенное поле дочитывается из базы при обращении
+        self.assertEqual(user.email, "alice@test.com")
+
+    def test_writes_recheck_user_in_database(self):
+        self.client.get("/api/files/")
+        # Изменение мимо save() не сбрасывает кеш, как в другом воркере с локальным кешем
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get("/api/files/").status_code, 200)
+        response = self.client.post("/api/files/upload/", {}, format="multipart")
+        self.assertEqual(response.status_code, 401)
+
+    def test_saving_user_drops_cache(self):
+        self.client.get("/api/files/")
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/files/").status_code, 401)
+
+    def test_revoked_tokens(self):
+        self.client.get("/api/files/")
+        self.user.revoke_tokens()
+        self.assertEqual(self.client.get("/api/files/").status_code, 401)
+        response = APIClient().post("/api/token/refresh/", {"refresh": self.refresh}, format="json")
+        self.assertEqual(response.status_code, 401)
+        # Новый вход выдаёт токены новой версии
+        _, access = self.login("alice")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(self.client.get("/api/files/").status_code, 200)
+
+    def test_admin_rights_are_read_from_database(self):
+        User.objects.filter(pk=self.user.pk).update(is_admin=True)
+        _, access = self.login("alice")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(self.client.get("/api/accounts/users/").status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_admin=False)
+        self.assertEqual(self.client.get("/api/accounts/users/").status_code, 403)
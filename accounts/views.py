@@ -7,8 +7,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from .authentication import VersionedRefreshToken
 from .serializers import UserSerializer
 
 User = get_user_model()
@@ -82,7 +82,7 @@ class LoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        refresh = RefreshToken.for_user(user)
+        refresh = VersionedRefreshToken.for_user(user)
         return Response(
             {   
                 "refresh": str(refresh), 
@@ -134,6 +134,10 @@ class UserListView(APIView):
                 "email": u.email,
                 "is_admin": u.is_admin,
                 "storage_path": u.storage_path,
+                "quota_bytes": u.quota_bytes,
+                "bytes_used": u.bytes_used,
+                "file_count": u.file_count,
+                "last_activity": u.files_changed_at,
             }
             for u in users
         ]
@@ -154,6 +158,9 @@ class ToggleAdminView(APIView):
 
         user = get_object_or_404(User, id=user_id)
         user.is_admin = not user.is_admin
+        if not user.is_admin:
+            # Токены, выданные администратору, больше не действуют
+            user.token_version += 1
         user.save()
         serializer = UserSerializer(user)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -170,11 +177,30 @@ class UserDetailView(APIView):
 
         user = get_object_or_404(User, id=user_id)
         is_admin = request.data.get("is_admin")
-        if is_admin is None:
-            return Response({"error": "Не указано поле is_admin"}, status=status.HTTP_400_BAD_REQUEST)
-
-        user.is_admin = bool(is_admin)
-        user.save(update_fields=["is_admin"])
+        if is_admin is None and "quota_bytes" not in request.data:
+            return Response({"error": "Не указано поле is_admin или quota_bytes"}, status=status.HTTP_400_BAD_REQUEST)
+
+        updated = []
+        if is_admin is not None:
+            if user.is_admin and not bool(is_admin):
+                # Токены, выданные администратору, больше не действуют
+                user.token_version += 1
+                updated.append("token_version")
+            user.is_admin = bool(is_admin)
+            updated.append("is_admin")
+        if "quota_bytes" in request.data:
+            # null — квота по умолчанию из настроек
+            quota_bytes = request.data.get("quota_bytes")
+            if quota_bytes is not None:
+                try:
+                    quota_bytes = int(quota_bytes)
+                except (TypeError, ValueError):
+                    quota_bytes = -1
+                if quota_bytes < 0:
+                    return Response({"error": "Некорректное значение quota_bytes"}, status=status.HTTP_400_BAD_REQUEST)
+            user.quota_bytes = quota_bytes
+            updated.append("quota_bytes")
+        user.save(update_fields=updated)
         return Response(UserSerializer(user).data, status=status.HTTP_200_OK)
 
     def delete(self, request, user_id):
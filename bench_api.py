@@ -0,0 +1,452 @@
+"""Нагрузочный бенчмарк REST API.
+
+По умолчанию скрипт поднимает приложение в этом процессе (многопоточный
+WSGI-сервер Django на свободном порту) на временной тестовой базе: SQLite в
+файле при DB_ENGINE=sqlite или тестовая база Postgres из настроек. С --url
+нагружается уже запущенный сервер (gunicorn, uvicorn за nginx и т. п.).
+
+Сценарий: регистрация --users пользователей, загрузка каждому --files файлов
+размеров из --sizes, затем по очереди нагрузки upload, download, list,
+rename, share и shared_download — каждая --duration секунд в --concurrency
+потоков. Для каждого эндпоинта печатаются пропускная способность и задержки
+p50/p95/p99, результаты сохраняются в JSON (--output); --compare сравнивает
+с сохранёнными результатами прошлого запуска.
+
+    DB_ENGINE=sqlite python bench_api.py --users 4 --concurrency 8 --duration 10
+    python bench_api.py --url http://127.0.0.1:8000 --output bench-main.json
+    DB_ENGINE=sqlite python bench_api.py --compare bench-main.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import secrets
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+WORKLOADS = ("upload", "download", "list", "rename", "share", "shared_download")
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    if value and value[-1] in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def make_payload(size: int) -> bytes:
+    # Текст: проходит проверку типа и MIME при любых настройках загрузки
+    return os.urandom(size // 2 + 1).hex()[:size].encode()
+
+
+class HttpError(Exception):
+    pass
+
+
+class Client:
+    """HTTP-клиент одного потока: постоянное соединение, переподключение при обрыве."""
+
+    def __init__(self, base_url: str, token: str = ""):
+        parts = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.token = token
+        self.connection = None
+
+    def request(self, method: str, path: str, body: bytes = None, headers=None):
+        """Выполняет запрос и читает тело целиком. Возвращает (статус, тело)."""
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self.connection_class(self.netloc, timeout=60)
+            try:
+                self.connection.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                self.close()
+            return response.status, data
+        raise HttpError(f"{method} {path}: no response")
+
+    def json(self, method: str, path: str, payload=None, expected=(200,)):
+        body = json.dumps(payload).encode() if payload is not None else None
+        status, data = self.request(method, path, body, {"Content-Type": "application/json"} if body else None)
+        if status not in expected:
+            raise HttpError(f"{method} {path}: {status} {data[:200]!r}")
+        return json.loads(data) if data else None
+
+    def upload(self, filename: str, content: bytes):
+        boundary = uuid.uuid4().hex
+        body = b"".join([
+            f"--{boundary}\r\n".encode(),
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'.encode(),
+            b"Content-Type: text/plain\r\n\r\n",
+            content,
+            f"\r\n--{boundary}--\r\n".encode(),
+        ])
+        return self.request(
+            "POST", "/api/files/upload/", body,
+            {"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Account:
+    """Пользователь бенчмарка: токен и его файлы (id -> размер)."""
+
+    def __init__(self, username: str, token: str):
+        self.username = username
+        self.token = token
+        self.files = {}
+        self.share_urls = []
+        self.lock = threading.Lock()
+
+    def add_file(self, file_id: int, size: int):
+        with self.lock:
+            self.files[file_id] = size
+
+    def random_file(self, rng: random.Random):
+        with self.lock:
+            return rng.choice(list(self.files))
+
+
+def seed(base_url: str, users: int, files: int, payloads, share_links: int):
+    """Регистрирует пользователей и загружает им файлы через API."""
+    run_id = secrets.token_hex(3)
+    anonymous = Client(base_url)
+    accounts = []
+    for index in range(users):
+        username = f"bench_{run_id}_{index}"
+        password = secrets.token_urlsafe(12)
+        anonymous.json(
+            "POST", "/api/accounts/register/",
+            {"username": username, "email": f"{username}@bench.local", "password": password, "full_name": "Bench"},
+            expected=(200, 201),
+        )
+        token = anonymous.json("POST", "/api/accounts/login/", {"username": username, "password": password})["access"]
+        account = Account(username, token)
+        client = Client(base_url, token)
+        for number in range(files):
+            payload = payloads[number % len(payloads)]
+            status, data = client.upload(f"seed_{number}.txt", payload)
+            if status != 201:
+                raise HttpError(f"seed upload: {status} {data[:200]!r}")
+            account.add_file(json.loads(data)["id"], len(payload))
+        for file_id in list(account.files)[:share_links]:
+            account.share_urls.append(urlsplit(client.json("POST", f"/api/files/shared/{file_id}/", {})["share_url"]).path)
+        client.close()
+        accounts.append(account)
+    anonymous.close()
+    return accounts
+
+
+def make_operation(name: str, base_url: str, account: Account, payloads, rng: random.Random):
+    """Функция одного запроса нагрузки name. Возвращает (статус, байт передано)."""
+    client = Client(base_url, account.token)
+    anonymous = Client(base_url)
+
+    def upload():
+        payload = rng.choice(payloads)
+        status, data = client.upload(f"bench_{rng.getrandbits(32):08x}.txt", payload)
+        if status == 201:
+            account.add_file(json.loads(data)["id"], len(payload))
+        return status, len(payload)
+
+    def download():
+        status, data = client.request("GET", f"/api/files/{account.random_file(rng)}/download/")
+        return status, len(data)
+
+    def listing():
+        status, data = client.request("GET", "/api/files/?" + urlencode({"limit": 50}))
+        return status, len(data)
+
+    def rename():
+        body = json.dumps({"name": f"renamed_{rng.getrandbits(32):08x}.txt"}).encode()
+        status, data = client.request(
+            "POST", f"/api/files/{account.random_file(rng)}/rename/", body, {"Content-Type": "application/json"}
+        )
+        return status, len(data)
+
+    def share():
+        status, data = client.request(
+            "POST", f"/api/files/shared/{account.random_file(rng)}/", b"{}", {"Content-Type": "application/json"}
+        )
+        return status, len(data)
+
+    def shared_download():
+        status, data = anonymous.request("GET", rng.choice(account.share_urls))
+        return status, len(data)
+
+    operations = {
+        "upload": upload,
+        "download": download,
+        "list": listing,
+        "rename": rename,
+        "share": share,
+        "shared_download": shared_download,
+    }
+    return operations[name], (client, anonymous)
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def summarize(latencies, errors, transferred, elapsed):
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0,
+        "mb_per_s": round(transferred / elapsed / 1024 ** 2, 2) if elapsed else 0,
+        "mean_ms": _ms(statistics.fmean(ordered)) if ordered else None,
+        "p50_ms": _ms(percentile(ordered, 0.50)),
+        "p95_ms": _ms(percentile(ordered, 0.95)),
+        "p99_ms": _ms(percentile(ordered, 0.99)),
+        "max_ms": _ms(ordered[-1]) if ordered else None,
+    }
+
+
+def run_workload(name, base_url, accounts, payloads, concurrency, duration, warmup, seed_value):
+    """Гоняет нагрузку name в concurrency потоков; ошибки — ответы 4xx/5xx и обрывы."""
+    latencies = []
+    counters = {"errors": 0, "bytes": 0}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    timing = {}
+
+    def worker(number):
+        rng = random.Random(seed_value * 1000 + number)
+        operation, clients = make_operation(name, base_url, accounts[number % len(accounts)], payloads, rng)
+        local_latencies = []
+        errors = transferred = 0
+        try:
+            start_barrier.wait()
+            warmup_until = timing["start"] + warmup
+            while True:
+                now = time.perf_counter()
+                if now >= timing["end"]:
+                    break
+                try:
+                    status, size = operation()
+                except (HttpError, http.client.HTTPException, OSError):
+                    status, size = 0, 0
+                finished = time.perf_counter()
+                if now < warmup_until:
+                    continue
+                if status >= 400 or status == 0:
+                    errors += 1
+                else:
+                    local_latencies.append(finished - now)
+                    transferred += size
+        finally:
+            for client in clients:
+                client.close()
+            with lock:
+                latencies.extend(local_latencies)
+                counters["errors"] += errors
+                counters["bytes"] += transferred
+
+    threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    timing["start"] = time.perf_counter()
+    timing["end"] = timing["start"] + warmup + duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, counters["errors"], counters["bytes"], duration)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    header = f"{'endpoint':<16}{'req':>8}{'err':>6}{'rps':>10}{'MB/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    if baseline:
+        header += f"{'Δrps':>9}{'Δp95':>9}"
+    print(header)
+    for name, row in results.items():
+        line = (
+            f"{name:<16}{row['requests']:>8}{row['errors']:>6}{row['throughput_rps']:>10}{row['mb_per_s']:>9}"
+            f"{_cell(row['p50_ms']):>10}{_cell(row['p95_ms']):>10}{_cell(row['p99_ms']):>10}"
+        )
+        old = (baseline or {}).get(name)
+        if old:
+            line += f"{_delta(row['throughput_rps'], old['throughput_rps']):>9}{_delta(row['p95_ms'], old['p95_ms']):>9}"
+        print(line)
+
+
+def _cell(value):
+    return "-" if value is None else value
+
+
+def _delta(new, old):
+    if not new or not old:
+        return "-"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+class InProcessServer:
+    """Приложение на временной тестовой базе за многопоточным WSGI-сервером Django."""
+
+    def __init__(self):
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cloud_storage.settings")
+        import django
+
+        django.setup()
+        # Запросы нагрузки не засоряют вывод; ошибки сервера (500) по-прежнему видны
+        logging.disable(logging.WARNING)
+
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+        from django.core.wsgi import get_wsgi_application
+        from django.db import connection
+        from django.test.utils import override_settings
+
+        self.connection = connection
+        self.media_root = tempfile.mkdtemp(prefix="bench_api_")
+        if connection.vendor == "sqlite":
+            # База в файле, а не в памяти: её видят все потоки сервера
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(self.media_root, "bench.sqlite3")
+        self.old_name = connection.creation.create_test_db(verbosity=0)
+        self.overrides = override_settings(
+            MEDIA_ROOT=self.media_root,
+            FILES_VOLUMES="",
+            FILES_RENDITION_ROOT=os.path.join(self.media_root, ".renditions"),
+            FILES_TRASH_PURGER=False,
+            ALLOWED_HOSTS=["*"],
+        )
+        self.overrides.enable()
+        self.server = ThreadedWSGIServer(("127.0.0.1", 0), WSGIRequestHandler, allow_reuse_address=True)
+        self.server.set_app(get_wsgi_application())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def describe(self):
+        return {"server": "in-process wsgi", "database": self.connection.vendor}
+
+    def close(self):
+        from files import stats
+
+        self.server.shutdown()
+        self.server.server_close()
+        # Накопленные счётчики скачиваний пишутся, пока тестовая база ещё есть
+        stats.flush()
+        self.overrides.disable()
+        self.connection.creation.destroy_test_db(self.old_name, verbosity=0)
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк REST API")
+    parser.add_argument("--url", help="Нагружать запущенный сервер вместо приложения в процессе")
+    parser.add_argument("--users", type=int, default=4, help="Пользователей (по умолчанию 4)")
+    parser.add_argument("--files", type=int, default=20, help="Файлов на пользователя перед нагрузкой")
+    parser.add_argument("--sizes", default="4K,256K,2M", help="Размеры файлов через запятую (K, M, G)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Параллельных клиентов")
+    parser.add_argument("--duration", type=float, default=10, help="Длительность каждой нагрузки, секунды")
+    parser.add_argument("--warmup", type=float, default=1, help="Прогрев перед замером, секунды")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="Нагрузки через запятую")
+    parser.add_argument("--seed", type=int, default=1, help="Зерно генератора случайных чисел")
+    parser.add_argument("--output", default="bench_results.json", help="Файл для результатов в JSON")
+    parser.add_argument("--compare", help="JSON прошлого запуска для сравнения")
+    args = parser.parse_args()
+
+    workloads = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+    sizes = [parse_size(value) for value in args.sizes.split(",") if value.strip()]
+    if not sizes or args.users < 1 or args.files < 1 or args.concurrency < 1:
+        parser.error("--sizes, --users, --files and --concurrency must be positive")
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    server = None if args.url else InProcessServer()
+    base_url = args.url.rstrip("/") if args.url else server.url
+    try:
+        payloads = [make_payload(size) for size in sizes]
+        seed_started = time.perf_counter()
+        accounts = seed(base_url, args.users, args.files, payloads, share_links=min(args.files, 5))
+        print(f"Seeded {args.users} users x {args.files} files in {time.perf_counter() - seed_started:.1f}s")
+
+        results = {}
+        for number, name in enumerate(workloads):
+            print(f"Running {name}...", flush=True)
+            results[name] = run_workload(
+                name, base_url, accounts, payloads, args.concurrency, args.duration, args.warmup, args.seed + number
+            )
+        meta = server.describe() if server else {"server": base_url, "database": None}
+    finally:
+        if server is not None:
+            server.close()
+
+    report = {
+        "meta": {
+            **meta,
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "users": args.users,
+            "files_per_user": args.files,
+            "sizes": sizes,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print_table(results, baseline)
+    print(f"Saved to {args.output}")
+    return 1 if any(row["requests"] == 0 for row in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
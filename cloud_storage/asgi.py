@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cloud_storage.settings')
 
-application = get_asgi_application()
+# Как get_asgi_application(), но тело загрузок читается потоком (см. files/asgi.py)
+django.setup(set_prefix=False)
+
+from files.asgi import StreamingUploadASGIHandler  # noqa: E402
+
+application = StreamingUploadASGIHandler()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 
     'accounts',
     'files',
+    'monitoring',
     'rest_framework',
 ]
 
@@ -53,11 +55,13 @@ AUTH_USER_MODEL = "accounts.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ),
 }
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',
+    'monitoring.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,6 +105,15 @@ DATABASES = {
     }
 }
 
+# DB_ENGINE=sqlite — локальная база для разработки и проверочных скриптов
+if os.getenv("DB_ENGINE") == "sqlite":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("DB_NAME") or os.path.join(BASE_DIR, 'db.sqlite3'),
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -142,6 +155,117 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Отдача файлов через фронт-прокси: "" — стримит Django,
+# "x-accel" — nginx (X-Accel-Redirect), "x-sendfile" — Apache/lighttpd (X-Sendfile)
+FILES_DOWNLOAD_OFFLOAD = os.getenv("FILES_DOWNLOAD_OFFLOAD", "")
+# internal-location nginx, отображённый на MEDIA_ROOT
+FILES_ACCEL_REDIRECT_PREFIX = os.getenv("FILES_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+
+# Размер страницы списка файлов (keyset-пагинация, ?limit=)
+FILES_LIST_PAGE_SIZE = int(os.getenv("FILES_LIST_PAGE_SIZE", "1000"))
+FILES_LIST_MAX_PAGE_SIZE = int(os.getenv("FILES_LIST_MAX_PAGE_SIZE", "5000"))
+
+# Как часто буфер статистики скачиваний пишется в базу (секунды; 0 — сразу)
+FILES_STATS_FLUSH_INTERVAL = float(os.getenv("FILES_STATS_FLUSH_INTERVAL", "10"))
+
+# Максимальный объём окна текстового предпросмотра (байты)
+FILES_PREVIEW_MAX_BYTES = int(os.getenv("FILES_PREVIEW_MAX_BYTES", str(256 * 1024)))
+
+# Кеш миниатюр изображений: каталог (внутри MEDIA_ROOT, чтобы работала отдача
+# через прокси), предельный объём и построение сразу после загрузки
+FILES_RENDITION_ROOT = os.getenv("FILES_RENDITION_ROOT", os.path.join(MEDIA_ROOT, ".renditions"))
+FILES_RENDITION_CACHE_BYTES = int(os.getenv("FILES_RENDITION_CACHE_BYTES", str(1024 ** 3)))
+FILES_THUMBNAILS_EAGER = os.getenv("FILES_THUMBNAILS_EAGER", "False") == "True"
+
+# Публичные ссылки: срок действия по умолчанию (секунды, 0 — максимальный),
+# максимальный срок и как часто воркер подгружает список отозванных ссылок
+FILES_SHARE_DEFAULT_TTL = int(os.getenv("FILES_SHARE_DEFAULT_TTL", "0"))
+FILES_SHARE_MAX_TTL = int(os.getenv("FILES_SHARE_MAX_TTL", str(30 * 24 * 3600)))
+FILES_SHARE_REVOCATION_REFRESH = float(os.getenv("FILES_SHARE_REVOCATION_REFRESH", "30"))
+# Сколько секунд кешируется, где лежат данные файла ссылки (в токене их нет)
+FILES_SHARE_TARGET_CACHE_TTL = int(os.getenv("FILES_SHARE_TARGET_CACHE_TTL", "60"))
+
+# Как долго статистика хранилища для администратора считается свежей (секунды)
+FILES_ANALYTICS_REFRESH_INTERVAL = int(os.getenv("FILES_ANALYTICS_REFRESH_INTERVAL", "600"))
+
+# Журнал изменений: максимальное ожидание long-poll запроса (секунды)
+# и как часто проверяются изменения, сделанные другими воркерами
+FILES_CHANGES_MAX_WAIT = float(os.getenv("FILES_CHANGES_MAX_WAIT", "30"))
+FILES_CHANGES_POLL_INTERVAL = float(os.getenv("FILES_CHANGES_POLL_INTERVAL", "1"))
+# Сколько long-poll запросов одновременно ждут в одном процессе (каждый занимает поток)
+FILES_CHANGES_MAX_WAITERS = int(os.getenv("FILES_CHANGES_MAX_WAITERS", "4"))
+
+# Корзина: сколько дней хранятся удалённые файлы, часы окончательной очистки
+# (например "1-6"; пусто — в любое время), размер пачки и пауза между пачками.
+# FILES_TRASH_PURGER — чистить корзину фоновым потоком воркера; чистит один
+# воркер на хосте — тот, кто держит блокировку файла FILES_TRASH_PURGER_LOCK
+FILES_TRASH_RETENTION_DAYS = int(os.getenv("FILES_TRASH_RETENTION_DAYS", "30"))
+FILES_TRASH_PURGE_HOURS = os.getenv("FILES_TRASH_PURGE_HOURS", "1-6")
+FILES_TRASH_PURGE_BATCH = int(os.getenv("FILES_TRASH_PURGE_BATCH", "200"))
+FILES_TRASH_PURGE_PAUSE = float(os.getenv("FILES_TRASH_PURGE_PAUSE", "1"))
+FILES_TRASH_PURGER = os.getenv("FILES_TRASH_PURGER", "True") == "True"
+FILES_TRASH_PURGER_LOCK = os.getenv(
+    "FILES_TRASH_PURGER_LOCK", os.path.join(tempfile.gettempdir(), "cloud_storage_trash_purger.lock")
+)
+
+# Потоки для фоновых задач (миниатюры и т.п.)
+FILES_BACKGROUND_WORKERS = int(os.getenv("FILES_BACKGROUND_WORKERS", "2"))
+
+# Режим хранения данных: "plain" — копия на каждый файл,
+# "cas" — общие blob'ы по SHA-256 содержимого (дедупликация)
+FILES_STORAGE_MODE = os.getenv("FILES_STORAGE_MODE", "plain")
+
+# Тома хранилища для новых данных: "имя=путь[:вес],..." (например
+# "disk1=/mnt/disk1,disk2=/mnt/disk2:2"); пусто — всё в MEDIA_ROOT.
+# После изменения списка данные переносит команда rebalance_volumes
+FILES_VOLUMES = os.getenv("FILES_VOLUMES", "")
+
+# Сжатие txt/csv/json на диске при загрузке: "" — выключено, "gzip" или
+# "zstd" (нужен пакет zstandard, без него — gzip)
+FILES_COMPRESSION = os.getenv("FILES_COMPRESSION", "")
+
+# Асинхронные представления скачивания, предпросмотра и загрузки (files.async_views).
+# Включается в cloud_storage/asgi.py; под WSGI остаются синхронные
+FILES_ASYNC_VIEWS = os.getenv("FILES_ASYNC_VIEWS", "False") == "True"
+
+# Метрики Prometheus на /metrics (monitoring.middleware.MetricsMiddleware)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+# Каталог снимков метрик воркеров: /metrics складывает значения всех процессов.
+# Пусто — только метрики процесса, который ответил
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "cloud_storage_metrics"))
+# Как часто воркер сохраняет свой снимок (секунды)
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+# Доступ к /metrics: токен (Authorization: Bearer ...) или адреса сборщика —
+# сети через запятую ("10.0.0.0/8,127.0.0.1"). Без них /metrics закрыт
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "")
+
+# Профилирование запросов (monitoring.middleware.ProfilingMiddleware): заголовок
+# X-Profile: 1 от администратора или выборка PROFILING_SAMPLE_RATE (доля, 0 — выкл.)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "True") == "True"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+# Каталог отчётов и сколько последних отчётов в нём хранить
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "cloud_storage_profiles"))
+PROFILING_MAX_REPORTS = int(os.getenv("PROFILING_MAX_REPORTS", "100"))
+
+# Квота хранилища пользователя по умолчанию (байты, 0 — без ограничения);
+# индивидуальная задаётся полем quota_bytes пользователя
+FILES_USER_QUOTA = int(os.getenv("FILES_USER_QUOTA", "0"))
+
+# Максимальный размер файла при загрузке одним запросом
+FILES_UPLOAD_MAX_SIZE = int(os.getenv("FILES_UPLOAD_MAX_SIZE", str(100 * 1024 * 1024)))
+
+# Сколько файлов можно скачать одним ZIP-архивом
+FILES_ARCHIVE_MAX_FILES = int(os.getenv("FILES_ARCHIVE_MAX_FILES", "10000"))
+
+# Загрузка файлов по частям (upload sessions)
+FILES_UPLOAD_CHUNK_SIZE = int(os.getenv("FILES_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+FILES_UPLOAD_SESSION_MAX_SIZE = int(os.getenv("FILES_UPLOAD_SESSION_MAX_SIZE", str(20 * 1024 ** 3)))
+# Сколько сессий может быть открыто у пользователя и через сколько секунд
+# без новых частей сессия удаляется вместе с резервом квоты
+FILES_UPLOAD_MAX_SESSIONS = int(os.getenv("FILES_UPLOAD_MAX_SESSIONS", "10"))
+FILES_UPLOAD_SESSION_TTL = int(os.getenv("FILES_UPLOAD_SESSION_TTL", str(24 * 3600)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -154,8 +278,15 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.authentication.VersionedTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.authentication.VersionedTokenRefreshSerializer",
 }
 
+# Сколько секунд пользователь из JWT берётся из кеша без запроса к базе.
+# С локальным кешем (по умолчанию) изменения пользователя в других воркерах
+# видны не позже этого срока; с общим кешем (Redis, memcached) — сразу
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+
 # Безопасность (для production)
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.http import JsonResponse
 from django.urls import path, include
+from monitoring.views import metrics_view
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -14,6 +15,10 @@ urlpatterns = [
 
     path("api/files/", include("files.urls")),
 
+    path("api/monitoring/", include("monitoring.urls")),
+
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -0,0 +1,96 @@
+"""Статистика хранилища для администратора.
+
+Разбивки по расширениям и месяцам считаются агрегирующими запросами по всей
+таблице файлов и сохраняются в ExtensionStat / MonthlyStat; панель читает
+только эти небольшие таблицы, время пересчёта — в StorageStatsRefresh. Пересчёт — командой ``refresh_storage_stats``
+или в фоне, когда данные старше ``FILES_ANALYTICS_REFRESH_INTERVAL`` секунд.
+Счётчики по пользователям поддерживаются на самом User (см. quota).
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .background import submit
+from .models import ExtensionStat, File, MonthlyStat, StorageStatsRefresh
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_refreshing = False
+
+
+def refresh_storage_stats():
+    """Пересчитывает таблицы статистики."""
+    now = timezone.now()
+    by_extension = (
+        File.objects.order_by().values("extension")
+        .annotate(file_count=Count("id"), total_bytes=Sum("size"))
+    )
+    by_month = (
+        File.objects.order_by()
+        .annotate(month=TruncMonth("uploaded_at", output_field=DateField()))
+        .values("month")
+        .annotate(file_count=Count("id"), total_bytes=Sum("size"))
+    )
+    extension_rows = [
+        ExtensionStat(
+            extension=row["extension"],
+            file_count=row["file_count"],
+            total_bytes=row["total_bytes"] or 0,
+            refreshed_at=now,
+        )
+        for row in by_extension
+    ]
+    month_rows = [
+        MonthlyStat(
+            month=row["month"],
+            file_count=row["file_count"],
+            total_bytes=row["total_bytes"] or 0,
+            refreshed_at=now,
+        )
+        for row in by_month
+    ]
+    with transaction.atomic():
+        ExtensionStat.objects.all().delete()
+        ExtensionStat.objects.bulk_create(extension_rows)
+        MonthlyStat.objects.all().delete()
+        MonthlyStat.objects.bulk_create(month_rows)
+        StorageStatsRefresh.objects.update_or_create(pk=1, defaults={"refreshed_at": now})
+    logger.info("Storage stats refreshed: %d extensions, %d months", len(extension_rows), len(month_rows))
+    return len(extension_rows), len(month_rows)
+
+
+def _refresh_in_background():
+    global _refreshing
+    try:
+        refresh_storage_stats()
+    finally:
+        with _lock:
+            _refreshing = False
+
+
+def ensure_fresh():
+    """Время последнего пересчёта; устаревшие данные пересчитываются в фоне.
+
+    Пока статистика не считалась ни разу, она считается сразу, чтобы панель
+    не была пустой. Отметка о пересчёте пишется и при пустом хранилище.
+    """
+    global _refreshing
+    refreshed_at = StorageStatsRefresh.objects.filter(pk=1).values_list("refreshed_at", flat=True).first()
+    if refreshed_at is None:
+        refresh_storage_stats()
+        return timezone.now()
+    interval = timedelta(seconds=settings.FILES_ANALYTICS_REFRESH_INTERVAL)
+    if timezone.now() - refreshed_at > interval:
+        with _lock:
+            if _refreshing:
+                return refreshed_at
+            _refreshing = True
+        submit(_refresh_in_background)
+    return refreshed_at
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class FilesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'files'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import signals  # noqa: F401
+        from .trash import parse_purge_hours
+
+        # Ошибка в часах очистки — при запуске, а не в фоновом потоке
+        parse_purge_hours(settings.FILES_TRASH_PURGE_HOURS)
@@ -0,0 +1,123 @@
+"""ASGI-обработчик с потоковым приёмом тела загрузок.
+
+Стандартный ASGIHandler Django принимает тело запроса целиком (в память или
+во временный файл) ещё до вызова представления. Для загрузок это отключает
+защиту StreamingUploadHandler: отказ по Content-Length и квоте, отказ
+посреди тела по размеру, расширению или MIME — байты к этому моменту уже
+приняты. Здесь тело запросов загрузки не спулится: (синхронное)
+представление читает его из ASGI ``receive`` по мере разбора, а при отказе
+остаток тела не принимается вовсе.
+"""
+import asyncio
+import concurrent.futures
+
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest, get_script_prefix
+from django.http import UnreadablePostError
+from django.urls import Resolver404, resolve
+
+# Представления (имя URL, метод), которые читают тело загрузки потоком
+STREAMED_BODY_VIEWS = {
+    ("file_list", "POST"),
+    ("file_upload", "POST"),
+    ("upload_chunk", "PUT"),
+}
+
+
+def streams_body(scope):
+    """Тело запроса отдаётся представлению потоком, без предварительного приёма."""
+    path = scope["path"]
+    script_name = get_script_prefix(scope)
+    if script_name:
+        path = path.removeprefix(script_name)
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return False
+    return (match.url_name, scope["method"].upper()) in STREAMED_BODY_VIEWS
+
+
+class ReceiveStream:
+    """Тело запроса, которое читается из ASGI ``receive`` в потоке представления.
+
+    Передаётся обработчику Django вместо ``receive``: сам вызов (ожидание
+    отключения клиента) ждёт, пока тело не будет прочитано до конца, чтобы
+    сообщения ``receive`` не забирались двумя сторонами сразу.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = bytearray()
+        self._more_body = True
+        self._body_read = asyncio.Event()
+
+    async def __call__(self):
+        await self._body_read.wait()
+        return await self._receive()
+
+    def _finish(self):
+        self._more_body = False
+        self._loop.call_soon_threadsafe(self._body_read.set)
+
+    def _next_message(self):
+        future = asyncio.run_coroutine_threadsafe(self._receive(), self._loop)
+        try:
+            return future.result(timeout=ASGIRequest.body_receive_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self._finish()
+            raise UnreadablePostError("Timed out reading request body")
+
+    def _fill(self, size=-1, line=False):
+        """Дочитывает сообщения, пока в буфере нет size байт (или строки)."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            # Блокирующее чтение в цикле событий никогда не дождалось бы данных
+            raise RuntimeError("Streamed request body must be read outside the event loop")
+
+        while self._more_body and (size is None or size < 0 or len(self._buffer) < size):
+            if line and b"\n" in self._buffer:
+                break
+            message = self._next_message()
+            if message["type"] == "http.disconnect":
+                self._finish()
+                raise UnreadablePostError("Client disconnected while sending request body")
+            self._buffer += message.get("body", b"")
+            if not message.get("more_body", False):
+                self._finish()
+
+    def _take(self, size):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read(self, size=-1):
+        self._fill(size)
+        return self._take(len(self._buffer) if size is None or size < 0 else size)
+
+    def readline(self, size=-1):
+        self._fill(size, line=True)
+        end = self._buffer.find(b"\n") + 1 or len(self._buffer)
+        if size is not None and size >= 0:
+            end = min(end, size)
+        return self._take(end)
+
+    def close(self):
+        self._buffer.clear()
+
+
+class StreamingUploadASGIHandler(ASGIHandler):
+    """ASGIHandler, который не принимает тело запросов загрузки заранее."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and streams_body(scope):
+            receive = ReceiveStream(receive, asyncio.get_running_loop())
+        await super().__call__(scope, receive, send)
+
+    async def read_body(self, receive):
+        if isinstance(receive, ReceiveStream):
+            return receive
+        return await super().read_body(receive)
@@ -0,0 +1,198 @@
+"""Асинхронные представления скачивания для запуска под ASGI.
+
+Подключаются вместо синхронных при ``FILES_ASYNC_VIEWS``. Права проверяются
+так же, как в files.views, тело файла отдаётся асинхронным итератором,
+который читает блоки в пуле потоков: медленные клиенты не держат поток
+воркера на всё время скачивания. Загрузки остаются синхронными
+представлениями, тело им передаёт потоком files.asgi.
+"""
+import asyncio
+import logging
+import os
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .models import File
+from .responses import conditional_response, content_etag, content_last_modified, file_response
+from .sharing import (
+    ShareError,
+    count_download,
+    is_signed_token,
+    share_target,
+    shared_file_path,
+    verify_share_token,
+)
+from .stats import record_download
+from .storage import data_path
+from .views import _is_new_download, content_response
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIView(View):
+    """Основа асинхронных представлений: как APIView, без CSRF (аутентификация по JWT)."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+
+async def _in_thread(func, *args, **kwargs):
+    """Выполняет блокирующую функцию в пуле потоков и закрывает её соединения с БД."""
+    def run():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connections.close_all()
+
+    return await asyncio.to_thread(run)
+
+
+async def _authenticate(request):
+    """Пользователь по классам аутентификации DRF. Возвращает (user, ответ с ошибкой)."""
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=authenticators)
+    try:
+        user = await sync_to_async(lambda: drf_request.user)()
+    except APIException as exc:
+        detail = exc.detail if isinstance(exc.detail, (dict, list)) else {"detail": exc.detail}
+        return None, _unauthorized(detail, exc.status_code, authenticators, request)
+    if user is None or not user.is_authenticated:
+        detail = {"detail": "Authentication credentials were not provided."}
+        return None, _unauthorized(detail, 401, authenticators, request)
+    request.user = user
+    return user, None
+
+
+def _unauthorized(detail, status_code, authenticators, request):
+    response = JsonResponse(detail, status=status_code, safe=False)
+    if status_code == 401 and authenticators:
+        response["WWW-Authenticate"] = authenticators[0].authenticate_header(request)
+    return response
+
+
+def _not_found():
+    return JsonResponse({"detail": "No File matches the given query."}, status=404)
+
+
+def _open_file(request, resolve_path, filename, **kwargs):
+    """Проверка данных на диске и заголовки ответа; вызывается в пуле потоков."""
+    file_path = resolve_path()
+    if file_path is None:
+        return JsonResponse({"error": "Invalid file path"}, status=400)
+    if not os.path.exists(file_path):
+        return JsonResponse({"error": "File not found"}, status=404)
+    return file_response(request, file_path, filename, async_stream=True, **kwargs)
+
+
+def _open_shared_file(request, target):
+    """Как _open_file для файла ссылки; возвращает (target, ответ)."""
+    target, file_path = shared_file_path(target)
+    if file_path is None:
+        return target, JsonResponse({"error": "File not found"}, status=404)
+    return target, file_response(
+        request, file_path, target["name"], async_stream=True, etag=target["etag"],
+        last_modified=target["last_modified"], codec=target["codec"], size=target["size"],
+    )
+
+
+async def _serve_file(request, file_obj):
+    etag = content_etag(file_obj)
+    last_modified = content_last_modified(file_obj)
+    not_modified = conditional_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    response = await _in_thread(
+        _open_file, request, partial(data_path, file_obj), file_obj.original_name,
+        etag=etag, last_modified=last_modified, codec=file_obj.codec, size=file_obj.size,
+    )
+    if response.status_code < 400 and _is_new_download(request):
+        await sync_to_async(record_download)(file_obj)
+    return response
+
+
+class AsyncFileDownloadView(AsyncAPIView):
+    """Скачивание файла (асинхронный вариант FileDownloadView)"""
+
+    async def get(self, request, pk):
+        user, error = await _authenticate(request)
+        if error is not None:
+            return error
+        file_obj = await File.objects.alive().filter(id=pk).afirst()
+        if file_obj is None:
+            return _not_found()
+        if file_obj.owner_id != user.id and not user.is_admin:
+            return JsonResponse({"error": "Permission denied"}, status=403)
+
+        response = await _serve_file(request, file_obj)
+        logger.info("%s downloaded file %s", user.username, file_obj.name)
+        return response
+
+
+class AsyncFileDownloadSharedView(AsyncAPIView):
+    """Скачивание файла по публичной ссылке (асинхронный вариант FileDownloadSharedView)."""
+
+    async def get(self, request, token):
+        if not is_signed_token(token):
+            return await self._get_legacy(request, token)
+
+        try:
+            payload = await sync_to_async(verify_share_token)(token)
+        except ShareError as exc:
+            return JsonResponse({"error": str(exc)}, status=exc.status)
+        target = await sync_to_async(share_target)(payload["f"])
+        if target is None:
+            return JsonResponse({"error": "File not found"}, status=404)
+        not_modified = conditional_response(request, target["etag"], target["last_modified"])
+        if not_modified is not None:
+            return not_modified
+
+        target, response = await _in_thread(_open_shared_file, request, target)
+        if response.status_code >= 400:
+            return response
+
+        if _is_new_download(request):
+            if not await sync_to_async(count_download)(payload):
+                return JsonResponse({"error": "Download limit reached"}, status=410)
+            await sync_to_async(record_download)(File(id=target["id"], owner_id=target["owner_id"]))
+        logger.info("Shared file downloaded: %s", payload["f"])
+        return response
+
+    async def _get_legacy(self, request, token):
+        try:
+            file_obj = await File.objects.alive().filter(share_token=token).afirst()
+        except ValidationError:
+            file_obj = None
+        if file_obj is None:
+            return JsonResponse({"error": "Share link not found"}, status=404)
+
+        response = await _serve_file(request, file_obj)
+        logger.info("Shared file downloaded: %s", file_obj.id)
+        return response
+
+
+class AsyncFileContentView(AsyncAPIView):
+    """Содержимое файла для предпросмотра (асинхронный вариант FileContentView)."""
+
+    async def get(self, request, pk):
+        user, error = await _authenticate(request)
+        if error is not None:
+            return error
+        file_obj = await File.objects.alive().filter(id=pk).afirst()
+        if file_obj is None:
+            return _not_found()
+        if file_obj.owner_id != user.id and not user.is_admin:
+            return HttpResponse("Permission denied", status=403)
+
+        return await _in_thread(content_response, request, file_obj, request.GET, async_stream=True)
+
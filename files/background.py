@@ -0,0 +1,47 @@
+"""Фоновые задачи в пуле потоков процесса.
+
+Для коротких вспомогательных работ (миниатюры, удаление данных с диска),
+которые не должны задерживать ответ. Очереди между процессами нет: задачи
+живут, пока жив воркер.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FILES_BACKGROUND_WORKERS,
+                thread_name_prefix="files-background",
+            )
+        return _executor
+
+
+def _run(fn, args, kwargs):
+    try:
+        fn(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(fn, "__name__", fn))
+    finally:
+        connections.close_all()
+
+
+def submit(fn, *args, **kwargs):
+    """Запускает fn в фоне."""
+    return _get_executor().submit(_run, fn, args, kwargs)
+
+
+def submit_on_commit(fn, *args, **kwargs):
+    """Запускает fn в фоне после фиксации текущей транзакции."""
+    transaction.on_commit(lambda: submit(fn, *args, **kwargs))
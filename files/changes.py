@@ -0,0 +1,98 @@
+"""Учёт изменений в файлах пользователя.
+
+Версия списка (для ETag листинга) и журнал FileChange, по которому клиенты
+синхронизации забирают только изменения после своего курсора.
+"""
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import User
+
+from .models import FileChange
+
+# Будит ожидающие long-poll запросы этого процесса после фиксации изменения
+_changed = threading.Condition()
+
+# Сколько long-poll запросов процесса сейчас ждут изменений
+_waiters = 0
+_waiters_lock = threading.Lock()
+
+
+def bump_files_version(*owner_ids):
+    """Отмечает, что список файлов владельцев изменился (сбрасывает ETag листинга)."""
+    if owner_ids:
+        User.objects.filter(pk__in=set(owner_ids)).update(
+            files_version=F("files_version") + 1,
+            files_changed_at=timezone.now(),
+        )
+
+
+def _notify():
+    with _changed:
+        _changed.notify_all()
+
+
+def record_change(owner_id, file_id, action):
+    """Пишет изменение файла в журнал и поднимает версию списка владельца.
+
+    Версия поднимается до вставки: UPDATE блокирует строку владельца, и id
+    записей журнала выдаются в порядке фиксации транзакций. Иначе клиент мог
+    бы увидеть больший id раньше меньшего и перешагнуть его курсором.
+    """
+    with transaction.atomic():
+        bump_files_version(owner_id)
+        FileChange.objects.create(owner_id=owner_id, file_id=file_id, action=action)
+        transaction.on_commit(_notify)
+
+
+def record_changes(owner_id, file_ids, action):
+    """То же для набора файлов одного владельца: одна вставка и одно обновление версии."""
+    with transaction.atomic():
+        bump_files_version(owner_id)
+        FileChange.objects.bulk_create(
+            [FileChange(owner_id=owner_id, file_id=file_id, action=action) for file_id in file_ids],
+            batch_size=1000,
+        )
+        transaction.on_commit(_notify)
+
+
+def latest_change_id(owner_id):
+    return FileChange.objects.filter(owner_id=owner_id).order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def acquire_waiter(limit):
+    """Занимает место ожидающего запроса; False, если их уже limit."""
+    global _waiters
+    with _waiters_lock:
+        if _waiters >= limit:
+            return False
+        _waiters += 1
+        return True
+
+
+def release_waiter():
+    global _waiters
+    with _waiters_lock:
+        _waiters -= 1
+
+
+def wait_for_changes(owner_id, cursor, timeout, poll_interval):
+    """Ждёт изменений после cursor не дольше timeout секунд. True — они есть.
+
+    Изменения в этом процессе будят ожидание сразу, сделанные другими
+    воркерами замечаются при проверке раз в poll_interval секунд.
+    """
+    changes = FileChange.objects.filter(owner_id=owner_id, id__gt=cursor)
+    deadline = time.monotonic() + timeout
+    while True:
+        if changes.exists():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        with _changed:
+            _changed.wait(min(poll_interval, remaining))
@@ -0,0 +1,155 @@
+"""Прозрачное сжатие данных файлов на диске.
+
+С ``FILES_COMPRESSION = "gzip"`` или ``"zstd"`` хорошо сжимаемые форматы
+(``COMPRESSIBLE_EXTENSIONS``) записываются сжатыми прямо при загрузке.
+У File сохраняются кодек и размер данных на диске (``stored_size``), а
+``size`` остаётся размером исходного файла. Клиенту, который принимает
+кодек (Accept-Encoding), сжатые байты отдаются как есть с Content-Encoding,
+остальным — распаковываются потоком. Для zstd нужен пакет ``zstandard``,
+без него используется gzip.
+"""
+import gzip
+import io
+import os
+
+from django.conf import settings
+
+try:
+    import zstandard  # type: ignore
+    _ZSTD_AVAILABLE = True
+except Exception:
+    zstandard = None  # type: ignore
+    _ZSTD_AVAILABLE = False
+
+CODEC_NONE = ""
+CODEC_GZIP = "gzip"
+CODEC_ZSTD = "zstd"
+
+COMPRESSIBLE_EXTENSIONS = {"txt", "csv", "json"}
+# Синонимы кодеков в Accept-Encoding
+ENCODING_ALIASES = {"x-gzip": CODEC_GZIP}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+COPY_BUFFER = 1024 * 1024
+
+
+def active_codec():
+    """Кодек для новых загрузок или CODEC_NONE, если сжатие выключено."""
+    codec = settings.FILES_COMPRESSION
+    if codec == CODEC_ZSTD and not _ZSTD_AVAILABLE:
+        return CODEC_GZIP
+    return codec if codec in (CODEC_GZIP, CODEC_ZSTD) else CODEC_NONE
+
+
+def upload_codec(original_name):
+    """Кодек, которым нужно сжать загружаемый файл с таким именем."""
+    extension = os.path.splitext(original_name)[1].lstrip(".").lower()
+    return active_codec() if extension in COMPRESSIBLE_EXTENSIONS else CODEC_NONE
+
+
+def open_writer(path, codec):
+    """Файл для записи исходных данных, которые на диск попадают сжатыми."""
+    if codec == CODEC_GZIP:
+        # mtime=0: одинаковое содержимое даёт одинаковые байты на диске
+        return gzip.GzipFile(path, mode="wb", compresslevel=GZIP_LEVEL, mtime=0)
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, "wb"))
+    return open(path, "wb")
+
+
+class _ZstdReader(io.RawIOBase):
+    """Распаковка zstd с seek назад (повторным чтением с начала), как у GzipFile."""
+
+    def __init__(self, path):
+        super().__init__()
+        self._path = path
+        self._reader = None
+        self._position = 0
+        self._reopen()
+
+    def _reopen(self):
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = zstandard.ZstdDecompressor().stream_reader(open(self._path, "rb"))
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self._reader.read(size)
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("seek from end is not supported")
+        if offset < self._position:
+            self._reopen()
+        while self._position < offset:
+            if not self.read(min(COPY_BUFFER, offset - self._position)):
+                break
+        return self._position
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        super().close()
+
+
+def open_reader(path, codec):
+    """Файл на чтение исходных данных, с распаковкой на лету.
+
+    seek для сжатых данных работает распаковкой, поэтому стоит O(смещения).
+    """
+    if codec == CODEC_GZIP:
+        return gzip.GzipFile(path, mode="rb")
+    if codec == CODEC_ZSTD:
+        if not _ZSTD_AVAILABLE:
+            raise OSError("zstandard is not installed")
+        return _ZstdReader(path)
+    return open(path, "rb")
+
+
+def iter_decompressed(path, codec, block_size=COPY_BUFFER):
+    with open_reader(path, codec) as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            yield block
+
+
+def accepts_encoding(request, codec):
+    """Принимает ли клиент ответ с Content-Encoding: codec (с учётом q-значений)."""
+    header = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    explicit = wildcard = None
+    for part in header.split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        token = ENCODING_ALIASES.get(token, token)
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if token == codec:
+            explicit = quality
+        elif token == "*":
+            wildcard = quality
+    quality = explicit if explicit is not None else wildcard
+    return quality is not None and quality > 0
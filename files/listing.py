@@ -0,0 +1,152 @@
+"""Постраничный список файлов: keyset-пагинация, сортировка и фильтры.
+
+Курсор — непрозрачная строка с значением поля сортировки и id последней
+строки страницы, поэтому следующая страница выбирается по индексу
+(owner, <поле>, id) без OFFSET и за одно и то же время на любой глубине.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+SORT_FIELDS = ("uploaded_at", "name", "size", "last_downloaded_at")
+DATETIME_FIELDS = {"uploaded_at", "last_downloaded_at"}
+NULLABLE_FIELDS = {"last_downloaded_at"}
+DEFAULT_SORT = "uploaded_at"
+
+LISTING_FIELDS = (
+    "id",
+    "name",
+    "comment",
+    "size",
+    "uploaded_at",
+    "updated_at",
+    "last_downloaded_at",
+    "download_count",
+    "share_token",
+)
+
+
+class ListingError(ValueError):
+    """Некорректные параметры списка файлов."""
+
+
+def _parse_moment(value, name, end_of_day=False):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ListingError(f"Invalid {name}")
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _parse_int(value, name):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ListingError(f"Invalid {name}") from None
+    if number < 0:
+        raise ListingError(f"Invalid {name}")
+    return number
+
+
+def parse_filters(params):
+    """Фильтры: ext (через запятую), min_size/max_size, uploaded_after/uploaded_before."""
+    conditions = Q()
+    ext = params.get("ext")
+    if ext:
+        extensions = [e.strip().lstrip(".").lower() for e in ext.split(",") if e.strip()]
+        conditions &= Q(extension__in=extensions)
+    if params.get("min_size"):
+        conditions &= Q(size__gte=_parse_int(params["min_size"], "min_size"))
+    if params.get("max_size"):
+        conditions &= Q(size__lte=_parse_int(params["max_size"], "max_size"))
+    if params.get("uploaded_after"):
+        conditions &= Q(uploaded_at__gte=_parse_moment(params["uploaded_after"], "uploaded_after"))
+    if params.get("uploaded_before"):
+        conditions &= Q(uploaded_at__lte=_parse_moment(params["uploaded_before"], "uploaded_before", end_of_day=True))
+    return conditions
+
+
+def parse_sort(value):
+    """sort=<поле> или sort=-<поле>; возвращает (поле, по убыванию)."""
+    value = value or DEFAULT_SORT
+    descending = value.startswith("-")
+    field = value.lstrip("-")
+    if field not in SORT_FIELDS:
+        raise ListingError("Invalid sort field")
+    return field, descending
+
+
+def encode_cursor(field, value, pk):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({"f": field, "v": value, "id": pk}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, field):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        cursor_field, value, pk = payload["f"], payload["v"], int(payload["id"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ListingError("Invalid cursor") from None
+    if cursor_field != field:
+        raise ListingError("Cursor does not match sort field")
+    if value is not None and field in DATETIME_FIELDS:
+        value = parse_datetime(value)
+        if value is None:
+            raise ListingError("Invalid cursor")
+    return value, pk
+
+
+def _after_cursor(field, descending, value, pk):
+    """Условие «строго после (value, pk)» в порядке сортировки; NULL идут в конце."""
+    if value is None:
+        return Q(**{f"{field}__isnull": True}) & Q(**{"id__lt" if descending else "id__gt": pk})
+    op = "lt" if descending else "gt"
+    condition = Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"id__{op}": pk})
+    if field in NULLABLE_FIELDS:
+        condition |= Q(**{f"{field}__isnull": True})
+    return condition
+
+
+def page_size(value):
+    default = settings.FILES_LIST_PAGE_SIZE
+    if not value:
+        return default
+    return max(1, min(_parse_int(value, "limit"), settings.FILES_LIST_MAX_PAGE_SIZE))
+
+
+def paginate(queryset, params):
+    """Одна страница списка: (строки-словари, курсор следующей страницы или None)."""
+    field, descending = parse_sort(params.get("sort"))
+    limit = page_size(params.get("limit"))
+    queryset = queryset.filter(parse_filters(params))
+
+    cursor = params.get("cursor")
+    if cursor:
+        value, pk = decode_cursor(cursor, field)
+        queryset = queryset.filter(_after_cursor(field, descending, value, pk))
+
+    if descending:
+        ordering = [F(field).desc(nulls_last=True), F("id").desc()]
+    else:
+        ordering = [F(field).asc(nulls_last=True), F("id").asc()]
+    rows = list(queryset.order_by(*ordering).values(*LISTING_FIELDS)[: limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(field, last[field], last["id"])
+    return rows, next_cursor
@@ -0,0 +1,61 @@
+"""Перенос существующих файлов в CAS-хранилище blob'ов."""
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from files.models import Blob, File
+from files.storage import attach_blob, data_path
+from files.upload_handlers import file_sha256
+
+
+class Command(BaseCommand):
+    help = "Переносит файлы без blob'а в CAS-хранилище и считает освобождённое место"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать дубликаты, ничего не перемещая",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        migrated = skipped = blobs_created = 0
+        reclaimed = 0
+        seen = set(Blob.objects.values_list("sha256", flat=True))
+
+        for file_obj in File.objects.filter(blob__isnull=True).iterator():
+            file_path = data_path(file_obj)
+            if file_path is None or not os.path.exists(file_path):
+                self.stderr.write(f"Пропущен файл {file_obj.id}: данные не найдены")
+                skipped += 1
+                continue
+
+            if not file_obj.sha256:
+                file_obj.sha256 = file_sha256(file_path)
+            size = os.path.getsize(file_path)
+
+            if dry_run:
+                if file_obj.sha256 in seen:
+                    reclaimed += size
+                else:
+                    seen.add(file_obj.sha256)
+                    blobs_created += 1
+                migrated += 1
+                continue
+
+            with transaction.atomic():
+                created = attach_blob(file_obj)
+                file_obj.save(update_fields=["blob", "file", "sha256", "volume", "codec", "stored_size"])
+            if created:
+                blobs_created += 1
+            else:
+                reclaimed += size
+            migrated += 1
+
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Файлов перенесено: {migrated}, пропущено: {skipped}, "
+            f"новых blob'ов: {blobs_created}, освобождено: {reclaimed} байт"
+        ))
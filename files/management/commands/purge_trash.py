@@ -0,0 +1,44 @@
+"""Окончательное удаление файлов, срок хранения которых в корзине истёк."""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from files.trash import expired_trash, purge_expired_batch
+
+
+class Command(BaseCommand):
+    help = "Удаляет из корзины файлы старше FILES_TRASH_RETENTION_DAYS пачками с паузами"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch",
+            type=int,
+            default=settings.FILES_TRASH_PURGE_BATCH,
+            help="Файлов в одной пачке",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=settings.FILES_TRASH_PURGE_PAUSE,
+            help="Пауза между пачками, секунды",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать файлы с истёкшим сроком",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            self.stdout.write(f"[dry-run] Файлов к удалению: {expired_trash().count()}")
+            return
+
+        total = 0
+        while True:
+            purged = purge_expired_batch(options["batch"])
+            if not purged:
+                break
+            total += purged
+            time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Удалено файлов из корзины: {total}"))
@@ -0,0 +1,22 @@
+"""Удаление заброшенных сессий загрузки по частям."""
+from django.core.management.base import BaseCommand
+
+from files.upload_sessions import expired_sessions, purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = "Удаляет сессии загрузки без новых частей дольше FILES_UPLOAD_SESSION_TTL и освобождает их квоту"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать заброшенные сессии",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            self.stdout.write(f"[dry-run] Сессий к удалению: {expired_sessions().count()}")
+            return
+        removed = purge_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Удалено сессий загрузки: {removed}"))
@@ -0,0 +1,123 @@
+"""Перенос данных между томами хранилища после изменения FILES_VOLUMES."""
+import os
+import time
+from itertools import chain
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from files.models import Blob, File
+from files.storage import copy_data, place_file, place_volume, remove_paths, safe_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит blob'ы и данные файлов на тома, которые им назначает текущий "
+        "FILES_VOLUMES (после добавления тома или изменения весов)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать, сколько данных нужно перенести",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=0,
+            help="Перенести не больше стольких объектов (0 — все)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Пауза после каждого переноса, секунды",
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options["dry_run"]
+        self.pause = options["pause"]
+        limit = options["limit"]
+        moved = failed = moved_bytes = 0
+
+        blobs = Blob.objects.values_list("id", "sha256", "volume", "stored_size")
+        files = File.objects.filter(blob__isnull=True).values_list("id", "file", "volume", "stored_size")
+        candidates = chain(
+            (
+                (self._move_blob, blob_id, volume, place_volume(sha256), size)
+                for blob_id, sha256, volume, size in blobs.iterator()
+            ),
+            (
+                (self._move_file, file_id, volume, place_file(name), size)
+                for file_id, name, volume, size in files.iterator()
+            ),
+        )
+        for move, pk, volume, target, size in candidates:
+            if volume == target:
+                continue
+            if limit and moved >= limit:
+                break
+            if self.dry_run or move(pk, volume, target):
+                moved += 1
+                moved_bytes += size
+            else:
+                failed += 1
+
+        prefix = "[dry-run] " if self.dry_run else ""
+        total = Blob.objects.aggregate(size=Sum("stored_size"))["size"] or 0
+        total += File.objects.filter(blob__isnull=True).aggregate(size=Sum("stored_size"))["size"] or 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Перенесено объектов: {moved} ({moved_bytes} из {total} байт), пропущено: {failed}"
+        ))
+
+    def _copy(self, name, volume, target):
+        """Копирует данные на целевой том; возвращает (старый путь, новый путь) или None."""
+        src, dst = safe_path(name, volume), safe_path(name, target)
+        if src is None or dst is None or not os.path.exists(src):
+            self.stderr.write(f"Нет данных {volume}:{name}")
+            return None
+        # Тома с общим корнем (MEDIA_ROOT под своим именем) — переносить нечего
+        if src != dst:
+            copy_data(src, dst)
+        return src, dst
+
+    def _finish(self, paths, updated):
+        src, dst = paths
+        if src != dst:
+            # Лишняя копия: строку успели удалить или перенести параллельно.
+            # Иначе старые данные удаляются после фиксации нового тома
+            remove_paths([src] if updated else [dst])
+        if self.pause:
+            time.sleep(self.pause)
+        return updated
+
+    def _move_blob(self, blob_id, volume, target):
+        blob = Blob.objects.filter(pk=blob_id, volume=volume).first()
+        if blob is None:
+            return False
+        paths = self._copy(blob.name, volume, target)
+        if paths is None:
+            return False
+        with transaction.atomic():
+            # Под блокировкой строки: загрузка того же содержимого и удаление
+            # последней ссылки ждут её в attach_blob и release_blobs
+            updated = Blob.objects.select_for_update().filter(pk=blob_id, volume=volume).first() is not None
+            if updated:
+                Blob.objects.filter(pk=blob_id).update(volume=target)
+                File.objects.filter(blob_id=blob_id).update(volume=target)
+        return self._finish(paths, updated)
+
+    def _move_file(self, file_id, volume, target):
+        file_obj = File.objects.filter(pk=file_id, volume=volume, blob__isnull=True).only("file").first()
+        if file_obj is None:
+            return False
+        paths = self._copy(file_obj.file.name, volume, target)
+        if paths is None:
+            return False
+        with transaction.atomic():
+            updated = File.objects.filter(
+                pk=file_id, volume=volume, blob__isnull=True
+            ).update(volume=target)
+        return self._finish(paths, updated)
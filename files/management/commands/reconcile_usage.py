@@ -0,0 +1,66 @@
+"""Пересчёт счётчиков занятого места пользователей по файлам и открытым сессиям загрузки."""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from accounts.models import User
+from files.models import File, UploadSession
+
+
+class Command(BaseCommand):
+    help = "Сверяет bytes_used и file_count пользователей с их файлами и исправляет расхождения"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать расхождения, ничего не меняя",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="Проверить только пользователя с этим id",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        users = User.objects.order_by("id")
+        # Квота очищенной корзины уже освобождена, хотя строки ждут очистки
+        files = File.objects.filter(usage_released=False)
+        sessions = UploadSession.objects.all()
+        if options["user"] is not None:
+            users = users.filter(pk=options["user"])
+            files = files.filter(owner_id=options["user"])
+            sessions = sessions.filter(owner_id=options["user"])
+
+        # Сначала счётчики, потом файлы: загрузка между чтениями изменит
+        # счётчики, и условный UPDATE ниже такого пользователя пропустит
+        counters = list(users.values_list("id", "username", "bytes_used", "file_count"))
+        # По одному агрегирующему запросу на всех пользователей; сессия загрузки
+        # резервирует место как будущий файл
+        actual = {}
+        for rows in (files, sessions):
+            for row in rows.values("owner_id").annotate(total=Sum("size"), count=Count("id")):
+                total, count = actual.get(row["owner_id"], (0, 0))
+                actual[row["owner_id"]] = (total + (row["total"] or 0), count + row["count"])
+
+        checked = fixed = skipped = 0
+        for user_id, username, bytes_used, file_count in counters:
+            checked += 1
+            total, count = actual.get(user_id, (0, 0))
+            if (bytes_used, file_count) == (total, count):
+                continue
+            self.stdout.write(
+                f"{username}: bytes_used {bytes_used} -> {total}, file_count {file_count} -> {count}"
+            )
+            if not dry_run and not User.objects.filter(
+                pk=user_id, bytes_used=bytes_used, file_count=file_count
+            ).update(bytes_used=total, file_count=count):
+                self.stderr.write(f"Пропущен {username}: счётчики изменились во время проверки")
+                skipped += 1
+                continue
+            fixed += 1
+
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Пользователей проверено: {checked}, исправлено: {fixed}, пропущено: {skipped}"
+        ))
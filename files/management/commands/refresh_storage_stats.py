@@ -0,0 +1,14 @@
+"""Пересчёт статистики хранилища для панели администратора."""
+from django.core.management.base import BaseCommand
+
+from files.analytics import refresh_storage_stats
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает статистику файлов по расширениям и месяцам"
+
+    def handle(self, *args, **options):
+        extensions, months = refresh_storage_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Статистика обновлена: расширений {extensions}, месяцев {months}"
+        ))
@@ -0,0 +1,269 @@
+"""Проверка согласованности хранилища: файлы на диске против записей в базе."""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Count
+
+from files.models import Blob, File, UploadSession
+from files.storage import TOMBSTONE_SUFFIX, release_blob, volume_roots
+
+
+class Throttle:
+    """Ограничение числа операций с диском в секунду (общее для всех потоков)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет тома хранилища (MEDIA_ROOT и FILES_VOLUMES) с таблицами File, Blob и UploadSession: "
+        "находит файлы без записей (сироты) и записи без файлов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--delete-orphans",
+            action="store_true",
+            help="Удалить найденные файлы-сироты и опустевшие каталоги",
+        )
+        parser.add_argument(
+            "--fix-blobs",
+            action="store_true",
+            help="Исправить счётчики ссылок blob'ов по фактическому числу файлов",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="Не считать сиротами файлы моложе стольких секунд (идущие загрузки), по умолчанию 3600",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Число потоков обхода диска",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=0,
+            help="Не больше стольких операций с диском в секунду (0 — без ограничения)",
+        )
+
+    def handle(self, *args, **options):
+        # Том с тем же корнем, что у другого (MEDIA_ROOT под своим именем), обходится один раз:
+        # roots — том -> корень, aliases — любой том -> том из roots с тем же корнем
+        self.roots = {}
+        self.aliases = {}
+        for volume, root in volume_roots().items():
+            root = os.path.realpath(root)
+            canonical = next((name for name, path in self.roots.items() if path == root), volume)
+            self.roots.setdefault(canonical, root)
+            self.aliases[volume] = canonical
+        self.excluded = {os.path.realpath(settings.FILES_RENDITION_ROOT)}
+        self.throttle = Throttle(options["rate"])
+
+        # База и диск читаются параллельно; пути — пары (том, путь в томе)
+        with ThreadPoolExecutor(max_workers=max(1, options["workers"]) + 1) as pool:
+            references = pool.submit(self._load_references)
+            scans = [
+                pool.submit(self._scan, volume, root)
+                for volume in self.roots for root in self._scan_roots(volume)
+            ]
+            on_disk = {}
+            for scan in scans:
+                on_disk.update(scan.result())
+            file_names, blob_names, session_names = references.result()
+
+        referenced = set(file_names) | blob_names | session_names
+        cutoff = time.time() - options["min_age"]
+        orphans = sorted(
+            name for name, (mtime, _) in on_disk.items()
+            if name not in referenced and mtime < cutoff
+        )
+        dangling_files = sorted(
+            (file_id, name) for name, file_id in file_names.items() if name not in on_disk
+        )
+        dangling_blobs = sorted(name for name in blob_names if name not in on_disk)
+
+        for name in orphans:
+            self.stdout.write(f"Сирота: {self._display(name)} ({on_disk[name][1]} байт)")
+        for file_id, name in dangling_files:
+            self.stdout.write(f"Нет данных файла {file_id}: {self._display(name)}")
+        for name in dangling_blobs:
+            self.stdout.write(f"Нет данных blob'а: {self._display(name)}")
+        blobs_fixed = self._check_blobs(options["fix_blobs"])
+
+        deleted = reclaimed = 0
+        if options["delete_orphans"]:
+            for name in orphans:
+                size = self._delete_orphan(name, cutoff)
+                if size is not None:
+                    deleted += 1
+                    reclaimed += size
+            self._remove_empty_dirs()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Файлов на диске: {len(on_disk)}, сирот: {len(orphans)} "
+            f"({sum(on_disk[name][1] for name in orphans)} байт), "
+            f"записей File без данных: {len(dangling_files)}, blob'ов без данных: {len(dangling_blobs)}, "
+            f"исправлено blob'ов: {blobs_fixed}, удалено сирот: {deleted} ({reclaimed} байт)"
+        ))
+
+    def _key(self, volume, name):
+        # Ссылки на том с неизвестным корнем не совпадут ни с одним файлом на диске
+        return self.aliases.get(volume, volume), name
+
+    def _display(self, key):
+        volume, name = key
+        return f"{volume}:{name}" if volume else name
+
+    def _load_references(self):
+        try:
+            file_names = dict(
+                (self._key(volume, name), file_id)
+                for file_id, volume, name in File.objects.values_list("id", "volume", "file").iterator()
+            )
+            blob_names = {self._key(volume, name) for volume, name in Blob.objects.values_list("volume", "name")}
+            session_names = {
+                self._key(volume, name)
+                for volume, name in UploadSession.objects.values_list("volume", "storage_name")
+            }
+            return file_names, blob_names, session_names
+        finally:
+            connections.close_all()
+
+    def _scan_roots(self, volume):
+        """Каталоги второго уровня тома (users/<имя>, blobs/<ab>) — единицы параллельного обхода."""
+        roots = []
+        root = self.roots[volume]
+        if not os.path.isdir(root):
+            return roots
+        # Файлы корня тома и каталогов первого уровня обходятся без рекурсии
+        roots.append((root, False))
+        for top in self._subdirs(root):
+            roots.append((top, False))
+            roots.extend((child, True) for child in self._subdirs(top))
+        return roots
+
+    def _subdirs(self, path):
+        with os.scandir(path) as entries:
+            return [
+                entry.path for entry in entries
+                if entry.is_dir(follow_symlinks=False) and entry.path not in self.excluded
+            ]
+
+    def _scan(self, volume, root):
+        path, recursive = root
+        found = {}
+        if recursive:
+            walker = os.walk(path)
+        else:
+            with os.scandir(path) as entries:
+                walker = [(path, [], [e.name for e in entries if e.is_file(follow_symlinks=False)])]
+        for dirpath, dirnames, filenames in walker:
+            dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) not in self.excluded]
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                self.throttle.wait()
+                try:
+                    stat = os.stat(full_path, follow_symlinks=False)
+                except OSError:
+                    continue
+                found[(volume, os.path.relpath(full_path, self.roots[volume]))] = (stat.st_mtime, stat.st_size)
+        return found
+
+    def _check_blobs(self, fix):
+        fixed = 0
+        mismatched = Blob.objects.annotate(refs=Count("files")).values_list("id", "name", "ref_count", "refs")
+        for blob_id, name, ref_count, refs in mismatched.iterator():
+            if ref_count == refs:
+                continue
+            self.stdout.write(f"Счётчик ссылок blob'а {name}: {ref_count}, файлов: {refs}")
+            if fix and self._fix_blob(blob_id):
+                fixed += 1
+        return fixed
+
+    def _fix_blob(self, blob_id):
+        with transaction.atomic():
+            # Под блокировкой строки: загрузка того же содержимого ждёт её в attach_blob
+            blob = Blob.objects.select_for_update().filter(pk=blob_id).first()
+            if blob is None:
+                return False
+            refs = File.objects.filter(blob_id=blob_id).count()
+            if refs:
+                Blob.objects.filter(pk=blob_id).update(ref_count=refs)
+                return True
+        release_blob(blob_id, blob.ref_count)
+        return True
+
+    def _delete_orphan(self, key, cutoff):
+        """Удаляет сироту после повторной проверки; возвращает размер или None."""
+        volume, name = key
+        volumes = [alias for alias, target in self.aliases.items() if target == volume]
+        self.throttle.wait()
+        # Запись могла появиться после чтения базы
+        if (
+            File.objects.filter(volume__in=volumes, file=name).exists()
+            or Blob.objects.filter(volume__in=volumes, name=name).exists()
+            or UploadSession.objects.filter(volume__in=volumes, storage_name=name).exists()
+        ):
+            return None
+        full_path = os.path.join(self.roots[volume], name)
+        if self._restore_tombstone(volumes, name, full_path):
+            return None
+        try:
+            stat = os.stat(full_path, follow_symlinks=False)
+            if stat.st_mtime >= cutoff:
+                return None
+            os.remove(full_path)
+        except OSError:
+            return None
+        return stat.st_size
+
+    def _restore_tombstone(self, volumes, name, full_path):
+        """Возвращает на место данные blob'а, удаление которого откатилось (см. release_blob)."""
+        blob_name, sep, _ = name.rpartition(TOMBSTONE_SUFFIX)
+        if not sep:
+            return False
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(volume__in=volumes, name=blob_name).first()
+            target = os.path.join(os.path.dirname(full_path), os.path.basename(blob_name))
+            if blob is None or os.path.exists(target):
+                return False
+            os.rename(full_path, target)
+        self.stdout.write(f"Восстановлены данные blob'а {blob_name}")
+        return True
+
+    def _remove_empty_dirs(self):
+        for root in self.roots.values():
+            for dirpath, _, _ in os.walk(root, topdown=False):
+                if dirpath == root or any(
+                    dirpath == excluded or dirpath.startswith(excluded + os.sep) for excluded in self.excluded
+                ):
+                    continue
+                # Каталоги первого уровня (users, blobs) остаются
+                if os.path.dirname(dirpath) == root:
+                    continue
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:57
+
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_extension(apps, schema_editor):
+    File = apps.get_model("files", "File")
+    for file_obj in File.objects.filter(extension="").only("id", "original_name").iterator():
+        extension = os.path.splitext(file_obj.original_name)[1].lstrip(".").lower()[:16]
+        if extension:
+            File.objects.filter(pk=file_obj.pk).update(extension=extension)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0006_blob_file_blob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='extension',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.RunPython(fill_extension, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'uploaded_at', 'id'], name='file_owner_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'name', 'id'], name='file_owner_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'size', 'id'], name='file_owner_size_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'last_downloaded_at', 'id'], name='file_owner_downloaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'extension', 'uploaded_at', 'id'], name='file_owner_ext_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0007_file_extension_file_file_owner_uploaded_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='download_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0008_file_download_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShareRevocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_id', models.BigIntegerField(db_index=True)),
+                ('revoked_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:15
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_stored_size(apps, schema_editor):
+    # Данные, загруженные до сжатия, лежат на диске как есть
+    for model in ("Blob", "File"):
+        apps.get_model("files", model).objects.update(stored_size=F("size"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0012_file_deleted_at_file_file_deleted_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='codec',
+            field=models.CharField(blank=True, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='blob',
+            name='stored_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='codec',
+            field=models.CharField(blank=True, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='stored_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_stored_size, migrations.RunPython.noop),
+    ]
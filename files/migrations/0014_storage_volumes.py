@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0013_file_codec'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='volume',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='volume',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='volume',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
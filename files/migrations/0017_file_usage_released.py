@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0016_storagestatsrefresh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='usage_released',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -7,33 +7,237 @@ import os
 def user_storage_path(instance, filename):
     """
     Генерация пути для сохранения файла:
-    users/<username>/<uuid4>.<ext>
+    users/<username>/<ab>/<cd>/<uuid4>.<ext>
+
+    Два уровня подкаталогов по началу uuid, чтобы у активных пользователей
+    в одном каталоге не копились сотни тысяч файлов.
     """
     ext = filename.split(".")[-1]
-    filename = f"{uuid.uuid4()}.{ext}"
-    return os.path.join("users", instance.owner.username, filename)
+    name = str(uuid.uuid4())
+    return os.path.join("users", instance.owner.username, name[:2], name[2:4], f"{name}.{ext}")
+
+
+def file_extension(name):
+    return os.path.splitext(name)[1].lstrip(".").lower()[:16]
+
+
+class Blob(models.Model):
+    """Данные файла в режиме CAS: один blob на SHA-256 содержимого."""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    # Путь относительно корня тома volume ("" — MEDIA_ROOT)
+    name = models.CharField(max_length=500)
+    volume = models.CharField(max_length=64, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    # Кодек сжатия данных на диске ("" — без сжатия) и их размер
+    codec = models.CharField(max_length=8, blank=True)
+    stored_size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} refs)"
+
+
+class FileQuerySet(models.QuerySet):
+    def alive(self):
+        """Файлы не в корзине."""
+        return self.filter(deleted_at__isnull=True)
+
+    def trashed(self):
+        return self.filter(deleted_at__isnull=False)
 
 
 class File(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     file = models.FileField(upload_to=user_storage_path)
+    # Том хранилища с данными файла ("" — MEDIA_ROOT), см. FILES_VOLUMES
+    volume = models.CharField(max_length=64, blank=True)
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name="files")
 
     original_name = models.CharField(max_length=255) 
     name = models.CharField(max_length=255)  
+    # Расширение исходного имени в нижнем регистре, для фильтра списка
+    extension = models.CharField(max_length=16, blank=True)
     comment = models.TextField(blank=True)
 
     uploaded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_downloaded_at = models.DateTimeField(blank=True, null=True)
+    download_count = models.PositiveBigIntegerField(default=0)
 
-    size = models.PositiveIntegerField(default=0)
+    # Размер исходного файла; на диске данные могут лежать сжатыми
+    size = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    # Кодек сжатия данных на диске ("" — без сжатия) и их размер
+    codec = models.CharField(max_length=8, blank=True)
+    stored_size = models.PositiveBigIntegerField(default=0)
 
     share_token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    # Когда последний раз выдана подписанная ссылка: отзыв нужен только таким файлам
+    shared_at = models.DateTimeField(blank=True, null=True)
+
+    # Время перемещения в корзину; данные удаляются после FILES_TRASH_RETENTION_DAYS
+    deleted_at = models.DateTimeField(blank=True, null=True)
+    # Квота уже освобождена при очистке корзины, осталось удалить данные
+    usage_released = models.BooleanField(default=False)
+
+    objects = FileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at"], name="file_deleted_idx"),
+            # Ключи keyset-пагинации списка: (владелец, поле сортировки, id)
+            models.Index(fields=["owner", "uploaded_at", "id"], name="file_owner_uploaded_idx"),
+            models.Index(fields=["owner", "name", "id"], name="file_owner_name_idx"),
+            models.Index(fields=["owner", "size", "id"], name="file_owner_size_idx"),
+            models.Index(fields=["owner", "last_downloaded_at", "id"], name="file_owner_downloaded_idx"),
+            models.Index(fields=["owner", "extension", "uploaded_at", "id"], name="file_owner_ext_idx"),
+        ]
 
     def save(self, *args, **kwargs):
-        if self.file and hasattr(self.file, "size"):
+        # Размер с диска — только для новых записей без него: загрузки передают
+        # исходный размер сами, а на диске может лежать сжатая копия
+        if self._state.adding and not self.size and not self.codec and self.file and hasattr(self.file, "size"):
             self.size = self.file.size
+        if self._state.adding and not self.codec and not self.stored_size:
+            self.stored_size = self.size
+        if not self.extension and self.original_name:
+            self.extension = file_extension(self.original_name)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.original_name} ({self.name})"
+
+
+class UploadSession(models.Model):
+    """Сессия загрузки большого файла по частям."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+
+    original_name = models.CharField(max_length=255)
+    comment = models.TextField(blank=True)
+
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # Путь итогового файла относительно корня тома, части пишутся сразу в него
+    storage_name = models.CharField(max_length=500)
+    volume = models.CharField(max_length=64, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def total_chunks(self):
+        return (self.size + self.chunk_size - 1) // self.chunk_size
+
+    def chunk_bounds(self, index):
+        """Смещение и длина части с номером index."""
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.size - offset)
+
+    def __str__(self):
+        return f"{self.original_name} ({self.id})"
+
+
+class UploadChunk(models.Model):
+    """Принятая часть файла в сессии загрузки."""
+
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name="chunks")
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["session", "index"], name="unique_upload_chunk"),
+        ]
+
+
+class ShareRevocation(models.Model):
+    """Отзыв подписанных публичных ссылок: недействительны все, выданные до revoked_at.
+
+    file_id — не внешний ключ: запись должна пережить удаление файла.
+    """
+
+    file_id = models.BigIntegerField(db_index=True)
+    revoked_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"file {self.file_id} revoked at {self.revoked_at}"
+
+
+class ShareDownload(models.Model):
+    """Счётчик скачиваний подписанной ссылки с лимитом (по её идентификатору j)."""
+
+    token_id = models.CharField(max_length=32, unique=True)
+    count = models.PositiveIntegerField(default=0)
+    # После срока действия ссылки счётчик не нужен и удаляется
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.token_id}: {self.count} downloads"
+
+
+class ExtensionStat(models.Model):
+    """Предрасчитанная статистика файлов по расширению (для панели администратора)."""
+
+    extension = models.CharField(max_length=16, unique=True)
+    file_count = models.PositiveBigIntegerField(default=0)
+    total_bytes = models.PositiveBigIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.extension or '-'}: {self.file_count} files"
+
+
+class MonthlyStat(models.Model):
+    """Предрасчитанная статистика загрузок по месяцам."""
+
+    month = models.DateField(unique=True)
+    file_count = models.PositiveBigIntegerField(default=0)
+    total_bytes = models.PositiveBigIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.file_count} files"
+
+
+class StorageStatsRefresh(models.Model):
+    """Время последнего пересчёта статистики (одна строка; есть и при пустом хранилище)."""
+
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"storage stats refreshed at {self.refreshed_at}"
+
+
+class FileChange(models.Model):
+    """Журнал изменений файлов пользователя для синхронизации клиентов.
+
+    id — номер изменения, по нему клиент запрашивает всё, что было после.
+    file_id — не внешний ключ: запись об удалении переживает сам файл.
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    ACTIONS = [
+        (CREATED, "created"),
+        (UPDATED, "updated"),
+        (DELETED, "deleted"),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="file_changes")
+    file_id = models.BigIntegerField()
+    action = models.CharField(max_length=16, choices=ACTIONS)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "id"], name="filechange_owner_seq_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.action} file {self.file_id}"
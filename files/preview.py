@@ -0,0 +1,118 @@
+"""Ограниченный предпросмотр текстовых файлов (txt, csv, json).
+
+Из файла читается только окно не больше ``FILES_PREVIEW_MAX_BYTES``:
+с начала или с заданного смещения (``head``), либо конец файла (``tail``).
+Окно выравнивается по границам строк, а его границы возвращаются клиенту,
+чтобы листать большой файл вперёд и назад. Сжатые файлы распаковываются до
+конца окна (для tail — до конца файла), в память попадает только окно.
+"""
+import os
+
+from django.conf import settings
+
+from .compression import CODEC_NONE, open_reader
+
+TEXT_PREVIEW_TYPES = {
+    ".txt": "text/plain",
+    ".csv": "text/csv",
+    ".json": "application/json",
+}
+
+MODE_HEAD = "head"
+MODE_TAIL = "tail"
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class PreviewError(ValueError):
+    """Некорректные параметры предпросмотра."""
+
+
+def _non_negative(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise PreviewError(f"Invalid {name}") from None
+    if number < 0:
+        raise PreviewError(f"Invalid {name}")
+    return number
+
+
+def _read(f, start, length):
+    f.seek(start)
+    parts = []
+    while length > 0:
+        block = f.read(min(READ_BLOCK_SIZE, length))
+        if not block:
+            break
+        parts.append(block)
+        length -= len(block)
+    return b"".join(parts)
+
+
+def _skip_lines(f, lines):
+    """Смещение начала строки с номером ``lines`` (с нуля), не читая файл целиком в память."""
+    f.seek(0)
+    position = 0
+    while lines > 0:
+        block = f.read(READ_BLOCK_SIZE)
+        if not block:
+            break
+        index = -1
+        while lines > 0:
+            index = block.find(b"\n", index + 1)
+            if index < 0:
+                break
+            lines -= 1
+        if lines == 0:
+            return position + index + 1
+        position += len(block)
+    return position
+
+
+def read_window(file_path, params, codec=CODEC_NONE, size=None):
+    """Окно текста по параметрам mode, offset, line, limit.
+
+    Для сжатых данных (``codec``) нужен ``size`` — исходный размер файла.
+    Возвращает (байты, начало, конец, размер файла); конец — позиция сразу
+    за последним байтом окна.
+    """
+    mode = params.get("mode") or MODE_HEAD
+    if mode not in (MODE_HEAD, MODE_TAIL):
+        raise PreviewError("Invalid mode")
+    max_bytes = settings.FILES_PREVIEW_MAX_BYTES
+    limit = _non_negative(params.get("limit"), "limit") or max_bytes
+    limit = min(limit, max_bytes)
+    offset = _non_negative(params.get("offset"), "offset")
+    line = _non_negative(params.get("line"), "line")
+
+    if not codec:
+        size = os.path.getsize(file_path)
+    with open_reader(file_path, codec) as f:
+        if mode == MODE_TAIL:
+            # offset в режиме tail — конец окна, по умолчанию конец файла
+            end = size if offset is None else min(offset, size)
+            start = max(0, end - limit)
+            data = _read(f, start, end - start)
+            if start > 0:
+                # Первая строка окна неполная — отбрасываем её
+                newline = data.find(b"\n")
+                if 0 <= newline < len(data) - 1:
+                    start += newline + 1
+                    data = data[newline + 1:]
+            return data, start, end, size
+
+        if line is not None:
+            start = _skip_lines(f, line)
+        else:
+            start = min(offset or 0, size)
+        data = _read(f, start, limit)
+        end = start + len(data)
+        if end < size:
+            # Последняя строка окна неполная — оставляем её следующей странице
+            newline = data.rfind(b"\n")
+            if newline >= 0:
+                data = data[:newline + 1]
+                end = start + len(data)
+        return data, start, end, size
@@ -0,0 +1,55 @@
+"""Квоты хранилища и счётчики занятого места пользователя.
+
+``bytes_used`` и ``file_count`` меняются одним UPDATE при загрузке и удалении
+файла; при загрузке UPDATE условный и не срабатывает, если файл не влезает
+в квоту, поэтому параллельные загрузки не превысят её. Открытая сессия
+загрузки по частям учитывается в счётчиках как будущий файл. Расхождения
+исправляет команда ``reconcile_usage``.
+"""
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from accounts.models import User
+
+
+def quota_for(quota_bytes):
+    """Действующая квота пользователя в байтах; None — без ограничения."""
+    if quota_bytes is not None:
+        return quota_bytes
+    return settings.FILES_USER_QUOTA or None
+
+
+def remaining_quota(owner_id):
+    """Сколько байт ещё можно загрузить; None — без ограничения.
+
+    Читает свежие значения из базы, а не из request.user.
+    """
+    row = User.objects.filter(pk=owner_id).values("quota_bytes", "bytes_used").first()
+    if row is None:
+        return 0
+    quota = quota_for(row["quota_bytes"])
+    if quota is None:
+        return None
+    return max(0, quota - row["bytes_used"])
+
+
+def reserve_usage(owner_id, size):
+    """Учитывает новый файл, если он помещается в квоту. False — не помещается."""
+    fits = Q(quota_bytes__isnull=False, quota_bytes__gte=F("bytes_used") + size)
+    if settings.FILES_USER_QUOTA:
+        fits |= Q(quota_bytes__isnull=True, bytes_used__lte=settings.FILES_USER_QUOTA - size)
+    else:
+        fits |= Q(quota_bytes__isnull=True)
+    return User.objects.filter(fits, pk=owner_id).update(
+        bytes_used=F("bytes_used") + size,
+        file_count=F("file_count") + 1,
+    ) > 0
+
+
+def release_usage(owner_id, size, count=1):
+    """Вычитает удалённые файлы из счётчиков владельца."""
+    User.objects.filter(pk=owner_id).update(
+        bytes_used=Greatest(F("bytes_used") - size, 0),
+        file_count=Greatest(F("file_count") - count, 0),
+    )
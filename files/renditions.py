@@ -0,0 +1,184 @@
+"""Уменьшенные копии изображений для галереи.
+
+Миниатюра создаётся при первом запросе (или сразу после загрузки при
+``FILES_THUMBNAILS_EAGER``) и хранится в дисковом кеше
+``FILES_RENDITION_ROOT`` ограниченного размера. При чтении у файла
+обновляется mtime, а при переполнении удаляются самые давно
+использованные миниатюры (LRU).
+"""
+import glob
+import logging
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+try:
+    from PIL import Image  # type: ignore
+    _PIL_AVAILABLE = True
+except Exception:
+    Image = None  # type: ignore
+    _PIL_AVAILABLE = False
+
+from .storage import data_path
+
+logger = logging.getLogger(__name__)
+
+RENDITION_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
+# Фиксированный набор размеров ограничивает число вариантов в кеше
+THUMBNAIL_SIZES = (128, 256, 512)
+DEFAULT_THUMBNAIL_SIZE = 256
+# После вытеснения кеш занимает не больше этой доли лимита
+EVICTION_TARGET = 0.9
+
+_lock = threading.Lock()
+# Примерный объём кеша в этом процессе; None — ещё не посчитан
+_cache_bytes = None
+
+
+class RenditionError(Exception):
+    """Миниатюру построить нельзя."""
+
+
+def supports_rendition(file_obj):
+    return _PIL_AVAILABLE and file_obj.extension in RENDITION_EXTENSIONS
+
+
+def _root():
+    return settings.FILES_RENDITION_ROOT
+
+
+def _shard(file_id):
+    return os.path.join(_root(), f"{file_id % 256:02x}")
+
+
+def rendition_path(file_obj, size):
+    """Путь миниатюры; в имени — версия содержимого, чтобы изменения не отдавали старую."""
+    version = file_obj.sha256[:16] if file_obj.sha256 else f"{int(file_obj.updated_at.timestamp())}"
+    return os.path.join(_shard(file_obj.id), f"{file_obj.id}-{size}-{version}.jpg")
+
+
+def _render(source_path, target_path, size):
+    with Image.open(source_path) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе
+        image.draft("RGB", (size, size))
+        image.seek(0)
+        image.thumbnail((size, size))
+        if image.mode != "RGB":
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                image.save(tmp, "JPEG", quality=80, optimize=True)
+            os.replace(tmp_path, target_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return os.path.getsize(target_path)
+
+
+def get_thumbnail(file_obj, size=DEFAULT_THUMBNAIL_SIZE):
+    """Путь к миниатюре, построенной при необходимости."""
+    if not supports_rendition(file_obj):
+        raise RenditionError("Thumbnails are not supported for this file")
+    if size not in THUMBNAIL_SIZES:
+        raise RenditionError("Invalid thumbnail size")
+
+    target_path = rendition_path(file_obj, size)
+    if os.path.exists(target_path):
+        try:
+            # Отметка использования для LRU
+            os.utime(target_path)
+        except OSError:
+            pass
+        return target_path
+
+    source_path = data_path(file_obj)
+    if source_path is None or not os.path.exists(source_path):
+        raise RenditionError("File not found")
+    try:
+        written = _render(source_path, target_path, size)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning("Thumbnail for file %s failed: %s", file_obj.id, exc)
+        raise RenditionError("Thumbnail not available") from exc
+    _account(written)
+    return target_path
+
+
+def generate_thumbnails(file_id):
+    """Построение миниатюр сразу после загрузки (фоновая задача)."""
+    from .models import File
+
+    file_obj = File.objects.filter(pk=file_id).first()
+    if file_obj is None or not supports_rendition(file_obj):
+        return
+    for size in THUMBNAIL_SIZES:
+        try:
+            get_thumbnail(file_obj, size)
+        except RenditionError:
+            return
+
+
+def invalidate(file_id):
+    """Удаляет все миниатюры файла."""
+    for path in glob.glob(os.path.join(_shard(file_id), f"{file_id}-*")):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            continue
+        _account(-size)
+
+
+def _scan():
+    entries = []
+    for dirpath, _, filenames in os.walk(_root()):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def _account(delta):
+    global _cache_bytes
+    with _lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(size for _, size, _ in _scan())
+        _cache_bytes = max(0, _cache_bytes + delta)
+        over_limit = _cache_bytes > settings.FILES_RENDITION_CACHE_BYTES
+    if over_limit:
+        evict()
+
+
+def evict():
+    """Удаляет давно использованные миниатюры, пока кеш не уложится в лимит."""
+    global _cache_bytes
+    with _lock:
+        entries = _scan()
+        total = sum(size for _, size, _ in entries)
+        target = settings.FILES_RENDITION_CACHE_BYTES * EVICTION_TARGET
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        _cache_bytes = total
+    if removed:
+        logger.info("Rendition cache: evicted %d thumbnails", removed)
+    return removed
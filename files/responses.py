@@ -0,0 +1,325 @@
+"""Ответы с содержимым файлов: полная отдача и HTTP Range (206 Partial Content).
+
+С ``async_stream=True`` тело ответа — асинхронный итератор, блоки которого
+читаются в пуле потоков: под ASGI медленный клиент не занимает поток, а
+Django не буферизует синхронный итератор целиком в памяти.
+"""
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from .compression import accepts_encoding, iter_decompressed
+from .storage import DEFAULT_VOLUME, locate
+
+OFFLOAD_X_ACCEL = "x-accel"
+OFFLOAD_X_SENDFILE = "x-sendfile"
+
+STREAM_BLOCK_SIZE = 64 * 1024
+# Больше диапазонов в одном запросе не обслуживаем — отдаём файл целиком
+MAX_RANGES = 16
+
+_RANGE_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def parse_range_header(header, size):
+    """Разбирает заголовок Range.
+
+    Возвращает список пар (start, end) включительно, пустой список, если
+    ни один диапазон не попадает в файл, или None, если заголовок нужно
+    проигнорировать (неизвестная единица, синтаксическая ошибка, слишком
+    много диапазонов).
+    """
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        match = _RANGE_RE.match(part)
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first and not last:
+            return None
+        if not first:
+            # Суффикс: последние N байт
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                return None
+            end = min(end, size - 1)
+        if start < size:
+            ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Пересекающиеся и соседние диапазоны склеиваем
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _if_range_matches(request, etag, last_modified):
+    """If-Range: частичный ответ только если представление не изменилось."""
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Сравнение ETag в If-Range только строгое
+        return etag is not None and not if_range.startswith("W/") and if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and last_modified is not None and int(last_modified) <= if_range_date
+
+
+def _iter_file_range(file_path, start, end):
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _iter_multipart(file_path, parts, boundary):
+    for header, (start, end) in parts:
+        yield header
+        yield from _iter_file_range(file_path, start, end)
+    yield f"\r\n--{boundary}--\r\n".encode("ascii")
+
+
+async def aiter_blocking(iterator):
+    """Асинхронная обёртка над итератором с блокирующим чтением: каждый блок — в пуле потоков."""
+    done = object()
+    try:
+        while True:
+            block = await asyncio.to_thread(next, iterator, done)
+            if block is done:
+                break
+            yield block
+    finally:
+        # Клиент мог отключиться посреди передачи: файл закрывается сразу
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def _stream(iterator, async_stream):
+    return aiter_blocking(iterator) if async_stream else iterator
+
+
+def _full_file_response(file_path, size, filename, content_type, as_attachment, async_stream):
+    if not async_stream:
+        return FileResponse(
+            open(file_path, "rb"),
+            as_attachment=as_attachment,
+            filename=filename,
+            content_type=content_type,
+        )
+    response = StreamingHttpResponse(
+        aiter_blocking(_iter_file_range(file_path, 0, size - 1)), content_type=content_type
+    )
+    response["Content-Length"] = str(size)
+    disposition = content_disposition_header(as_attachment, filename)
+    if disposition:
+        response["Content-Disposition"] = disposition
+    return response
+
+
+def content_etag(file_obj):
+    """Строгий ETag данных файла: SHA-256, а без него — updated_at и размер."""
+    if file_obj.sha256:
+        return f'"{file_obj.sha256}"'
+    return f'"{int(file_obj.updated_at.timestamp() * 1_000_000):x}-{file_obj.size:x}"'
+
+
+def content_last_modified(file_obj):
+    # HTTP-даты с точностью до секунды
+    return int(file_obj.updated_at.timestamp())
+
+
+def listing_etag(owner_id, version, query_string=""):
+    """ETag списка файлов: версия изменений владельца плюс параметры запроса."""
+    query_hash = hashlib.sha1(query_string.encode("utf-8")).hexdigest()[:12]
+    return f'"files-{owner_id}-{version}-{query_hash}"'
+
+
+def conditional_response(request, etag=None, last_modified=None):
+    """304/412 по If-None-Match, If-Modified-Since и т.п. или None, если нужен полный ответ.
+
+    Вызывается до открытия файла и сериализации данных.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        if etag:
+            response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def offload_response(file_path, filename, content_type, as_attachment, mode):
+    """Пустой ответ с заголовком внутреннего редиректа: байты отдаёт фронт-прокси.
+
+    Права и путь уже проверены вызывающим кодом; Range прокси обрабатывает сам.
+    Файлы томов хранилища адресуются как ``<префикс>/<том>/<путь>``.
+    """
+    response = HttpResponse(content_type=content_type)
+    if mode == OFFLOAD_X_ACCEL:
+        volume, relative = locate(file_path)
+        if volume is None:
+            volume, relative = DEFAULT_VOLUME, os.path.relpath(file_path, os.path.realpath(settings.MEDIA_ROOT))
+        prefix = settings.FILES_ACCEL_REDIRECT_PREFIX.rstrip("/")
+        if volume != DEFAULT_VOLUME:
+            prefix = f"{prefix}/{quote(volume)}"
+        response["X-Accel-Redirect"] = f"{prefix}/{quote(relative.replace(os.sep, '/'))}"
+    else:
+        response["X-Sendfile"] = file_path
+    disposition = content_disposition_header(as_attachment, filename)
+    if disposition:
+        response["Content-Disposition"] = disposition
+    return response
+
+
+def compressed_file_response(request, file_path, filename, codec, size=None, content_type=None,
+                             as_attachment=True, etag=None, last_modified=None, async_stream=False):
+    """Ответ с файлом, данные которого лежат на диске сжатыми кодеком codec.
+
+    Клиенту, принимающему кодек, отдаются байты с диска с Content-Encoding,
+    остальным — распакованный поток длиной ``size``. Range не поддерживается:
+    смещения в сжатых данных не совпадают с исходными.
+    """
+    if last_modified is None:
+        last_modified = os.stat(file_path).st_mtime
+    if accepts_encoding(request, codec):
+        response = _full_file_response(
+            file_path, os.path.getsize(file_path), filename, content_type, as_attachment, async_stream
+        )
+        response["Content-Encoding"] = codec
+        # Байты отличаются от исходных, поэтому ETag слабый; If-None-Match его
+        # всё равно совпадёт со строгим ETag файла
+        if etag and not etag.startswith("W/"):
+            etag = f"W/{etag}"
+    else:
+        response = StreamingHttpResponse(
+            _stream(iter_decompressed(file_path, codec), async_stream), content_type=content_type
+        )
+        disposition = content_disposition_header(as_attachment, filename)
+        if disposition:
+            response["Content-Disposition"] = disposition
+        if size is not None:
+            response["Content-Length"] = str(size)
+    patch_vary_headers(response, ["Accept-Encoding"])
+    response["Accept-Ranges"] = "none"
+    response["Last-Modified"] = http_date(last_modified)
+    if etag:
+        response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def file_response(request, file_path, filename, content_type=None, as_attachment=True, etag=None,
+                  last_modified=None, codec="", size=None, async_stream=False):
+    """Ответ с содержимым файла с поддержкой Range, If-Range и multipart/byteranges.
+
+    ``etag`` — строгий ETag в кавычках, ``last_modified`` — timestamp,
+    по умолчанию время изменения файла на диске. При
+    ``FILES_DOWNLOAD_OFFLOAD`` передача отдаётся фронт-прокси. Сжатые данные
+    (``codec``, ``size`` — исходный размер) отдаёт compressed_file_response:
+    прокси не передал бы клиенту Content-Encoding. ``async_stream`` — для
+    асинхронных представлений.
+    """
+    if content_type is None:
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if codec:
+        return compressed_file_response(
+            request, file_path, filename, codec, size=size, content_type=content_type,
+            as_attachment=as_attachment, etag=etag, last_modified=last_modified, async_stream=async_stream,
+        )
+
+    offload = getattr(settings, "FILES_DOWNLOAD_OFFLOAD", "")
+    if offload in (OFFLOAD_X_ACCEL, OFFLOAD_X_SENDFILE):
+        response = offload_response(file_path, filename, content_type, as_attachment, offload)
+        if etag:
+            response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    stat = os.stat(file_path)
+    size = stat.st_size
+    if last_modified is None:
+        last_modified = stat.st_mtime
+
+    range_header = request.META.get("HTTP_RANGE")
+    ranges = None
+    if range_header and request.method in ("GET", "HEAD") and _if_range_matches(request, etag, last_modified):
+        ranges = parse_range_header(range_header, size)
+
+    if ranges is None:
+        response = _full_file_response(file_path, size, filename, content_type, as_attachment, async_stream)
+    elif not ranges:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            _stream(_iter_file_range(file_path, start, end), async_stream), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    else:
+        boundary = uuid.uuid4().hex
+        parts = []
+        length = 0
+        for start, end in ranges:
+            header = (
+                f"\r\n--{boundary}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            ).encode("ascii")
+            parts.append((header, (start, end)))
+            length += len(header) + end - start + 1
+        length += len(f"\r\n--{boundary}--\r\n")
+        response = StreamingHttpResponse(
+            _stream(_iter_multipart(file_path, parts, boundary), async_stream),
+            status=206,
+            content_type=f"multipart/byteranges; boundary={boundary}",
+        )
+        response["Content-Length"] = str(length)
+
+    if response.status_code == 206:
+        disposition = content_disposition_header(as_attachment, filename)
+        if disposition:
+            response["Content-Disposition"] = disposition
+    response["Accept-Ranges"] = "bytes"
+    response["Last-Modified"] = http_date(last_modified)
+    if etag:
+        response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
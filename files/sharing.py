@@ -0,0 +1,242 @@
+"""Подписанные публичные ссылки.
+
+Токен ссылки — подписанный SECRET_KEY (HMAC) набор данных: id файла, время
+выдачи, срок действия, лимит скачиваний и id ссылки. Подпись не шифрует
+данные, поэтому владельца и расположения данных в токене нет: их по id файла
+даёт share_target — одна выборка по первичному ключу, дальше кеш на
+``FILES_SHARE_TARGET_CACHE_TTL`` секунд. Проверка токена не обращается к
+базе. Отозванные ссылки хранятся в памяти процесса: список
+подгружается из ShareRevocation не чаще раза в
+``FILES_SHARE_REVOCATION_REFRESH`` секунд, поэтому в других воркерах отзыв
+вступает в силу с этой задержкой.
+
+Ссылка живёт не дольше ``FILES_SHARE_MAX_TTL``: отзывы старше этого срока
+ничего не отменяют и удаляются, а отзыв пишется только для файлов, на которые
+за этот срок выдавались ссылки (``File.shared_at``). Счётчик скачиваний ссылки
+с лимитом хранится в базе (ShareDownload) и увеличивается условным UPDATE,
+поэтому лимит общий для всех воркеров.
+"""
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import File, ShareDownload, ShareRevocation
+from .responses import content_etag, content_last_modified
+from .storage import find_path
+
+SHARE_SALT = "files.share"
+# Запас при догрузке отзывов: строки, зафиксированные с опозданием, не теряются
+REVOCATION_SKEW = timedelta(minutes=1)
+# Как часто процесс удаляет устаревшие отзывы и счётчики скачиваний
+PRUNE_INTERVAL = 3600
+
+_lock = threading.Lock()
+# file_id -> время отзыва (timestamp): недействительны токены, выданные раньше
+_revoked = {}
+_synced_until = None
+_next_refresh = 0.0
+_next_prune = 0.0
+
+
+class ShareError(Exception):
+    """Ссылка недействительна; status — код ответа."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def max_ttl():
+    return timedelta(seconds=settings.FILES_SHARE_MAX_TTL)
+
+
+def make_share_token(file_obj, expires_in=None, max_downloads=None):
+    """Подписанный токен ссылки на файл. Возвращает (токен, срок действия).
+
+    Срок не больше FILES_SHARE_MAX_TTL; без expires_in — ровно он.
+    """
+    now = time.time()
+    expires_in = min(expires_in or settings.FILES_SHARE_MAX_TTL, settings.FILES_SHARE_MAX_TTL)
+    expires_at = int(now + expires_in)
+    payload = {
+        "f": file_obj.id,
+        "i": now,
+        "e": expires_at,
+        "m": max_downloads,
+        # Идентификатор ссылки для счётчика скачиваний
+        "j": secrets.token_urlsafe(8),
+    }
+    return signing.dumps(payload, salt=SHARE_SALT, compress=True), expires_at
+
+
+def share_target_key(file_id):
+    return f"files:share-target:{file_id}"
+
+
+def share_target(file_id, refresh=False):
+    """Что отдавать по ссылке на файл: владелец, данные, имя, ETag. None — файла нет.
+
+    Берётся по первичному ключу и кешируется; refresh — перечитать из базы.
+    """
+    key = share_target_key(file_id)
+    target = None if refresh else cache.get(key)
+    if target is not None:
+        return target
+    file_obj = File.objects.alive().filter(pk=file_id).only(
+        "owner_id", "file", "volume", "original_name", "codec", "size", "sha256", "updated_at",
+    ).first()
+    if file_obj is None:
+        cache.delete(key)
+        return None
+    target = {
+        "id": file_obj.id,
+        "owner_id": file_obj.owner_id,
+        "path": file_obj.file.name,
+        "volume": file_obj.volume,
+        "name": file_obj.original_name,
+        "codec": file_obj.codec,
+        "size": file_obj.size,
+        "etag": content_etag(file_obj),
+        "last_modified": content_last_modified(file_obj),
+    }
+    cache.set(key, target, settings.FILES_SHARE_TARGET_CACHE_TTL)
+    return target
+
+
+def shared_file_path(target):
+    """Путь к данным файла ссылки: (target, путь) или (target, None), если данных нет.
+
+    Кеш мог устареть (данные перенесены в blob): тогда target перечитывается
+    из базы. Перенос на другой том находит find_path и без этого.
+    """
+    file_path = find_path(target["path"], target["volume"])
+    if file_path is not None and os.path.exists(file_path):
+        return target, file_path
+    fresh = share_target(target["id"], refresh=True)
+    if fresh is None:
+        return target, None
+    file_path = find_path(fresh["path"], fresh["volume"])
+    return fresh, file_path if file_path is not None and os.path.exists(file_path) else None
+
+
+def is_signed_token(token):
+    # Старые ссылки — hex UUID, в подписанном токене всегда есть ':'
+    return ":" in token
+
+
+def _expires(payload):
+    # В ссылках, выданных до FILES_SHARE_MAX_TTL, срока могло не быть
+    return payload["e"] if payload["e"] is not None else payload["i"] + settings.FILES_SHARE_MAX_TTL
+
+
+def _refresh_revocations():
+    global _synced_until, _next_refresh
+    if time.monotonic() < _next_refresh:
+        return
+    with _lock:
+        if time.monotonic() < _next_refresh:
+            return
+        if _synced_until is not None:
+            rows = ShareRevocation.objects.filter(revoked_at__gte=_synced_until - REVOCATION_SKEW)
+        else:
+            rows = ShareRevocation.objects.filter(revoked_at__gte=timezone.now() - max_ttl())
+        for file_id, revoked_at in rows.values_list("file_id", "revoked_at"):
+            moment = revoked_at.timestamp()
+            if moment > _revoked.get(file_id, 0):
+                _revoked[file_id] = moment
+            if _synced_until is None or revoked_at > _synced_until:
+                _synced_until = revoked_at
+        if _synced_until is None:
+            _synced_until = timezone.now()
+        _next_refresh = time.monotonic() + settings.FILES_SHARE_REVOCATION_REFRESH
+    _prune()
+
+
+def _prune():
+    """Удаляет отзывы и счётчики ссылок, срок которых истёк (не чаще PRUNE_INTERVAL)."""
+    global _next_prune
+    if time.monotonic() < _next_prune:
+        return
+    _next_prune = time.monotonic() + PRUNE_INTERVAL
+    cutoff = timezone.now() - max_ttl()
+    with _lock:
+        for file_id in [file_id for file_id, moment in _revoked.items() if moment < cutoff.timestamp()]:
+            del _revoked[file_id]
+    ShareRevocation.objects.filter(revoked_at__lt=cutoff).delete()
+    ShareDownload.objects.filter(expires_at__lt=timezone.now()).delete()
+
+
+def mark_shared(file_obj):
+    """Отмечает выдачу ссылки: отзыв нужен только файлам, которыми делились."""
+    file_obj.shared_at = timezone.now()
+    File.objects.filter(id=file_obj.id).update(shared_at=file_obj.shared_at)
+
+
+def revoke_shares(*file_ids):
+    """Отзывает все выданные подписанные ссылки на файлы.
+
+    Запись отзыва создаётся только для файлов, на которые выдавались ещё не
+    истёкшие ссылки; вызывается внутри транзакции удаления файлов.
+    """
+    revoked_at = timezone.now()
+    shared_ids = []
+    for start in range(0, len(file_ids), 1000):
+        shared_ids += File.objects.filter(
+            id__in=file_ids[start:start + 1000], shared_at__gte=revoked_at - max_ttl(),
+        ).values_list("id", flat=True)
+    if not shared_ids:
+        return
+    ShareRevocation.objects.bulk_create(
+        [ShareRevocation(file_id=file_id, revoked_at=revoked_at) for file_id in shared_ids],
+        batch_size=1000,
+    )
+
+    def apply():
+        with _lock:
+            # В своём процессе — сразу, остальные увидят при следующей подгрузке
+            for file_id in shared_ids:
+                _revoked[file_id] = max(_revoked.get(file_id, 0), revoked_at.timestamp())
+
+    transaction.on_commit(apply)
+
+
+def verify_share_token(token):
+    """Данные ссылки после проверки подписи, срока и отзыва."""
+    try:
+        payload = signing.loads(token, salt=SHARE_SALT)
+    except signing.BadSignature:
+        raise ShareError("Share link not found", 404) from None
+    if _expires(payload) < time.time():
+        raise ShareError("Share link has expired", 410)
+    _refresh_revocations()
+    if payload["i"] <= _revoked.get(payload["f"], 0):
+        raise ShareError("Share link has been revoked", 410)
+    if payload["m"] is not None and ShareDownload.objects.filter(
+        token_id=payload["j"], count__gte=payload["m"],
+    ).exists():
+        raise ShareError("Download limit reached", 410)
+    return payload
+
+
+def count_download(payload):
+    """Учитывает скачивание по ссылке с лимитом. False — лимит уже исчерпан.
+
+    Счётчик увеличивается условным UPDATE (как резерв квоты): параллельные
+    скачивания в разных воркерах не превысят лимит.
+    """
+    if payload["m"] is None:
+        return True
+    expires_at = datetime.fromtimestamp(_expires(payload), tz=dt_timezone.utc)
+    ShareDownload.objects.get_or_create(token_id=payload["j"], defaults={"expires_at": expires_at})
+    return ShareDownload.objects.filter(token_id=payload["j"], count__lt=payload["m"]).update(
+        count=F("count") + 1,
+    ) > 0
@@ -0,0 +1,46 @@
+"""Реакция на удаление пользователя и запуск фоновой очистки корзины."""
+from django.db import transaction
+from django.db.models import Count
+from django.core.signals import request_started
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from accounts.models import User
+
+from . import renditions, trash
+from .background import submit
+from .models import File
+from .sharing import revoke_shares
+from .storage import detach_user_dirs, purge_user_data
+
+
+def _purge(detached_dirs, blob_refs, file_ids):
+    purge_user_data(detached_dirs, blob_refs)
+    for file_id in file_ids:
+        renditions.invalidate(file_id)
+
+
+@receiver(pre_delete, sender=User)
+def schedule_user_purge(sender, instance, **kwargs):
+    """Строки File удаляются каскадом, а данные — в фоне после фиксации транзакции."""
+    files = File.objects.filter(owner=instance)
+    file_ids = list(files.values_list("id", flat=True))
+    blob_refs = list(
+        files.filter(blob__isnull=False).order_by()
+        .values("blob_id").annotate(refs=Count("id")).values_list("blob_id", "refs")
+    )
+    # Публичные ссылки на общие blob'ы иначе продолжили бы работать
+    revoke_shares(*file_ids)
+    username = instance.username
+
+    def purge():
+        # Каталоги на всех томах переименовываются сразу, удаляются в фоне
+        submit(_purge, detach_user_dirs(username), blob_refs, file_ids)
+
+    transaction.on_commit(purge)
+
+
+@receiver(request_started)
+def start_trash_purger(sender, **kwargs):
+    # Поток запускается с первым запросом, а не при импорте: manage.py его не получит
+    trash.ensure_purger()
@@ -0,0 +1,115 @@
+"""Буфер статистики скачиваний.
+
+Скачивание только отмечает файл в памяти процесса; фоновый поток раз в
+``FILES_STATS_FLUSH_INTERVAL`` секунд (и при завершении процесса) пишет
+накопленные счётчики и время последнего скачивания одним UPDATE на пачку
+файлов. Путь скачивания не делает записей в базу. Версия списка файлов
+владельца (ETag листинга) при этом не меняется: иначе каждая запись
+счётчиков сбрасывала бы кеш списков у клиентов.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Case, DateTimeField, F, PositiveBigIntegerField, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import File
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+_lock = threading.Lock()
+# file_id -> [число скачиваний, время последнего, owner_id]
+_pending = {}
+_flusher = None
+
+
+def record_download(file_obj):
+    """Учитывает скачивание файла в буфере процесса."""
+    now = timezone.now()
+    with _lock:
+        entry = _pending.get(file_obj.id)
+        if entry is None:
+            _pending[file_obj.id] = [1, now, file_obj.owner_id]
+        else:
+            entry[0] += 1
+            entry[1] = now
+    if settings.FILES_STATS_FLUSH_INTERVAL <= 0:
+        flush()
+    else:
+        _ensure_flusher()
+
+
+def _write_batch(batch):
+    ids = list(batch)
+    counts = Case(
+        *[When(pk=pk, then=Value(batch[pk][0])) for pk in ids],
+        default=Value(0),
+        output_field=PositiveBigIntegerField(),
+    )
+    moments = Case(
+        *[When(pk=pk, then=Value(batch[pk][1])) for pk in ids],
+        output_field=DateTimeField(),
+    )
+    File.objects.filter(pk__in=ids).update(
+        download_count=F("download_count") + counts,
+        # Другой процесс мог уже записать более позднее время
+        last_downloaded_at=Greatest(Coalesce(F("last_downloaded_at"), moments), moments),
+    )
+
+
+def flush():
+    """Пишет накопленную статистику в базу. Возвращает число обновлённых файлов."""
+    global _pending
+    with _lock:
+        batch, _pending = _pending, {}
+    if not batch:
+        return 0
+
+    ids = list(batch)
+    try:
+        with transaction.atomic():
+            for i in range(0, len(ids), FLUSH_BATCH_SIZE):
+                _write_batch({pk: batch[pk] for pk in ids[i:i + FLUSH_BATCH_SIZE]})
+    except DatabaseError:
+        logger.exception("Failed to flush download stats for %d files", len(batch))
+        # Возвращаем в буфер, чтобы не потерять до следующей попытки
+        with _lock:
+            for pk, (count, moment, owner_id) in batch.items():
+                entry = _pending.get(pk)
+                if entry is None:
+                    _pending[pk] = [count, moment, owner_id]
+                else:
+                    entry[0] += count
+                    entry[1] = max(entry[1], moment)
+        return 0
+    return len(batch)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.FILES_STATS_FLUSH_INTERVAL)
+        try:
+            flush()
+        finally:
+            connections.close_all()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_flush_loop, name="download-stats-flusher", daemon=True)
+        _flusher.start()
+
+
+atexit.register(flush)
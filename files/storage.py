@@ -0,0 +1,326 @@
+"""Размещение и освобождение данных файлов на диске.
+
+В режиме ``FILES_STORAGE_MODE = "cas"`` данные хранятся как общие blob'ы,
+адресуемые по SHA-256 содержимого: одинаковые загрузки ссылаются на один
+blob, а файл на диске удаляется, только когда уходит последняя ссылка.
+
+Данные могут лежать на нескольких томах (``FILES_VOLUMES``): том новых
+данных выбирается взвешенным rendezvous-хешированием по ключу (SHA-256
+blob'а или путь файла), поэтому добавление тома переносит только долю
+данных, пропорциональную его весу. Том записывается в строку File, Blob
+или UploadSession; том "" — MEDIA_ROOT, в нём остаются данные, записанные
+до настройки томов, пока их не перенесёт команда ``rebalance_volumes``.
+"""
+import errno
+import hashlib
+import logging
+import math
+import os
+import shutil
+import uuid
+from collections import namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from .models import Blob
+
+logger = logging.getLogger(__name__)
+
+STORAGE_MODE_PLAIN = "plain"
+STORAGE_MODE_CAS = "cas"
+
+DEFAULT_VOLUME = ""
+
+# Данные blob'а без ссылок до фиксации удаления лежат рядом как <имя>.deleted-<uuid>
+TOMBSTONE_SUFFIX = ".deleted-"
+
+Volume = namedtuple("Volume", "name root weight")
+
+# (строка FILES_VOLUMES, разобранные тома) — разбор повторяется при её смене
+_volumes_cache = (None, None)
+
+
+def cas_enabled():
+    return getattr(settings, "FILES_STORAGE_MODE", STORAGE_MODE_PLAIN) == STORAGE_MODE_CAS
+
+
+def blob_name(sha256):
+    """blobs/ab/cd/<sha256> относительно MEDIA_ROOT."""
+    return os.path.join("blobs", sha256[:2], sha256[2:4], sha256)
+
+
+def parse_volumes(spec):
+    """Разбирает FILES_VOLUMES: "имя=путь[:вес],..." -> {имя: Volume}."""
+    volumes = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, root = item.partition("=")
+        name = name.strip()
+        weight = 1.0
+        head, colon, tail = root.rpartition(":")
+        if colon:
+            try:
+                root, weight = head, float(tail)
+            except ValueError:
+                pass
+        if not sep or not name or not root.strip() or weight <= 0 or name in volumes:
+            raise ImproperlyConfigured(f"Invalid FILES_VOLUMES entry: {item!r}")
+        volumes[name] = Volume(name, root.strip(), weight)
+    return volumes
+
+
+def configured_volumes():
+    """Тома для новых данных; без FILES_VOLUMES — только MEDIA_ROOT."""
+    global _volumes_cache
+    spec = getattr(settings, "FILES_VOLUMES", "")
+    if _volumes_cache[0] != spec:
+        _volumes_cache = (spec, parse_volumes(spec))
+    return _volumes_cache[1] or {DEFAULT_VOLUME: Volume(DEFAULT_VOLUME, settings.MEDIA_ROOT, 1.0)}
+
+
+def volume_roots():
+    """{имя тома: корень} для всех томов, с которых можно читать, включая MEDIA_ROOT."""
+    roots = {name: volume.root for name, volume in configured_volumes().items()}
+    roots.setdefault(DEFAULT_VOLUME, settings.MEDIA_ROOT)
+    return roots
+
+
+def _rendezvous_score(volume, key):
+    digest = hashlib.blake2b(f"{volume.name}\0{key}".encode("utf-8"), digest_size=8).digest()
+    # Равномерное число из (0, 1); при весе w том выигрывает пропорционально w
+    point = (int.from_bytes(digest, "big") + 1) / (2 ** 64 + 1)
+    return -volume.weight / math.log(point)
+
+
+def place_volume(key):
+    """Том для данных с ключом key (взвешенное rendezvous-хеширование)."""
+    return max(configured_volumes().values(), key=lambda volume: _rendezvous_score(volume, key)).name
+
+
+def place_file(name):
+    """Том для собственных данных файла: ключ — uuid из имени, общий для его сжатой копии."""
+    return place_volume(os.path.basename(name).split(".", 1)[0])
+
+
+def safe_path(name, volume=DEFAULT_VOLUME):
+    """Абсолютный путь к данным на томе или None, если он выходит за корень тома."""
+    root = volume_roots().get(volume)
+    if root is None or not name:
+        return None
+    real_root = os.path.realpath(root)
+    real_path = os.path.realpath(os.path.join(real_root, name))
+    if not real_path.startswith(real_root + os.sep):
+        return None
+    return real_path
+
+
+def find_path(name, volume=DEFAULT_VOLUME):
+    """Путь к данным на томе volume, а если их там нет — на любом другом томе.
+
+    Для ссылок, выданных до переноса данных командой rebalance_volumes.
+    """
+    path = safe_path(name, volume)
+    if path is not None and os.path.exists(path):
+        return path
+    for other in volume_roots():
+        other_path = safe_path(name, other)
+        if other != volume and other_path is not None and os.path.exists(other_path):
+            return other_path
+    return path
+
+
+def data_path(obj):
+    """Путь к данным File или Blob на их томе."""
+    return safe_path(obj.name if isinstance(obj, Blob) else obj.file.name, obj.volume)
+
+
+def locate(path):
+    """(том, путь относительно его корня) для абсолютного пути или (None, None)."""
+    real_path = os.path.realpath(path)
+    for name, root in volume_roots().items():
+        real_root = os.path.realpath(root)
+        if real_path.startswith(real_root + os.sep):
+            return name, os.path.relpath(real_path, real_root)
+    return None, None
+
+
+def copy_data(src, dst):
+    """Копирует файл через временный рядом с dst: по пути dst данные появляются только целиком."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.moving-{uuid.uuid4().hex}"
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def move_data(src, dst):
+    """Перемещает файл, в том числе на другой диск."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.replace(src, dst)
+        return
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+    copy_data(src, dst)
+    os.remove(src)
+
+
+def attach_blob(file_obj):
+    """Переносит только что записанные данные file_obj в общий blob.
+
+    Если blob с таким хешем уже есть, счётчик ссылок увеличивается, а свежая
+    копия удаляется после фиксации. Вызывается в транзакции вместе с
+    сохранением File: при откате File по-прежнему ссылается на свою копию.
+    """
+    src = data_path(file_obj)
+    if src is None:
+        raise ValueError(f"Invalid file path: {file_obj.file.name}")
+
+    with transaction.atomic():
+        blob, created = Blob.objects.select_for_update().get_or_create(
+            sha256=file_obj.sha256,
+            defaults={
+                "name": blob_name(file_obj.sha256),
+                "size": file_obj.size,
+                "codec": file_obj.codec,
+                "stored_size": file_obj.stored_size,
+                "volume": place_volume(file_obj.sha256),
+            },
+        )
+        Blob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+
+        dst = data_path(blob)
+        if dst is None:
+            raise ValueError(f"Invalid blob path: {blob.name} on volume {blob.volume!r}")
+        if created or not os.path.exists(dst):
+            move_data(src, dst)
+            if not created:
+                # Данные blob'а восстановлены из этой загрузки — и с её кодеком
+                blob.codec, blob.stored_size = file_obj.codec, file_obj.stored_size
+                Blob.objects.filter(pk=blob.pk).update(codec=blob.codec, stored_size=blob.stored_size)
+        elif src != dst:
+            transaction.on_commit(partial(remove_paths, [src]))
+
+    file_obj.blob = blob
+    file_obj.file.name = blob.name
+    file_obj.volume = blob.volume
+    # Данные файла — это данные blob'а, сжатые так же
+    file_obj.codec, file_obj.stored_size = blob.codec, blob.stored_size
+    return created
+
+
+def store_file_data(file_obj):
+    """Вызывается после записи данных нового файла по file_obj.file.name."""
+    if cas_enabled() and file_obj.sha256:
+        attach_blob(file_obj)
+
+
+def release_blob(blob_id, count=1):
+    """Снимает count ссылок с blob'а, удаляя данные вместе с последней."""
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return False
+        if blob.ref_count > count:
+            Blob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") - count)
+            return False
+        blob.delete()
+        # Под блокировкой строки данные только переименовываются: параллельная
+        # загрузка того же содержимого положит их заново, а при откате они
+        # не потеряны. Удаляются они после фиксации
+        tombstone = _bury(data_path(blob))
+        if tombstone:
+            transaction.on_commit(partial(remove_paths, [tombstone]))
+        return True
+
+
+def _bury(file_path):
+    """Переименовывает данные в «надгробие» рядом; вернёт его путь или None."""
+    if not file_path or not os.path.exists(file_path):
+        return None
+    tombstone = f"{file_path}{TOMBSTONE_SUFFIX}{uuid.uuid4().hex}"
+    os.rename(file_path, tombstone)
+    return tombstone
+
+
+def release_blobs(blob_refs):
+    """Снимает ссылки с нескольких blob'ов: blob_refs — {blob_id: число ссылок}.
+
+    Вызывается в транзакции удаления файлов. Строки блокируются одним запросом;
+    данные blob'ов без ссылок под блокировкой переименовываются в «надгробия»,
+    чтобы загрузка того же содержимого после фиксации положила их заново, а
+    не потеряла при отложенном удалении. Возвращает пути надгробий.
+    """
+    if not blob_refs:
+        return []
+    blobs = list(Blob.objects.select_for_update().filter(pk__in=blob_refs).order_by("pk"))
+    alive = {blob.pk: blob_refs[blob.pk] for blob in blobs if blob.ref_count > blob_refs[blob.pk]}
+    dead = [blob for blob in blobs if blob.pk not in alive]
+    if alive:
+        Blob.objects.filter(pk__in=alive).update(ref_count=F("ref_count") - Case(
+            *[When(pk=pk, then=Value(count)) for pk, count in alive.items()],
+            output_field=PositiveIntegerField(),
+        ))
+    Blob.objects.filter(pk__in=[blob.pk for blob in dead]).delete()
+    tombstones = [_bury(data_path(blob)) for blob in dead]
+    return [tombstone for tombstone in tombstones if tombstone]
+
+
+def remove_paths(paths):
+    """Удаляет файлы с диска, пропуская уже отсутствующие."""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def release_file_data(file_obj):
+    """Освобождает данные файла: свою копию или ссылку на blob."""
+    if file_obj.blob_id:
+        release_blob(file_obj.blob_id)
+        return
+    file_path = data_path(file_obj)
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def detach_user_dirs(username):
+    """Убирает каталоги пользователя на всех томах из-под его имени (users/.deleted-<имя>-<uuid>).
+
+    Переименование мгновенное, поэтому новый пользователь с тем же логином
+    не получит старые данные, а само удаление можно выполнить позже.
+    Возвращает новые пути.
+    """
+    detached = []
+    for volume in volume_roots():
+        path = safe_path(os.path.join("users", username), volume)
+        if path is None or not os.path.isdir(path):
+            continue
+        target = os.path.join(os.path.dirname(path), f".deleted-{username}-{uuid.uuid4().hex}")
+        os.rename(path, target)
+        detached.append(target)
+    return detached
+
+
+def purge_user_data(detached_dirs, blob_refs):
+    """Удаляет данные удалённого пользователя: каталоги и его ссылки на blob'ы.
+
+    blob_refs — пары (blob_id, число ссылок).
+    """
+    for blob_id, count in blob_refs:
+        release_blob(blob_id, count)
+    for detached_dir in detached_dirs:
+        shutil.rmtree(detached_dir, ignore_errors=True)
+    logger.info("Purged data of deleted user: %s, %d blobs released", detached_dirs, len(blob_refs))
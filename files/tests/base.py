@@ -0,0 +1,70 @@
+"""Общая основа тестов приложения files."""
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+
+class StorageMixin:
+    """Отдельное временное хранилище на каждый тест и клиент пользователя.
+
+    Фоновые потоки (очистка корзины, снимки метрик) в тестах не запускаются,
+    статистика скачиваний пишется в базу сразу.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="cloud_storage_test_")
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        storage_settings = override_settings(
+            MEDIA_ROOT=self.media_root,
+            FILES_RENDITION_ROOT=os.path.join(self.media_root, ".renditions"),
+            FILES_TRASH_PURGER=False,
+            FILES_STATS_FLUSH_INTERVAL=0,
+            METRICS_DIR="",
+            PROFILING_DIR=os.path.join(self.media_root, ".profiles"),
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        # Кеш ссылок хранит данные файлов по id, а id в разных тестах повторяются
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user, self.client = self.make_user("alice")
+
+    def make_user(self, username, **fields):
+        user = User.objects.create_user(
+            username=username, password="Qwe123!", email=f"{username}@test.com", **fields
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        return user, client
+
+    def upload(self, name="test.txt", content=b"hello world\n", client=None, **data):
+        """Загрузка одним запросом; возвращает ответ."""
+        client = client or self.client
+        data["file"] = SimpleUploadedFile(name, content)
+        return client.post("/api/files/upload/", data, format="multipart")
+
+    def upload_file(self, name="test.txt", content=b"hello world\n", client=None):
+        """Загрузка, которая должна пройти; возвращает id файла."""
+        response = self.upload(name, content, client=client)
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data["id"]
+
+    def read_body(self, response):
+        if response.streaming:
+            return b"".join(response.streaming_content)
+        return response.content
+
+
+class StorageTestCase(StorageMixin, TestCase):
+    pass
+
+
+class StorageTransactionTestCase(StorageMixin, TransactionTestCase):
+    """Для кода, который ходит в базу из других потоков (storage_fsck, гонки загрузок)."""
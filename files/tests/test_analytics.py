@@ -0,0 +1,69 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from files import analytics
+from files.models import ExtensionStat, File, MonthlyStat, StorageStatsRefresh
+
+from .base import StorageTestCase
+
+
+class StorageStatsTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin, self.admin_client = self.make_user("admin", is_admin=True)
+        self.addCleanup(setattr, analytics, "_refreshing", False)
+
+    def test_admin_only(self):
+        self.assertEqual(self.client.get("/api/files/stats/").status_code, 403)
+        self.assertEqual(self.admin_client.get("/api/files/stats/").status_code, 200)
+
+    def test_breakdowns(self):
+        self.upload_file("a.txt", b"x" * 10)
+        self.upload_file("b.txt", b"x" * 5)
+        self.upload_file("c.pdf", b"x" * 100)
+        _, bob_client = self.make_user("bob")
+        self.upload_file("d.txt", b"x", client=bob_client)
+
+        data = self.admin_client.get("/api/files/stats/?sort=-file_count&limit=2").data
+        self.assertEqual(data["totals"], {"users": 3, "files": 4, "bytes": 116})
+        self.assertEqual([row["username"] for row in data["users"]], ["alice", "bob"])
+        self.assertEqual(data["users"][0]["total_bytes"], 115)
+        self.assertEqual(data["by_extension"], [
+            {"extension": "pdf", "file_count": 1, "total_bytes": 100},
+            {"extension": "txt", "file_count": 3, "total_bytes": 16},
+        ])
+        self.assertEqual(data["by_month"], [
+            {"month": f"{timezone.now():%Y-%m}", "file_count": 4, "total_bytes": 116},
+        ])
+        self.assertEqual(self.admin_client.get("/api/files/stats/?sort=password").status_code, 400)
+
+    def test_empty_storage_is_refreshed_once(self):
+        with mock.patch.object(analytics, "refresh_storage_stats", wraps=analytics.refresh_storage_stats) as refresh:
+            self.admin_client.get("/api/files/stats/")
+            self.admin_client.get("/api/files/stats/")
+        # Пустое хранилище — тоже результат пересчёта, а не повод считать на каждом запросе
+        self.assertEqual(refresh.call_count, 1)
+        self.assertTrue(StorageStatsRefresh.objects.filter(pk=1).exists())
+        self.assertFalse(ExtensionStat.objects.exists())
+
+    def test_stale_stats_are_refreshed_in_background(self):
+        old = timezone.now() - timedelta(days=1)
+        StorageStatsRefresh.objects.create(pk=1, refreshed_at=old)
+        with mock.patch.object(analytics, "submit") as submit:
+            self.assertEqual(analytics.ensure_fresh(), old)
+            self.assertEqual(analytics.ensure_fresh(), old)
+        # Пока идёт пересчёт, второй не запускается
+        submit.assert_called_once_with(analytics._refresh_in_background)
+
+    def test_refresh_command(self):
+        self.upload_file("a.txt")
+        File.objects.update(uploaded_at=timezone.now() - timedelta(days=62))
+        self.upload_file("b.png")
+        out = io.StringIO()
+        call_command("refresh_storage_stats", stdout=out)
+        self.assertIn("расширений 2, месяцев 2", out.getvalue())
+        self.assertEqual(MonthlyStat.objects.count(), 2)
@@ -0,0 +1,71 @@
+import io
+import zipfile
+
+from django.test import SimpleTestCase, override_settings
+
+from files.archive import archive_name
+
+from .base import StorageTestCase
+
+
+class ArchiveNameTests(SimpleTestCase):
+    def test_names_are_flat_and_unique(self):
+        used = set()
+        self.assertEqual(archive_name("../etc/passwd", used), "_etc_passwd")
+        used.add("a.txt")
+        self.assertEqual(archive_name("A.txt", used), "A (2).txt")
+        self.assertEqual(archive_name("", used), "file")
+
+
+class ArchiveDownloadTests(StorageTestCase):
+    def open_zip(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertTrue(response.streaming)
+        return zipfile.ZipFile(io.BytesIO(self.read_body(response)))
+
+    def test_selected_files(self):
+        first = self.upload_file("a.txt", b"first\n" * 1000)
+        second = self.upload_file("a.txt", b"second")
+        self.upload_file("other.txt", b"not requested")
+
+        archive = self.open_zip(self.client.get(f"/api/files/archive/?ids={first},{second}"))
+        self.assertEqual(archive.namelist(), ["a.txt", "a (2).txt"])
+        self.assertEqual(archive.read("a.txt"), b"first\n" * 1000)
+        self.assertEqual(archive.read("a (2).txt"), b"second")
+        self.assertIsNone(archive.testzip())
+
+    def test_whole_account(self):
+        self.upload_file("a.txt", b"a")
+        self.upload_file("b.png", b"b")
+        _, bob_client = self.make_user("bob")
+        self.upload_file("bob.txt", b"bob", client=bob_client)
+
+        archive = self.open_zip(self.client.post("/api/files/archive/", {"all": True}, format="json"))
+        self.assertEqual(sorted(archive.namelist()), ["a.txt", "b.png"])
+        # Уже сжатые форматы кладутся без сжатия
+        self.assertEqual(archive.getinfo("b.png").compress_type, zipfile.ZIP_STORED)
+
+    def test_foreign_and_missing_files(self):
+        _, bob_client = self.make_user("bob")
+        foreign = self.upload_file("bob.txt", b"bob", client=bob_client)
+        own = self.upload_file("a.txt")
+        response = self.client.get(f"/api/files/archive/?ids={own},{foreign}")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(f"/api/files/archive/?ids={own},999999")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data["missing"], [999999])
+        self.assertEqual(self.client.get("/api/files/archive/?ids=").status_code, 400)
+
+    @override_settings(FILES_ARCHIVE_MAX_FILES=2)
+    def test_file_count_is_capped(self):
+        ids = [self.upload_file(f"{i}.txt") for i in range(3)]
+        # Проверка до запроса к базе: несуществующие id тоже считаются
+        response = self.client.post("/api/files/archive/", {"ids": [1, 2, 3]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Too many files, at most 2 per archive")
+        self.assertEqual(self.client.post("/api/files/archive/", {"all": True}, format="json").status_code, 400)
+
+        self.open_zip(self.client.get(f"/api/files/archive/?ids={ids[0]},{ids[1]}"))
+        self.client.delete(f"/api/files/{ids[2]}/")
+        self.open_zip(self.client.post("/api/files/archive/", {"all": True}, format="json"))
@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import UnreadablePostError
+from django.test import SimpleTestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+from accounts.authentication import VersionedRefreshToken
+from files.asgi import ReceiveStream, StreamingUploadASGIHandler, streams_body
+from files.models import File
+
+from .base import StorageTestCase
+
+
+def http_scope(method, path, headers=()):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "path": path, "raw_path": path.encode(), "root_path": "",
+        "scheme": "http", "query_string": b"", "server": ("testserver", 80), "client": ("127.0.0.1", 1),
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    }
+
+
+class Receiver:
+    """ASGI receive по списку сообщений; считает, сколько из них забрано."""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.taken = 0
+
+    async def __call__(self):
+        if self.taken < len(self.messages):
+            self.taken += 1
+            return self.messages[self.taken - 1]
+        await asyncio.Event().wait()
+
+
+def body(chunks):
+    return [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+class StreamsBodyTests(SimpleTestCase):
+    def test_only_upload_views_are_streamed(self):
+        self.assertTrue(streams_body(http_scope("POST", "/api/files/upload/")))
+        self.assertTrue(streams_body(http_scope("POST", "/api/files/")))
+        self.assertTrue(streams_body(
+            http_scope("PUT", "/api/files/uploads/7d6f1d1e-0c1a-4b8e-9d1e-2f1c3a4b5c6d/chunks/0/")
+        ))
+        self.assertFalse(streams_body(http_scope("GET", "/api/files/")))
+        self.assertFalse(streams_body(http_scope("POST", "/api/token/")))
+        self.assertFalse(streams_body(http_scope("POST", "/no/such/path/")))
+
+
+class ReceiveStreamTests(SimpleTestCase):
+    async def test_read_and_readline_across_messages(self):
+        receiver = Receiver(body([b"first li", b"ne\nsecond", b" line\ntail"]))
+        stream = ReceiveStream(receiver, asyncio.get_running_loop())
+
+        def consume():
+            return stream.readline(), stream.read(3), stream.readline(), stream.read()
+
+        self.assertEqual(
+            await asyncio.to_thread(consume), (b"first line\n", b"sec", b"ond line\n", b"tail"),
+        )
+        # После тела ожидание отключения клиента получает следующее сообщение
+        receiver.messages.append({"type": "http.disconnect"})
+        self.assertEqual(await asyncio.wait_for(stream(), 1), {"type": "http.disconnect"})
+
+    async def test_messages_are_pulled_on_demand(self):
+        receiver = Receiver(body([b"aaaa", b"bbbb", b"cccc"]))
+        stream = ReceiveStream(receiver, asyncio.get_running_loop())
+        self.assertEqual(await asyncio.to_thread(stream.read, 2), b"aa")
+        self.assertEqual(receiver.taken, 1)
+        self.assertEqual(await asyncio.to_thread(stream.read, 4), b"aabb")
+        self.assertEqual(receiver.taken, 2)
+
+    async def test_disconnect_and_event_loop_reads(self):
+        stream = ReceiveStream(Receiver([{"type": "http.disconnect"}]), asyncio.get_running_loop())
+        with self.assertRaises(RuntimeError):
+            stream.read()
+        with self.assertRaises(UnreadablePostError):
+            await asyncio.to_thread(stream.read)
+
+
+class StreamingHandlerTests(StorageTestCase):
+    async def call(self, scope, receiver):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await StreamingUploadASGIHandler()(scope, receiver, send)
+        start = next(message for message in sent if message["type"] == "http.response.start")
+        content = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+        return start["status"], json.loads(content or b"null")
+
+    def upload_scope(self, length):
+        access = VersionedRefreshToken.for_user(self.user).access_token
+        return http_scope("POST", "/api/files/upload/", [
+            ("authorization", f"Bearer {access}"),
+            ("content-type", MULTIPART_CONTENT),
+            ("content-length", str(length)),
+        ])
+
+    async def test_upload_is_read_from_receive(self):
+        payload = encode_multipart(BOUNDARY, {"file": SimpleUploadedFile("a.txt", b"streamed\n" * 1000)})
+        chunks = [payload[i:i + 1000] for i in range(0, len(payload), 1000)]
+        status, data = await self.call(self.upload_scope(len(payload)), Receiver(body(chunks)))
+        self.assertEqual(status, 201, data)
+        file_obj = await File.objects.aget(pk=data["id"])
+        self.assertEqual(file_obj.size, 9000)
+
+    @override_settings(FILES_UPLOAD_MAX_SIZE=1024)
+    async def test_oversized_upload_is_refused_before_the_body(self):
+        payload = encode_multipart(BOUNDARY, {"file": SimpleUploadedFile("a.txt", b"x" * 100_000)})
+        receiver = Receiver(body([payload[i:i + 1000] for i in range(0, len(payload), 1000)]))
+        status, _ = await self.call(self.upload_scope(len(payload)), receiver)
+        self.assertEqual(status, 413)
+        # Тело не принималось: забрано не больше одного сообщения
+        self.assertLessEqual(receiver.taken, 1)
@@ -0,0 +1,56 @@
+import io
+from contextlib import redirect_stdout
+
+from django.test import LiveServerTestCase, SimpleTestCase
+
+import bench_api
+from files.models import File
+
+from .base import StorageMixin
+
+
+class BenchReportTests(SimpleTestCase):
+    def test_parse_size(self):
+        self.assertEqual(bench_api.parse_size("4K"), 4096)
+        self.assertEqual(bench_api.parse_size(" 1.5m"), 1572864)
+        self.assertEqual(bench_api.parse_size("100"), 100)
+        self.assertEqual(len(bench_api.make_payload(1001)), 1001)
+
+    def test_summary_percentiles(self):
+        latencies = [i / 1000 for i in range(100, 0, -1)]
+        row = bench_api.summarize(latencies, errors=2, transferred=2 * 1024 ** 2, elapsed=4)
+        self.assertEqual(row["requests"], 100)
+        self.assertEqual(row["errors"], 2)
+        self.assertEqual(row["throughput_rps"], 25)
+        self.assertEqual(row["mb_per_s"], 0.5)
+        self.assertEqual((row["p50_ms"], row["p95_ms"], row["p99_ms"], row["max_ms"]), (51, 95, 99, 100))
+        empty = bench_api.summarize([], 0, 0, 1)
+        self.assertIsNone(empty["p95_ms"])
+
+    def test_comparison_table(self):
+        row = bench_api.summarize([0.01] * 10, 0, 0, 1)
+        baseline = {"list": dict(row, throughput_rps=5, p95_ms=20)}
+        out = io.StringIO()
+        with redirect_stdout(out):
+            bench_api.print_table({"list": row}, baseline)
+        header, line = out.getvalue().splitlines()
+        self.assertIn("Δrps", header)
+        self.assertTrue(line.startswith("list"))
+        self.assertTrue(line.rstrip().endswith("+100%     -50%"))
+
+
+class BenchRunTests(StorageMixin, LiveServerTestCase):
+    def test_seed_and_workloads(self):
+        payloads = [bench_api.make_payload(size) for size in (100, 5000)]
+        accounts = bench_api.seed(self.live_server_url, users=2, files=3, payloads=payloads, share_links=1)
+        self.assertEqual([len(account.files) for account in accounts], [3, 3])
+        self.assertEqual(File.objects.count(), 6)
+
+        # Один поток нагрузки: живой сервер тестов на SQLite в памяти делит одно соединение
+        for name in bench_api.WORKLOADS:
+            row = bench_api.run_workload(
+                name, self.live_server_url, accounts, payloads,
+                concurrency=1, duration=0.3, warmup=0, seed_value=1,
+            )
+            self.assertGreater(row["requests"], 0, name)
+            self.assertEqual(row["errors"], 0, name)
@@ -0,0 +1,112 @@
+import glob
+import io
+import os
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from files.models import Blob, File
+from files.storage import attach_blob, data_path, release_blob
+from files.trash import purge_files
+
+from .base import StorageTestCase, StorageTransactionTestCase
+
+
+@override_settings(FILES_STORAGE_MODE="cas")
+class BlobStoreTests(StorageTestCase):
+    def test_same_content_shares_one_blob(self):
+        first = self.upload_file("a.txt", b"same bytes")
+        _, bob_client = self.make_user("bob")
+        second = self.upload_file("b.txt", b"same bytes", client=bob_client)
+        other = self.upload_file("c.txt", b"other bytes")
+
+        blob = Blob.objects.get(files=first)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(File.objects.get(pk=second).blob_id, blob.pk)
+        self.assertNotEqual(File.objects.get(pk=other).blob_id, blob.pk)
+        self.assertEqual(len(glob.glob(os.path.join(self.media_root, "blobs", "*", "*", "*"))), 2)
+
+        response = self.client.get(f"/api/files/{first}/download/")
+        self.assertEqual(self.read_body(response), b"same bytes")
+
+    def test_blob_data_is_removed_with_last_reference(self):
+        first = self.upload_file("a.txt", b"shared")
+        second = self.upload_file("b.txt", b"shared")
+        blob = Blob.objects.get()
+        path = data_path(blob)
+
+        File.objects.filter(pk__in=[first, second]).update(deleted_at=timezone.now())
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_files([first])
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_files([second])
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(glob.glob(f"{path}*"), [])
+
+    def test_release_blob_unlinks_only_after_commit(self):
+        file_id = self.upload_file("a.txt", b"content")
+        blob = Blob.objects.get()
+        path = data_path(blob)
+        File.objects.filter(pk=file_id).delete()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertTrue(release_blob(blob.pk))
+        # До фиксации данные лежат в надгробии
+        self.assertEqual(len(glob.glob(f"{path}.deleted-*")), 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(glob.glob(f"{path}*"), [])
+
+
+@override_settings(FILES_STORAGE_MODE="cas")
+class BlobRollbackTests(StorageTransactionTestCase):
+    def test_rolled_back_release_keeps_data_for_fsck(self):
+        file_id = self.upload_file("a.txt", b"content")
+        blob = Blob.objects.get()
+        path = data_path(blob)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            File.objects.filter(pk=file_id).delete()
+            release_blob(blob.pk)
+            raise RuntimeError
+        self.assertTrue(Blob.objects.filter(pk=blob.pk).exists())
+        self.assertEqual(len(glob.glob(f"{path}.deleted-*")), 1)
+
+        call_command("storage_fsck", "--delete-orphans", "--min-age", "0", stdout=io.StringIO())
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"content")
+
+    def test_rolled_back_attach_keeps_upload_copy(self):
+        with override_settings(FILES_STORAGE_MODE="plain"):
+            first = self.upload_file("a.txt", b"content")
+            second = self.upload_file("b.txt", b"content")
+        file_obj = File.objects.get(pk=first)
+        with transaction.atomic():
+            attach_blob(file_obj)
+            file_obj.save(update_fields=["blob", "file", "volume", "codec", "stored_size"])
+
+        file_obj = File.objects.get(pk=second)
+        path = data_path(file_obj)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.assertFalse(attach_blob(file_obj))
+            file_obj.save(update_fields=["blob", "file", "volume", "codec", "stored_size"])
+            raise RuntimeError
+        # Откат вернул File на свою копию — она не должна быть удалена
+        file_obj = File.objects.get(pk=second)
+        self.assertIsNone(file_obj.blob_id)
+        self.assertEqual(data_path(file_obj), path)
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"content")
+
+        call_command("migrate_to_blobs", stdout=io.StringIO())
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.read_body(self.client.get(f"/api/files/{second}/download/")), b"content")
@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from files.models import File, FileChange
+
+from .base import StorageTestCase
+
+
+class BulkDeleteTests(StorageTestCase):
+    def bulk_delete(self, data, client=None):
+        return (client or self.client).post("/api/files/bulk-delete/", data, format="json")
+
+    def test_delete_by_ids_reports_each_id(self):
+        first = self.upload_file("a.txt")
+        second = self.upload_file("b.txt")
+        _, bob_client = self.make_user("bob")
+        foreign = self.upload_file("bob.txt", client=bob_client)
+
+        response = self.bulk_delete({"ids": [first, second, foreign, 999999]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["deleted"], 2)
+        self.assertEqual(response.data["results"], [
+            {"id": first, "status": "deleted"},
+            {"id": second, "status": "deleted"},
+            {"id": foreign, "status": "permission_denied"},
+            {"id": 999999, "status": "not_found"},
+        ])
+        self.assertEqual(set(File.objects.alive().values_list("id", flat=True)), {foreign})
+        self.assertEqual(
+            FileChange.objects.filter(action=FileChange.DELETED).count(), 2,
+        )
+
+        # Файлы уже в корзине
+        response = self.bulk_delete({"ids": f"{first},{second}"})
+        self.assertEqual(response.data["deleted"], 0)
+        self.assertEqual({row["status"] for row in response.data["results"]}, {"not_found"})
+
+    def test_query_count_does_not_grow_with_files(self):
+        ids = [self.upload_file(f"{i}.txt") for i in range(3)]
+        with CaptureQueriesContext(connection) as few:
+            self.bulk_delete({"ids": ids})
+        ids = [self.upload_file(f"more-{i}.txt") for i in range(30)]
+        with CaptureQueriesContext(connection) as many:
+            self.bulk_delete({"ids": ids})
+        self.assertEqual(len(many), len(few))
+
+    def test_delete_by_filter(self):
+        self.upload_file("a.txt", b"x" * 10)
+        self.upload_file("b.txt", b"x" * 100)
+        kept = self.upload_file("c.pdf", b"x" * 100)
+        _, bob_client = self.make_user("bob")
+        foreign = self.upload_file("bob.txt", b"x" * 100, client=bob_client)
+
+        response = self.bulk_delete({"filter": {"ext": "txt", "min_size": 50}})
+        self.assertEqual(response.data["deleted"], 1)
+        self.assertEqual(
+            set(File.objects.alive().values_list("name", flat=True)), {"a.txt", "c.pdf", "bob.txt"},
+        )
+        # Чужой user_id без прав администратора не действует
+        self.bulk_delete({"filter": {}, "user_id": File.objects.get(pk=foreign).owner_id})
+        self.assertTrue(File.objects.alive().filter(pk=foreign).exists())
+        self.assertFalse(File.objects.alive().filter(pk=kept).exists())
+
+    def test_admin_filter_by_user(self):
+        bob, bob_client = self.make_user("bob")
+        foreign = self.upload_file("bob.txt", client=bob_client)
+        own = self.upload_file("a.txt")
+        _, admin_client = self.make_user("admin", is_admin=True)
+        response = self.bulk_delete({"filter": {"ext": "txt"}, "user_id": bob.pk}, client=admin_client)
+        self.assertEqual(response.data["results"], [{"id": foreign, "status": "deleted"}])
+        self.assertTrue(File.objects.alive().filter(pk=own).exists())
+
+    def test_invalid_requests(self):
+        for data in ({"ids": []}, {"ids": ["x"]}, {"filter": "txt"}, {"filter": {"min_size": -1}}):
+            self.assertEqual(self.bulk_delete(data).status_code, 400, data)
+        ids = [self.upload_file(f"{i}.txt") for i in range(3)]
+        with mock.patch("files.views.BULK_DELETE_MAX_FILES", 2):
+            response = self.bulk_delete({"ids": ids})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(File.objects.alive().count(), 3)
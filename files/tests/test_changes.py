@@ -0,0 +1,143 @@
+import threading
+import time
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import override_settings, skipUnlessDBFeature
+
+from files import changes
+from files.models import File, FileChange
+
+from .base import StorageTestCase, StorageTransactionTestCase
+
+
+class ChangesFeedTests(StorageTestCase):
+    def feed(self, **params):
+        response = self.client.get("/api/files/changes/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_cursor_pages(self):
+        cursor = self.feed()["cursor"]
+        first = self.upload_file("a.txt")
+        second = self.upload_file("b.txt")
+        self.client.post(f"/api/files/{first}/rename/", {"name": "c.txt"}, format="json")
+        self.client.delete(f"/api/files/{second}/")
+
+        data = self.feed(cursor=cursor, limit=3)
+        self.assertTrue(data["has_more"])
+        self.assertEqual(
+            [(row["action"], row["file_id"]) for row in data["changes"]],
+            [(FileChange.CREATED, first), (FileChange.CREATED, second), (FileChange.UPDATED, first)],
+        )
+        # Состояние файла — текущее, а не на момент изменения
+        self.assertEqual(data["changes"][0]["file"]["name"], "c.txt")
+        self.assertIsNone(data["changes"][1]["file"])
+
+        data = self.feed(cursor=data["cursor"], limit=3)
+        self.assertFalse(data["has_more"])
+        self.assertEqual([(row["action"], row["file"]) for row in data["changes"]], [(FileChange.DELETED, None)])
+        self.assertEqual(self.feed(cursor=data["cursor"])["changes"], [])
+
+    def test_feed_is_per_owner(self):
+        _, bob_client = self.make_user("bob")
+        self.upload_file("bob.txt", client=bob_client)
+        self.assertEqual(self.feed(cursor=0)["changes"], [])
+
+    def test_share_creation_is_journaled(self):
+        file_id = self.upload_file("a.txt")
+        cursor = self.feed()["cursor"]
+        self.client.post(f"/api/files/shared/{file_id}/")
+        rows = self.feed(cursor=cursor)["changes"]
+        self.assertEqual([(row["action"], row["file_id"]) for row in rows], [(FileChange.UPDATED, file_id)])
+        self.assertIsNotNone(File.objects.get(pk=file_id).shared_at)
+
+    def test_invalid_parameters(self):
+        for params in ({"cursor": "x"}, {"cursor": -1}, {"cursor": 0, "limit": 0}, {"cursor": 0, "wait": -1}):
+            self.assertEqual(self.client.get("/api/files/changes/", params).status_code, 400, params)
+
+    @override_settings(FILES_CHANGES_MAX_WAITERS=1)
+    def test_waiters_are_capped(self):
+        self.assertTrue(changes.acquire_waiter(1))
+        try:
+            response = self.client.get("/api/files/changes/", {"cursor": 0, "wait": 1})
+        finally:
+            changes.release_waiter()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "5")
+        # Без ожидания ограничение не действует
+        self.assertEqual(self.client.get("/api/files/changes/", {"cursor": 0}).status_code, 200)
+
+
+@override_settings(FILES_CHANGES_POLL_INTERVAL=30)
+class LongPollTests(StorageTransactionTestCase):
+    def test_wait_returns_on_change(self):
+        cursor = self.client.get("/api/files/changes/").data["cursor"]
+
+        def change():
+            try:
+                time.sleep(0.2)
+                changes.record_change(self.user.id, 42, FileChange.CREATED)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=change)
+        thread.start()
+        started = time.monotonic()
+        response = self.client.get("/api/files/changes/", {"cursor": cursor, "wait": 10})
+        thread.join()
+        # Изменение в этом процессе будит ожидание, не дожидаясь опроса базы
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual([row["file_id"] for row in response.data["changes"]], [42])
+
+    def test_wait_times_out(self):
+        cursor = self.client.get("/api/files/changes/").data["cursor"]
+        response = self.client.get("/api/files/changes/", {"cursor": cursor, "wait": 0.1})
+        self.assertEqual(response.data, {"changes": [], "cursor": cursor, "has_more": False})
+
+
+# Нужны блокировки строк: SQLite в тестах сразу отвечает "table is locked"
+@skipUnlessDBFeature("has_select_for_update")
+class JournalOrderTests(StorageTransactionTestCase):
+    def test_ids_follow_commit_order(self):
+        """Запись журнала, вставленная первой, фиксируется раньше следующей.
+
+        Писатель A останавливается сразу после вставки, не закрыв транзакцию.
+        Писатель B не должен успеть вставить и зафиксировать запись с большим
+        id: клиент, прочитавший журнал в этот момент, перешагнул бы курсором
+        запись A.
+        """
+        inserted, finish = threading.Event(), threading.Event()
+        create = FileChange.objects.create
+
+        def paused_create(**fields):
+            change = create(**fields)
+            if fields["file_id"] == 1:
+                inserted.set()
+                finish.wait(5)
+            return change
+
+        def writer(file_id):
+            try:
+                with transaction.atomic():
+                    changes.record_change(self.user.id, file_id, FileChange.CREATED)
+            finally:
+                connection.close()
+
+        with mock.patch.object(FileChange.objects, "create", paused_create):
+            first = threading.Thread(target=writer, args=(1,))
+            second = threading.Thread(target=writer, args=(2,))
+            first.start()
+            try:
+                self.assertTrue(inserted.wait(5))
+                second.start()
+                second.join(0.5)
+                # B ждёт блокировки строки владельца, которую держит A
+                self.assertTrue(second.is_alive())
+            finally:
+                finish.set()
+                first.join()
+                if second.ident:
+                    second.join()
+
+        self.assertEqual(list(FileChange.objects.order_by("id").values_list("file_id", flat=True)), [1, 2])
@@ -0,0 +1,77 @@
+import gzip
+from urllib.parse import urlparse
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from files.compression import CODEC_GZIP, accepts_encoding
+from files.models import File
+from files.storage import data_path
+
+from .base import StorageTestCase
+
+TEXT = b"".join(f"{i},value,{i * 7}\n".encode() for i in range(2000))
+
+
+class AcceptEncodingTests(SimpleTestCase):
+    def accepts(self, header):
+        return accepts_encoding(RequestFactory().get("/", HTTP_ACCEPT_ENCODING=header), CODEC_GZIP)
+
+    def test_quality_values(self):
+        self.assertTrue(self.accepts("br, gzip"))
+        self.assertTrue(self.accepts("x-gzip"))
+        self.assertTrue(self.accepts("*"))
+        self.assertFalse(self.accepts(""))
+        self.assertFalse(self.accepts("gzip;q=0"))
+        self.assertFalse(self.accepts("*, gzip;q=0"))
+        self.assertTrue(self.accepts("*;q=0, gzip;q=0.5"))
+
+
+@override_settings(FILES_COMPRESSION="gzip")
+class CompressedStorageTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_id = self.upload_file("table.csv", TEXT)
+        self.file_obj = File.objects.get(pk=self.file_id)
+        self.url = f"/api/files/{self.file_id}/download/"
+
+    def test_stored_compressed(self):
+        self.assertEqual(self.file_obj.codec, CODEC_GZIP)
+        self.assertEqual(self.file_obj.size, len(TEXT))
+        self.assertLess(self.file_obj.stored_size, len(TEXT) // 2)
+        with open(data_path(self.file_obj), "rb") as f:
+            self.assertEqual(gzip.decompress(f.read()), TEXT)
+
+        # Уже сжатые форматы хранятся как есть
+        png = File.objects.get(pk=self.upload_file("image.png", b"\x89PNG" + b"\0" * 100))
+        self.assertEqual(png.codec, "")
+
+    def test_download_is_decompressed_for_plain_clients(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9")
+        # Range по сжатым данным не поддерживается: отдаётся файл целиком
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read_body(response), TEXT)
+        self.assertEqual(response["Content-Length"], str(len(TEXT)))
+        self.assertEqual(response["Accept-Ranges"], "none")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_download_passes_compressed_bytes_through(self):
+        plain_etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = self.read_body(response)
+        self.assertEqual(len(body), self.file_obj.stored_size)
+        self.assertEqual(gzip.decompress(body), TEXT)
+        self.assertEqual(response["ETag"], f"W/{plain_etag}")
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=plain_etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_preview_and_share_link(self):
+        response = self.client.get(f"/api/files/{self.file_id}/content/", {"mode": "tail", "limit": 40})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"1998,value,13986\n1999,value,13993\n")
+        self.assertEqual(int(response["X-Preview-Size"]), len(TEXT))
+
+        share_url = self.client.post(f"/api/files/shared/{self.file_id}/").data["share_url"]
+        self.assertEqual(self.read_body(self.client.get(urlparse(share_url).path)), TEXT)
@@ -0,0 +1,56 @@
+from django.utils.http import http_date
+
+from .base import StorageTestCase
+
+
+class ConditionalContentTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_id = self.upload_file("cached.txt", b"cache me")
+        self.url = f"/api/files/{self.file_id}/download/"
+
+    def test_if_none_match(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(0))
+        self.assertEqual(response.status_code, 200)
+
+    def test_content_endpoint(self):
+        url = f"/api/files/{self.file_id}/content/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ConditionalListingTests(StorageTestCase):
+    def test_listing_etag_changes_with_files(self):
+        self.upload_file("a.txt")
+        response = self.client.get("/api/files/")
+        etag = response["ETag"]
+        self.assertEqual(self.client.get("/api/files/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Другие параметры запроса — другой ETag
+        self.assertNotEqual(self.client.get("/api/files/?sort=name")["ETag"], etag)
+
+        self.upload_file("b.txt")
+        response = self.client.get("/api/files/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_listing_etag_is_per_owner(self):
+        self.upload_file("a.txt")
+        etag = self.client.get("/api/files/")["ETag"]
+        _, bob_client = self.make_user("bob")
+        self.assertEqual(bob_client.get("/api/files/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
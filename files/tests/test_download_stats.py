@@ -0,0 +1,66 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from files import stats
+from files.models import File
+
+from .base import StorageTestCase
+
+
+def writes(queries):
+    return [q["sql"] for q in queries if q["sql"].startswith(("UPDATE", "INSERT", "DELETE"))]
+
+
+@mock.patch("files.stats._ensure_flusher")
+class DownloadStatsTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        # Буфер пишется только явным flush(): фоновый поток не запускается
+        buffered = override_settings(FILES_STATS_FLUSH_INTERVAL=3600)
+        buffered.enable()
+        self.addCleanup(buffered.disable)
+        self.file_id = self.upload_file("stats.txt", b"0123456789")
+        self.url = f"/api/files/{self.file_id}/download/"
+        self.addCleanup(stats._pending.clear)
+
+    def test_download_does_not_write(self, _):
+        with CaptureQueriesContext(connection) as queries:
+            self.read_body(self.client.get(self.url))
+        self.assertEqual(writes(queries), [])
+        self.assertEqual(File.objects.get(pk=self.file_id).download_count, 0)
+
+    def test_downloads_are_coalesced_into_one_update(self, _):
+        for _ in range(3):
+            self.read_body(self.client.get(self.url))
+        # Докачка с середины файла — не новое скачивание
+        self.read_body(self.client.get(self.url, HTTP_RANGE="bytes=5-"))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(stats.flush(), 1)
+        self.assertEqual(len(writes(queries)), 1)
+        file_obj = File.objects.get(pk=self.file_id)
+        self.assertEqual(file_obj.download_count, 3)
+        self.assertIsNotNone(file_obj.last_downloaded_at)
+        self.assertEqual(stats.flush(), 0)
+
+    def test_later_time_from_another_process_is_kept(self, _):
+        later = timezone.now() + timedelta(hours=1)
+        File.objects.filter(pk=self.file_id).update(last_downloaded_at=later, download_count=5)
+        self.read_body(self.client.get(self.url))
+        stats.flush()
+        file_obj = File.objects.get(pk=self.file_id)
+        self.assertEqual(file_obj.last_downloaded_at, later)
+        self.assertEqual(file_obj.download_count, 6)
+
+    def test_flush_keeps_listing_etag(self, _):
+        etag = self.client.get("/api/files/")["ETag"]
+        self.read_body(self.client.get(self.url))
+        stats.flush()
+        self.assertEqual(self.client.get("/api/files/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Порядок по времени скачивания зависит от статистики и не кешируется
+        self.assertNotIn("ETag", self.client.get("/api/files/?sort=-last_downloaded_at"))
@@ -0,0 +1,87 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+
+from files.models import Blob, File
+from files.storage import data_path
+
+from .base import StorageTransactionTestCase
+
+
+class StorageFsckTests(StorageTransactionTestCase):
+    def fsck(self, *args):
+        out = io.StringIO()
+        call_command("storage_fsck", *args, stdout=out)
+        return out.getvalue()
+
+    def put(self, name, content=b"orphan", age=7200):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        mtime = os.path.getmtime(path) - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_orphans_are_reported_and_deleted(self):
+        file_id = self.upload_file("kept.txt", b"kept")
+        kept = data_path(File.objects.get(pk=file_id))
+        orphan = self.put("users/alice/old/lost.bin")
+        fresh = self.put("users/alice/uploading.bin", age=0)
+        rendition = self.put(os.path.relpath(
+            os.path.join(settings.FILES_RENDITION_ROOT, "01", "1-128-v.jpg"), self.media_root,
+        ))
+
+        output = self.fsck()
+        self.assertIn("Сирота: users/alice/old/lost.bin (6 байт)", output)
+        # Идущая загрузка и кеш миниатюр сиротами не считаются
+        self.assertNotIn("uploading.bin", output)
+        self.assertNotIn("1-128-v.jpg", output)
+        self.assertTrue(os.path.exists(orphan))
+
+        output = self.fsck("--delete-orphans")
+        self.assertIn("удалено сирот: 1 (6 байт)", output)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertFalse(os.path.exists(os.path.dirname(orphan)))
+        for path in (kept, fresh, rendition):
+            self.assertTrue(os.path.exists(path), path)
+        self.assertTrue(os.path.isdir(os.path.join(self.media_root, "users")))
+
+        self.fsck("--delete-orphans", "--min-age", "0")
+        self.assertFalse(os.path.exists(fresh))
+        self.assertTrue(os.path.exists(kept))
+
+    def test_missing_data_is_reported(self):
+        file_id = self.upload_file("gone.txt")
+        file_obj = File.objects.get(pk=file_id)
+        os.remove(data_path(file_obj))
+        output = self.fsck()
+        self.assertIn(f"Нет данных файла {file_id}: {file_obj.file.name}", output)
+        self.assertIn("записей File без данных: 1", output)
+
+    @override_settings(FILES_STORAGE_MODE="cas")
+    def test_fix_blob_ref_counts(self):
+        self.upload_file("a.txt", b"same")
+        self.upload_file("b.txt", b"same")
+        Blob.objects.update(ref_count=5)
+
+        output = self.fsck()
+        self.assertIn("Счётчик ссылок blob'а", output)
+        self.assertEqual(Blob.objects.get().ref_count, 5)
+
+        output = self.fsck("--fix-blobs")
+        self.assertIn("исправлено blob'ов: 1", output)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+
+    @override_settings(FILES_STORAGE_MODE="cas")
+    def test_unreferenced_blob_is_released(self):
+        file_id = self.upload_file("a.txt", b"content")
+        path = data_path(Blob.objects.get())
+        File.objects.filter(pk=file_id).delete()
+
+        self.fsck("--fix-blobs")
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from files.models import File
+
+from .base import StorageTestCase
+
+
+class KeysetListingTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        # Одинаковые размеры и NULL в last_downloaded_at проверяют порядок по id
+        for i, (name, size) in enumerate([
+            ("b.txt", 30), ("a.pdf", 10), ("d.txt", 20), ("c.png", 20), ("e.txt", 10), ("f.csv", 50),
+        ]):
+            File.objects.create(
+                owner=self.user, file=f"users/alice/{name}", original_name=name, name=name, size=size,
+                last_downloaded_at=now - timedelta(hours=i) if i % 2 else None,
+            )
+        File.objects.update(uploaded_at=now - timedelta(days=10))
+        File.objects.filter(name="f.csv").update(uploaded_at=now)
+        other, _ = self.make_user("bob")
+        File.objects.create(owner=other, file="users/bob/x.txt", original_name="x.txt", name="x.txt", size=1)
+
+    def walk(self, query):
+        """Все страницы списка по курсору; возвращает имена и число страниц."""
+        names, pages, cursor = [], 0, None
+        while True:
+            params = dict(query, limit=2)
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get("/api/files/", params)
+            self.assertEqual(response.status_code, 200, response.data)
+            names += [row["name"] for row in response.data]
+            pages += 1
+            cursor = response.get("X-Next-Cursor")
+            if not cursor:
+                return names, pages
+            self.assertIn('rel="next"', response["Link"])
+
+    def test_pages_follow_sort_order(self):
+        names, pages = self.walk({"sort": "size"})
+        self.assertEqual(names, ["a.pdf", "e.txt", "d.txt", "c.png", "b.txt", "f.csv"])
+        self.assertEqual(pages, 3)
+        names, _ = self.walk({"sort": "-name"})
+        self.assertEqual(names, ["f.csv", "e.txt", "d.txt", "c.png", "b.txt", "a.pdf"])
+
+    def test_nulls_come_last(self):
+        names, _ = self.walk({"sort": "-last_downloaded_at"})
+        self.assertEqual(names, ["a.pdf", "c.png", "f.csv", "e.txt", "d.txt", "b.txt"])
+
+    def test_filters(self):
+        names, _ = self.walk({"ext": "txt,.PDF", "sort": "name"})
+        self.assertEqual(names, ["a.pdf", "b.txt", "d.txt", "e.txt"])
+        names, _ = self.walk({"min_size": 20, "max_size": 30, "sort": "name"})
+        self.assertEqual(names, ["b.txt", "c.png", "d.txt"])
+        yesterday = (timezone.now() - timedelta(days=1)).date().isoformat()
+        names, _ = self.walk({"uploaded_after": yesterday})
+        self.assertEqual(names, ["f.csv"])
+
+    def test_trashed_files_are_hidden(self):
+        File.objects.filter(name="a.pdf").update(deleted_at=timezone.now())
+        names, _ = self.walk({"sort": "name"})
+        self.assertNotIn("a.pdf", names)
+
+    def test_invalid_parameters(self):
+        for params in (
+            {"sort": "owner"},
+            {"cursor": "not-a-cursor"},
+            {"min_size": "-1"},
+            {"uploaded_after": "yesterday"},
+        ):
+            self.assertEqual(self.client.get("/api/files/", params).status_code, 400, params)
+
+        cursor = self.client.get("/api/files/", {"sort": "size", "limit": 1})["X-Next-Cursor"]
+        response = self.client.get("/api/files/", {"sort": "name", "cursor": cursor})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,41 @@
+from django.test import override_settings
+
+from files.models import File
+from files.storage import data_path
+
+from .base import StorageTestCase
+
+
+class DownloadOffloadTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_id = self.upload_file("report.txt", b"offloaded bytes")
+        self.url = f"/api/files/{self.file_id}/download/"
+
+    @override_settings(FILES_DOWNLOAD_OFFLOAD="x-accel", FILES_ACCEL_REDIRECT_PREFIX="/protected-media/")
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        relative = File.objects.get(pk=self.file_id).file.name
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{relative}")
+        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertIn("ETag", response)
+
+    @override_settings(FILES_DOWNLOAD_OFFLOAD="x-sendfile")
+    def test_x_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["X-Sendfile"], data_path(File.objects.get(pk=self.file_id)))
+
+    @override_settings(FILES_DOWNLOAD_OFFLOAD="x-accel")
+    def test_permission_is_checked_before_offload(self):
+        _, bob_client = self.make_user("bob")
+        response = bob_client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn("X-Accel-Redirect", response)
+
+    def test_without_offload_django_streams(self):
+        response = self.client.get(self.url)
+        self.assertNotIn("X-Accel-Redirect", response)
+        self.assertEqual(self.read_body(response), b"offloaded bytes")
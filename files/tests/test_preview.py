@@ -0,0 +1,51 @@
+from django.test import override_settings
+
+from .base import StorageTestCase
+
+LINES = b"".join(f"line {i:03d}\n".encode() for i in range(100))
+
+
+@override_settings(FILES_PREVIEW_MAX_BYTES=100)
+class TextPreviewTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f"/api/files/{self.upload_file('log.txt', LINES)}/content/"
+
+    def window(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return (
+            response.content,
+            int(response["X-Preview-Start"]),
+            int(response["X-Preview-End"]),
+            int(response["X-Preview-Size"]),
+        )
+
+    def test_head_is_bounded_and_line_aligned(self):
+        data, start, end, size = self.window()
+        # Строка — 9 байт: в окно 100 байт помещаются 11 целых строк
+        self.assertEqual((start, end, size), (0, 99, len(LINES)))
+        self.assertEqual(data, LINES[:99])
+
+        data, start, end, _ = self.window(offset=end)
+        self.assertEqual(start, 99)
+        self.assertTrue(data.startswith(b"line 011\n"))
+
+    def test_tail(self):
+        data, start, end, size = self.window(mode="tail", limit=30)
+        self.assertEqual(end, size)
+        self.assertEqual(data, b"line 097\nline 098\nline 099\n")
+        self.assertEqual(start, size - 27)
+
+    def test_line(self):
+        data, start, _, _ = self.window(line=50, limit=18)
+        self.assertEqual(data, b"line 050\nline 051\n")
+        self.assertEqual(start, 50 * 9)
+
+    def test_limit_cannot_exceed_maximum(self):
+        data, _, _, _ = self.window(limit=10_000)
+        self.assertLessEqual(len(data), 100)
+
+    def test_invalid_parameters(self):
+        for params in ({"mode": "middle"}, {"offset": "-1"}, {"limit": "many"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
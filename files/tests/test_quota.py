@@ -0,0 +1,94 @@
+import io
+import threading
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+
+from accounts.models import User
+from files import trash
+from files.models import File
+from files.quota import remaining_quota, reserve_usage
+
+from .base import StorageTestCase, StorageTransactionTestCase
+
+
+class QuotaTests(StorageTestCase):
+    def usage(self):
+        return User.objects.values_list("bytes_used", "file_count").get(pk=self.user.pk)
+
+    def test_upload_over_quota_is_rejected(self):
+        User.objects.filter(pk=self.user.pk).update(quota_bytes=20)
+        self.upload_file("a.txt", b"x" * 12)
+        self.assertEqual(self.usage(), (12, 1))
+        self.assertEqual(remaining_quota(self.user.pk), 8)
+
+        response = self.upload("b.txt", b"y" * 12)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.usage(), (12, 1))
+        self.assertEqual(File.objects.count(), 1)
+
+    @override_settings(FILES_USER_QUOTA=10)
+    def test_default_quota_from_settings(self):
+        self.assertFalse(reserve_usage(self.user.pk, 11))
+        self.assertTrue(reserve_usage(self.user.pk, 10))
+        self.assertFalse(reserve_usage(self.user.pk, 1))
+        self.assertEqual(remaining_quota(self.user.pk), 0)
+        # Личная квота важнее общей
+        User.objects.filter(pk=self.user.pk).update(quota_bytes=50)
+        self.assertEqual(remaining_quota(self.user.pk), 40)
+
+    def test_check_then_reserve_cannot_overcommit(self):
+        User.objects.filter(pk=self.user.pk).update(quota_bytes=100)
+        # Два запроса прочитали остаток до того, как любой из них занял место
+        self.assertEqual(remaining_quota(self.user.pk), 100)
+        self.assertEqual(remaining_quota(self.user.pk), 100)
+        self.assertTrue(reserve_usage(self.user.pk, 60))
+        self.assertFalse(reserve_usage(self.user.pk, 60))
+        self.assertEqual(self.usage(), (60, 1))
+
+    def test_purge_releases_usage(self):
+        file_id = self.upload_file("a.txt", b"x" * 12)
+        self.client.delete(f"/api/files/{file_id}/")
+        # Файл в корзине ещё занимает место
+        self.assertEqual(self.usage(), (12, 1))
+        trash.purge_files([file_id])
+        self.assertEqual(self.usage(), (0, 0))
+
+    def test_reconcile_usage(self):
+        self.upload_file("a.txt", b"x" * 12)
+        self.upload_file("b.txt", b"y" * 3)
+        User.objects.filter(pk=self.user.pk).update(bytes_used=999, file_count=7)
+
+        out = io.StringIO()
+        call_command("reconcile_usage", "--dry-run", stdout=out)
+        self.assertIn("alice: bytes_used 999 -> 15, file_count 7 -> 2", out.getvalue())
+        self.assertEqual(self.usage(), (999, 7))
+
+        call_command("reconcile_usage", stdout=io.StringIO())
+        self.assertEqual(self.usage(), (15, 2))
+
+
+class QuotaRaceTests(StorageTransactionTestCase):
+    def test_parallel_reservations_respect_quota(self):
+        User.objects.filter(pk=self.user.pk).update(quota_bytes=100)
+        barrier = threading.Barrier(5)
+        results = []
+
+        def reserve():
+            try:
+                barrier.wait()
+                results.append(reserve_usage(self.user.pk, 30))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserve) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), [False, False, True, True, True])
+        self.assertEqual(
+            User.objects.values_list("bytes_used", "file_count").get(pk=self.user.pk), (90, 3),
+        )
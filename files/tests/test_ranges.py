@@ -0,0 +1,86 @@
+from django.test import SimpleTestCase
+
+from files.models import File
+from files.responses import MAX_RANGES, content_etag, parse_range_header
+
+from .base import StorageTestCase
+
+CONTENT = b"0123456789abcdefghij"
+
+
+class ParseRangeHeaderTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range_header("bytes=0-4", 20), [(0, 4)])
+        self.assertEqual(parse_range_header("bytes=15-", 20), [(15, 19)])
+        self.assertEqual(parse_range_header("bytes=-5", 20), [(15, 19)])
+        self.assertEqual(parse_range_header("bytes=10-100", 20), [(10, 19)])
+        # Пересекающиеся и соседние диапазоны склеиваются
+        self.assertEqual(parse_range_header("bytes=5-9,0-4,8-12", 20), [(0, 12)])
+        self.assertEqual(parse_range_header("bytes=0-1,5-6", 20), [(0, 1), (5, 6)])
+
+    def test_unsatisfiable(self):
+        self.assertEqual(parse_range_header("bytes=20-", 20), [])
+        self.assertEqual(parse_range_header("bytes=-0", 20), [])
+
+    def test_ignored(self):
+        self.assertIsNone(parse_range_header("items=0-4", 20))
+        self.assertIsNone(parse_range_header("bytes=5-1", 20))
+        self.assertIsNone(parse_range_header("bytes=abc", 20))
+        self.assertIsNone(parse_range_header("bytes=-", 20))
+        many = ",".join(f"{i * 2}-{i * 2}" for i in range(MAX_RANGES + 1))
+        self.assertIsNone(parse_range_header(f"bytes={many}", 100))
+
+
+class RangeDownloadTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_id = self.upload_file("range.txt", CONTENT)
+        self.url = f"/api/files/{self.file_id}/download/"
+
+    def test_single_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-5/20")
+        self.assertEqual(response["Content-Length"], "4")
+        self.assertEqual(self.read_body(response), b"2345")
+
+    def test_full_download_advertises_ranges(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(self.read_body(response), CONTENT)
+
+    def test_multiple_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-1,-2")
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response["Content-Type"].startswith("multipart/byteranges; boundary="))
+        body = self.read_body(response)
+        self.assertIn(b"Content-Range: bytes 0-1/20\r\n\r\n01", body)
+        self.assertIn(b"Content-Range: bytes 18-19/20\r\n\r\nij", body)
+        self.assertEqual(int(response["Content-Length"]), len(body))
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */20")
+
+    def test_if_range(self):
+        etag = content_etag(File.objects.get(pk=self.file_id))
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-0", HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        # Файл изменился: вместо части — весь файл
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-0", HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read_body(response), CONTENT)
+
+    def test_range_on_content_and_shared_download(self):
+        # Текст предпросматривается окном, Range относится к остальным типам
+        pdf_id = self.upload_file("doc.pdf", CONTENT)
+        response = self.client.get(f"/api/files/{pdf_id}/content/", HTTP_RANGE="bytes=-3")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.read_body(response), b"hij")
+
+        share_url = self.client.post(f"/api/files/shared/{self.file_id}/", {}, format="json").data["share_url"]
+        response = self.client_class().get(share_url, HTTP_RANGE="bytes=10-11")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.read_body(response), b"ab")
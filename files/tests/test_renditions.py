@@ -0,0 +1,113 @@
+import io
+import os
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import override_settings
+
+from files import renditions, trash
+from files.models import File
+
+from .base import StorageTestCase
+
+
+def make_png(width=800, height=600):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 128)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class RenditionCacheTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        # Счётчик объёма общий на процесс: каждый тест начинает с пересчёта
+        renditions._cache_bytes = None
+        self.addCleanup(setattr, renditions, "_cache_bytes", None)
+
+    def put(self, file_id, size, length, mtime):
+        path = os.path.join(renditions._shard(file_id), f"{file_id}-{size}-v.jpg")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(b"x" * length)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    @override_settings(FILES_RENDITION_CACHE_BYTES=1000)
+    def test_least_recently_used_are_evicted(self):
+        oldest = self.put(1, 128, 500, 1000)
+        older = self.put(2, 128, 500, 2000)
+        newest = self.put(3, 128, 500, 3000)
+
+        # Удаляются старые, пока кеш не уложится в 90% лимита
+        self.assertEqual(renditions.evict(), 2)
+        self.assertFalse(os.path.exists(oldest))
+        self.assertFalse(os.path.exists(older))
+        self.assertTrue(os.path.exists(newest))
+        self.assertEqual(renditions._cache_bytes, 500)
+        self.assertEqual(renditions.evict(), 0)
+
+    def test_invalidate_removes_every_size(self):
+        paths = [self.put(7, size, 10, 1000) for size in renditions.THUMBNAIL_SIZES]
+        # id 263 попадает в тот же каталог, но миниатюры другого файла не трогаются
+        other = self.put(263, 128, 10, 1000)
+        renditions.invalidate(7)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+        self.assertTrue(os.path.exists(other))
+
+
+@skipUnless(renditions._PIL_AVAILABLE, "Pillow is not installed")
+class ThumbnailViewTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        renditions._cache_bytes = None
+        self.addCleanup(setattr, renditions, "_cache_bytes", None)
+        self.file_id = self.upload_file("photo.png", make_png())
+        self.url = f"/api/files/{self.file_id}/thumbnail/"
+
+    def rendered(self):
+        """Имена миниатюр в кеше без версии содержимого."""
+        return [
+            name.rsplit("-", 1)[0] + "-"
+            for _, _, names in os.walk(settings.FILES_RENDITION_ROOT) for name in names
+        ]
+
+    def test_thumbnail_is_rendered_once_and_cached(self):
+        from PIL import Image
+
+        response = self.client.get(self.url, {"size": 128})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        with Image.open(io.BytesIO(self.read_body(response))) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(image.size, (128, 96))
+
+        self.assertEqual(self.rendered(), [f"{self.file_id}-128-"])
+
+        # Повторное чтение обновляет mtime — отметку использования для LRU
+        file_obj = File.objects.get(pk=self.file_id)
+        path = renditions.rendition_path(file_obj, 128)
+        os.utime(path, (1000, 1000))
+        self.read_body(self.client.get(self.url, {"size": 128}))
+        self.assertGreater(os.path.getmtime(path), 1000)
+
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(self.url, {"size": 128}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get(self.url, {"size": 256})["ETag"], etag)
+
+    def test_purge_drops_thumbnails(self):
+        self.read_body(self.client.get(self.url))
+        self.assertEqual(self.client.delete(f"/api/files/{self.file_id}/").status_code, 204)
+        # В корзине миниатюры остаются: файл ещё можно восстановить
+        self.assertEqual(len(self.rendered()), 1)
+        self.assertEqual(trash.purge_files([self.file_id]), 1)
+        self.assertEqual(self.rendered(), [])
+
+    def test_invalid_requests(self):
+        for size in ("64", "big"):
+            self.assertEqual(self.client.get(self.url, {"size": size}).status_code, 400, size)
+        text_id = self.upload_file("notes.txt")
+        self.assertEqual(self.client.get(f"/api/files/{text_id}/thumbnail/").status_code, 404)
+        _, bob_client = self.make_user("bob")
+        self.assertEqual(bob_client.get(self.url).status_code, 403)
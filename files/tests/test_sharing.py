@@ -0,0 +1,142 @@
+import os
+import time
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlparse
+
+from django.core import signing
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from files import sharing
+from files.models import File, ShareDownload, ShareRevocation
+from files.storage import data_path
+
+from .base import StorageTestCase
+
+
+@override_settings(FILES_SHARE_MAX_TTL=3600)
+class ShareLinkTests(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        # Кеш отзывов общий на процесс: каждый тест подгружает его заново
+        for name, value in (("_synced_until", None), ("_next_refresh", 0.0), ("_next_prune", 0.0)):
+            setattr(sharing, name, value)
+            self.addCleanup(setattr, sharing, name, value)
+        sharing._revoked.clear()
+        self.addCleanup(sharing._revoked.clear)
+        self.file_id = self.upload_file("shared.txt", b"public data")
+
+    def share(self, **data):
+        response = self.client.post(f"/api/files/shared/{self.file_id}/", data, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return urlparse(response.data["share_url"]).path, response.data
+
+    def test_download_without_database_lookup(self):
+        path, _ = self.share()
+        self.client.force_authenticate(None)
+        self.read_body(self.client.get(path))
+        sharing._next_refresh = time.monotonic() + 60
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+            self.assertEqual(self.read_body(response), b"public data")
+        # Пишется только статистика скачиваний, файл в базе не ищется
+        self.assertFalse([q for q in queries if q["sql"].startswith("SELECT")])
+
+    def test_token_reveals_no_storage_details(self):
+        path, _ = self.share(max_downloads=3)
+        payload = signing.loads(path.rstrip("/").rsplit("/", 1)[1], salt=sharing.SHARE_SALT)
+        self.assertEqual(sorted(payload), ["e", "f", "i", "j", "m"])
+        self.assertEqual(payload["f"], self.file_id)
+
+    def test_moved_data_is_found_past_the_cache(self):
+        path, _ = self.share()
+        self.read_body(self.client.get(path))
+        # Данные переехали (как при переносе в blob), в кеше старый путь
+        file_obj = File.objects.get(pk=self.file_id)
+        old_path = data_path(file_obj)
+        file_obj.file.name = f"{file_obj.file.name}.moved"
+        os.rename(old_path, data_path(file_obj))
+        file_obj.save(update_fields=["file"])
+        self.assertEqual(self.read_body(self.client.get(path)), b"public data")
+
+    def test_tampered_token(self):
+        path, _ = self.share()
+        self.assertEqual(self.client.get(path[:-3] + "xx/").status_code, 404)
+
+    def test_expiry_is_capped_by_max_ttl(self):
+        with mock.patch("time.time", return_value=time.time() - 7200):
+            token, expires_at = sharing.make_share_token(File.objects.get(pk=self.file_id), 10 ** 6)
+        self.assertEqual(signing.loads(token, salt=sharing.SHARE_SALT)["e"], expires_at)
+        response = self.client.get(f"/api/files/shared/{token}/")
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.data["error"], "Share link has expired")
+
+        _, data = self.share(expires_in=10 ** 6)
+        self.assertIn("GMT", data["expires_at"])
+        self.assertEqual(self.client.post(
+            f"/api/files/shared/{self.file_id}/", {"expires_in": "-5"}, format="json",
+        ).status_code, 400)
+
+    def test_revoke_invalidates_issued_links(self):
+        path, _ = self.share()
+        self.assertEqual(self.client.get(path).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f"/api/files/shared/{self.file_id}/").status_code, 204)
+        self.assertEqual(self.client.get(path).status_code, 410)
+        self.assertEqual(ShareRevocation.objects.filter(file_id=self.file_id).count(), 1)
+
+        # Новая ссылка после отзыва работает
+        path, _ = self.share()
+        self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_revocation_reaches_other_workers(self):
+        path, _ = self.share()
+        # Отзыв, записанный другим воркером, виден после подгрузки из базы
+        ShareRevocation.objects.create(file_id=self.file_id, revoked_at=timezone.now())
+        sharing._next_refresh = 0.0
+        self.assertEqual(self.client.get(path).status_code, 410)
+
+    def test_delete_revokes_links(self):
+        path, _ = self.share()
+        unshared = self.upload_file("private.txt")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f"/api/files/{self.file_id}/").status_code, 204)
+            self.assertEqual(self.client.delete(f"/api/files/{unshared}/").status_code, 204)
+        self.assertEqual(self.client.get(path).status_code, 410)
+        # Файлам без ссылок запись отзыва не нужна
+        self.assertEqual(list(ShareRevocation.objects.values_list("file_id", flat=True)), [self.file_id])
+
+    def test_download_limit_is_shared(self):
+        path, data = self.share(max_downloads=2)
+        self.assertEqual(data["max_downloads"], 2)
+        self.assertEqual(self.read_body(self.client.get(path)), b"public data")
+        # Докачка не считается новым скачиванием
+        response = self.client.get(path, HTTP_RANGE="bytes=7-")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.read_body(response), b"data")
+        self.assertEqual(self.read_body(self.client.get(path)), b"public data")
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.data["error"], "Download limit reached")
+        self.assertEqual(ShareDownload.objects.get().count, 2)
+
+    def test_prune_drops_expired_state(self):
+        old = timezone.now() - timedelta(hours=2)
+        ShareRevocation.objects.create(file_id=self.file_id, revoked_at=old)
+        ShareDownload.objects.create(token_id="old", expires_at=old)
+        ShareDownload.objects.create(token_id="live", expires_at=timezone.now() + timedelta(hours=1))
+        sharing._revoked[self.file_id] = old.timestamp()
+
+        sharing._prune()
+        self.assertFalse(ShareRevocation.objects.exists())
+        self.assertEqual(list(ShareDownload.objects.values_list("token_id", flat=True)), ["live"])
+        self.assertNotIn(self.file_id, sharing._revoked)
+
+    def test_legacy_token(self):
+        token = File.objects.get(pk=self.file_id).share_token
+        self.assertEqual(self.read_body(self.client.get(f"/api/files/shared/{token}/")), b"public data")
+        self.client.delete(f"/api/files/shared/{self.file_id}/")
+        self.assertEqual(self.client.get(f"/api/files/shared/{token}/").status_code, 404)
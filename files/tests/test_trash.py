@@ -0,0 +1,131 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from files import trash
+from files.models import File
+from files.storage import data_path
+
+from .base import StorageTestCase
+
+
+class PurgeWindowTests(SimpleTestCase):
+    def at(self, hour):
+        return timezone.make_aware(datetime(2026, 1, 1, hour, 30))
+
+    def test_parse(self):
+        self.assertIsNone(trash.parse_purge_hours(" "))
+        self.assertEqual(trash.parse_purge_hours("22-5"), (22, 5))
+        for spec in ("night", "1-24", "3"):
+            with self.assertRaises(ImproperlyConfigured):
+                trash.parse_purge_hours(spec)
+
+    def test_window(self):
+        with override_settings(FILES_TRASH_PURGE_HOURS="1-6"):
+            self.assertEqual([h for h in range(24) if trash.in_purge_window(self.at(h))], [1, 2, 3, 4, 5, 6])
+        # Окно через полночь
+        with override_settings(FILES_TRASH_PURGE_HOURS="22-1"):
+            self.assertEqual([h for h in range(24) if trash.in_purge_window(self.at(h))], [0, 1, 22, 23])
+        with override_settings(FILES_TRASH_PURGE_HOURS=""):
+            self.assertTrue(trash.in_purge_window(self.at(12)))
+
+
+@override_settings(FILES_TRASH_RETENTION_DAYS=30)
+class TrashTests(StorageTestCase):
+    def expire(self, *file_ids):
+        File.objects.filter(pk__in=file_ids).update(deleted_at=timezone.now() - timedelta(days=31))
+
+    def test_delete_moves_to_trash_and_restore(self):
+        file_id = self.upload_file("a.txt")
+        self.assertEqual(self.client.delete(f"/api/files/{file_id}/").status_code, 204)
+        self.assertEqual(self.client.get("/api/files/").data, [])
+        self.assertEqual(self.client.get(f"/api/files/{file_id}/download/").status_code, 404)
+
+        rows = self.client.get("/api/files/trash/").data["files"]
+        self.assertEqual([row["id"] for row in rows], [file_id])
+        self.assertEqual(rows[0]["purge_at"], rows[0]["deleted_at"] + timedelta(days=30))
+
+        _, bob_client = self.make_user("bob")
+        self.assertEqual(bob_client.post(f"/api/files/{file_id}/restore/").status_code, 403)
+        self.assertEqual(self.client.post(f"/api/files/{file_id}/restore/").status_code, 200)
+        self.assertEqual(self.read_body(self.client.get(f"/api/files/{file_id}/download/")), b"hello world\n")
+        self.assertEqual(self.client.post(f"/api/files/{file_id}/restore/").status_code, 404)
+
+    def test_expired_files_cannot_be_restored(self):
+        file_id = self.upload_file("a.txt")
+        self.client.delete(f"/api/files/{file_id}/")
+        self.expire(file_id)
+        self.assertEqual(self.client.get("/api/files/trash/").data["files"], [])
+        self.assertEqual(self.client.post(f"/api/files/{file_id}/restore/").status_code, 404)
+
+    def test_empty_trash_leaves_purge_to_background(self):
+        ids = [self.upload_file(f"{i}.txt") for i in range(3)]
+        path = data_path(File.objects.get(pk=ids[0]))
+        for file_id in ids[:2]:
+            self.client.delete(f"/api/files/{file_id}/")
+
+        response = self.client.delete("/api/files/trash/")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data, {"purged": 2})
+        self.assertEqual(self.client.get("/api/files/trash/").data["files"], [])
+        # Данные удаляются очисткой, а не в запросе
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(trash.expired_trash().count(), 2)
+
+    def test_empty_trash_releases_quota_at_once(self):
+        User.objects.filter(pk=self.user.pk).update(quota_bytes=20)
+        ids = [self.upload_file(f"{i}.txt", b"x" * 10) for i in range(2)]
+        self.assertEqual(self.upload("c.txt", b"x" * 10).status_code, 413)
+        for file_id in ids:
+            self.client.delete(f"/api/files/{file_id}/")
+        # Файлы в корзине занимают место, пока её не очистят
+        self.assertEqual(self.upload("c.txt", b"x" * 10).status_code, 413)
+
+        self.assertEqual(self.client.delete("/api/files/trash/").data, {"purged": 2})
+        self.assertEqual(User.objects.values_list("bytes_used", "file_count").get(pk=self.user.pk), (0, 0))
+        self.upload_file("c.txt", b"x" * 10)
+        self.upload_file("d.txt", b"x" * 10)
+
+        # Очистка удаляет данные, не освобождая квоту второй раз
+        self.assertEqual(trash.purge_expired_batch(), 2)
+        self.assertEqual(User.objects.values_list("bytes_used", "file_count").get(pk=self.user.pk), (20, 2))
+        self.assertEqual(self.client.delete("/api/files/trash/").data, {"purged": 0})
+
+    def test_reconcile_skips_emptied_trash(self):
+        file_id = self.upload_file("a.txt", b"x" * 10)
+        self.upload_file("b.txt", b"y" * 3)
+        self.client.delete(f"/api/files/{file_id}/")
+        self.client.delete("/api/files/trash/")
+        out = io.StringIO()
+        call_command("reconcile_usage", stdout=out)
+        self.assertIn("исправлено: 0", out.getvalue())
+
+    def test_purge_in_batches(self):
+        ids = [self.upload_file(f"{i}.txt", b"x" * 10) for i in range(3)]
+        paths = [data_path(file_obj) for file_obj in File.objects.order_by("id")]
+        File.objects.filter(pk__in=ids).update(deleted_at=timezone.now())
+        self.expire(*ids[:2])
+
+        self.assertEqual(trash.purge_expired_batch(batch_size=1), 1)
+        self.assertEqual(trash.purge_expired_batch(batch_size=10), 1)
+        self.assertEqual(trash.purge_expired_batch(), 0)
+        self.assertEqual([os.path.exists(path) for path in paths], [False, False, True])
+        self.assertEqual(list(File.objects.values_list("id", flat=True)), [ids[2]])
+        self.assertEqual(User.objects.values_list("bytes_used", "file_count").get(pk=self.user.pk), (10, 1))
+
+    def test_purge_command(self):
+        ids = [self.upload_file(f"{i}.txt") for i in range(3)]
+        File.objects.filter(pk__in=ids).update(deleted_at=timezone.now())
+        self.expire(*ids)
+        out = io.StringIO()
+        call_command("purge_trash", "--dry-run", stdout=out)
+        self.assertIn("Файлов к удалению: 3", out.getvalue())
+        call_command("purge_trash", "--batch", "2", "--pause", "0", stdout=out)
+        self.assertIn("Удалено файлов из корзины: 3", out.getvalue())
+        self.assertFalse(File.objects.exists())
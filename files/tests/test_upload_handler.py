@@ -0,0 +1,64 @@
+import hashlib
+import os
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from files.models import File
+from files.storage import data_path
+from files.upload_handlers import MULTIPART_OVERHEAD, StreamingUploadHandler
+
+from .base import StorageTestCase
+
+
+class StreamingUploadTests(StorageTestCase):
+    def stored_files(self):
+        found = []
+        for dirpath, _, filenames in os.walk(os.path.join(self.media_root, "users")):
+            found += [os.path.join(dirpath, name) for name in filenames]
+        return found
+
+    def test_upload_is_written_once_with_hash(self):
+        content = b"line\n" * 10000
+        response = self.upload("notes.txt", content, comment="hi")
+        self.assertEqual(response.status_code, 201)
+        file_obj = File.objects.get(pk=response.data["id"])
+        self.assertEqual(file_obj.size, len(content))
+        self.assertEqual(file_obj.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(file_obj.comment, "hi")
+        with open(data_path(file_obj), "rb") as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(self.stored_files(), [data_path(file_obj)])
+
+    def test_rest_upload_endpoint(self):
+        response = self.client.post("/api/files/", {"file": SimpleUploadedFile("a.txt", b"abc")}, format="multipart")
+        self.assertEqual(response.status_code, 201)
+
+    def test_dangerous_extension_is_rejected(self):
+        response = self.upload("setup.exe", b"MZ" + b"\0" * 100)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(File.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    @override_settings(FILES_UPLOAD_MAX_SIZE=1000)
+    def test_oversized_file_is_rejected_mid_stream(self):
+        # Тело меньше порога Content-Length, файл отклоняется при приёме байт
+        response = self.upload("big.txt", b"x" * 5000)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(File.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_disallowed_mime_is_rejected(self):
+        with mock.patch("files.upload_handlers.detect_mime", return_value="application/x-dosexec"):
+            response = self.upload("report.pdf", b"%PDF" + b"\0" * 100)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "MIME type is not allowed")
+        self.assertEqual(self.stored_files(), [])
+
+    def test_content_length_over_limit_skips_body(self):
+        handler = StreamingUploadHandler(max_size=1000)
+        result = handler.handle_raw_input(None, {}, 1000 + MULTIPART_OVERHEAD + 1, b"boundary")
+        self.assertIsNotNone(result)
+        self.assertEqual(handler.error[1], 413)
+        self.assertEqual(handler.reason, "size")
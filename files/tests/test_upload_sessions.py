@@ -0,0 +1,118 @@
+import io
+import os
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from files.models import File, UploadSession
+from files.storage import data_path, safe_path
+from files.upload_sessions import purge_expired_sessions
+from files.views import UPLOAD_MIN_CHUNK_SIZE
+
+from .base import StorageTestCase
+
+CHUNK = UPLOAD_MIN_CHUNK_SIZE
+
+
+class UploadSessionTests(StorageTestCase):
+    def create_session(self, size, name="big.txt", client=None):
+        client = client or self.client
+        return client.post(
+            "/api/files/uploads/", {"name": name, "size": size, "chunk_size": CHUNK}, format="json"
+        )
+
+    def put_chunk(self, session_id, index, data):
+        return self.client.put(
+            f"/api/files/uploads/{session_id}/chunks/{index}/", data,
+            content_type="application/octet-stream",
+        )
+
+    def usage(self):
+        return User.objects.values_list("bytes_used", "file_count").get(pk=self.user.pk)
+
+    def test_chunks_in_any_order_assemble_the_file(self):
+        content = b"a" * CHUNK + b"b" * CHUNK + b"tail\n"
+        response = self.create_session(len(content))
+        self.assertEqual(response.status_code, 201)
+        session_id = response.data["id"]
+        self.assertEqual(response.data["total_chunks"], 3)
+        self.assertEqual(self.usage(), (len(content), 1))
+
+        self.assertEqual(self.put_chunk(session_id, 2, content[2 * CHUNK:]).status_code, 200)
+        self.assertEqual(self.put_chunk(session_id, 0, content[:CHUNK]).status_code, 200)
+        state = self.client.get(f"/api/files/uploads/{session_id}/").data
+        self.assertEqual(state["missing_chunks"], [1])
+        self.assertEqual(state["received"], [[0, CHUNK - 1], [2 * CHUNK, len(content) - 1]])
+
+        response = self.client.post(f"/api/files/uploads/{session_id}/complete/")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["missing_chunks"], [1])
+
+        self.put_chunk(session_id, 1, content[CHUNK:2 * CHUNK])
+        response = self.client.post(f"/api/files/uploads/{session_id}/complete/")
+        self.assertEqual(response.status_code, 201)
+        file_obj = File.objects.get(pk=response.data["id"])
+        with open(data_path(file_obj), "rb") as f:
+            self.assertEqual(f.read(), content)
+        self.assertFalse(UploadSession.objects.exists())
+        # Резерв сессии перешёл к файлу, а не удвоился
+        self.assertEqual(self.usage(), (len(content), 1))
+
+        response = self.client.post(f"/api/files/uploads/{session_id}/complete/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_chunk_with_wrong_length_is_rejected(self):
+        session_id = self.create_session(CHUNK + 10).data["id"]
+        self.assertEqual(self.put_chunk(session_id, 0, b"short").status_code, 400)
+        self.assertEqual(self.put_chunk(session_id, 5, b"x" * 10).status_code, 400)
+
+    def test_session_reserves_quota(self):
+        User.objects.filter(pk=self.user.pk).update(quota_bytes=CHUNK * 3)
+        self.assertEqual(self.create_session(CHUNK * 2).status_code, 201)
+        self.assertEqual(self.create_session(CHUNK * 2).status_code, 413)
+        self.assertEqual(self.usage(), (CHUNK * 2, 1))
+
+    @override_settings(FILES_UPLOAD_MAX_SESSIONS=2)
+    def test_open_sessions_are_capped(self):
+        self.assertEqual(self.create_session(100).status_code, 201)
+        self.assertEqual(self.create_session(100).status_code, 201)
+        self.assertEqual(self.create_session(100).status_code, 429)
+        # Отказ по числу сессий не оставляет резерва квоты
+        self.assertEqual(self.usage(), (200, 2))
+
+    def test_abort_releases_quota_and_data(self):
+        session_id = self.create_session(100).data["id"]
+        session = UploadSession.objects.get(pk=session_id)
+        path = safe_path(session.storage_name, session.volume)
+        self.assertTrue(os.path.exists(path))
+
+        response = self.client.delete(f"/api/files/uploads/{session_id}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.usage(), (0, 0))
+
+    @override_settings(FILES_UPLOAD_SESSION_TTL=3600)
+    def test_expired_sessions_are_purged(self):
+        stale_id = self.create_session(CHUNK + 1).data["id"]
+        active_id = self.create_session(CHUNK + 1).data["id"]
+        fresh_id = self.create_session(100).data["id"]
+        old = timezone.now() - timedelta(hours=2)
+        UploadSession.objects.filter(pk__in=[stale_id, active_id]).update(created_at=old)
+        # Часть, принятая недавно, продлевает жизнь старой сессии
+        self.put_chunk(active_id, 0, b"x" * CHUNK)
+
+        self.assertEqual(purge_expired_sessions(), 1)
+        self.assertEqual(set(UploadSession.objects.values_list("id", flat=True)), {active_id, fresh_id})
+        self.assertEqual(self.usage(), (CHUNK + 101, 2))
+
+    @override_settings(FILES_UPLOAD_SESSION_TTL=3600)
+    def test_purge_command_dry_run(self):
+        session_id = self.create_session(100).data["id"]
+        UploadSession.objects.filter(pk=session_id).update(created_at=timezone.now() - timedelta(days=1))
+        call_command("purge_upload_sessions", "--dry-run", stdout=io.StringIO())
+        self.assertTrue(UploadSession.objects.filter(pk=session_id).exists())
+        call_command("purge_upload_sessions", stdout=io.StringIO())
+        self.assertFalse(UploadSession.objects.filter(pk=session_id).exists())
@@ -0,0 +1,98 @@
+import io
+import os
+from collections import Counter
+from urllib.parse import urlparse
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from files.models import File
+from files.storage import Volume, data_path, parse_volumes, place_file, place_volume
+
+from .base import StorageTestCase
+
+
+class VolumePlacementTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(parse_volumes("a=/mnt/a, b=/mnt/b:2.5,,"), {
+            "a": Volume("a", "/mnt/a", 1.0),
+            "b": Volume("b", "/mnt/b", 2.5),
+        })
+        # Двоеточие без числа — часть пути
+        self.assertEqual(parse_volumes("c=/mnt/c:x")["c"].root, "/mnt/c:x")
+        for spec in ("/mnt/a", "=/mnt/a", "a=", "a=/mnt/a:0", "a=/x,a=/y"):
+            with self.assertRaises(ImproperlyConfigured):
+                parse_volumes(spec)
+
+    def placements(self, spec, keys):
+        with override_settings(FILES_VOLUMES=spec):
+            return {key: place_volume(key) for key in keys}
+
+    def test_adding_volume_moves_only_its_share(self):
+        keys = [f"key-{i}" for i in range(3000)]
+        before = self.placements("a=/a,b=/b", keys)
+        self.assertEqual(before, self.placements("b=/b,a=/a", keys))
+        after = self.placements("a=/a,b=/b,c=/c", keys)
+        moved = [key for key in keys if before[key] != after[key]]
+        # Переезжают только ключи, доставшиеся новому тому, — около трети
+        self.assertTrue(all(after[key] == "c" for key in moved))
+        self.assertAlmostEqual(len(moved) / len(keys), 1 / 3, delta=0.05)
+
+    def test_weights(self):
+        counts = Counter(self.placements("a=/a,b=/b:3", [f"key-{i}" for i in range(4000)]).values())
+        self.assertAlmostEqual(counts["b"] / 4000, 0.75, delta=0.04)
+
+
+class VolumeStorageTests(StorageTestCase):
+    def use_volumes(self, spec):
+        volumes = override_settings(FILES_VOLUMES=spec.format(root=self.media_root))
+        volumes.enable()
+        self.addCleanup(volumes.disable)
+
+    def test_uploads_are_spread_over_volumes(self):
+        self.use_volumes("a={root}/a,b={root}/b")
+        ids = [self.upload_file(f"{i}.txt", f"file {i}".encode()) for i in range(20)]
+        files = File.objects.filter(pk__in=ids)
+        self.assertEqual({file_obj.volume for file_obj in files}, {"a", "b"})
+        for file_obj in files:
+            path = data_path(file_obj)
+            self.assertTrue(path.startswith(os.path.join(self.media_root, file_obj.volume) + os.sep))
+            self.assertTrue(os.path.exists(path))
+        file_obj = files.first()
+        self.assertEqual(
+            self.read_body(self.client.get(f"/api/files/{file_obj.id}/download/")),
+            f"file {ids.index(file_obj.id)}".encode(),
+        )
+
+    def test_rebalance_after_adding_volume(self):
+        self.use_volumes("a={root}/a")
+        ids = [self.upload_file(f"{i}.txt", f"file {i}".encode()) for i in range(12)]
+        with override_settings(FILES_VOLUMES="a={0}/a,b={0}/b".format(self.media_root)):
+            moving = next(f for f in File.objects.all() if place_file(f.file.name) == "b")
+        share_url = self.client.post(f"/api/files/shared/{moving.id}/").data["share_url"]
+        old_paths = {file_obj.id: data_path(file_obj) for file_obj in File.objects.all()}
+
+        self.use_volumes("a={root}/a,b={root}/b")
+        out = io.StringIO()
+        call_command("rebalance_volumes", "--dry-run", stdout=out)
+        self.assertEqual(set(File.objects.values_list("volume", flat=True)), {"a"})
+
+        call_command("rebalance_volumes", stdout=out)
+        moved = File.objects.filter(volume="b")
+        self.assertTrue(moved.exists())
+        self.assertIn(f"[dry-run] Перенесено объектов: {moved.count()}", out.getvalue())
+        for file_obj in File.objects.all():
+            self.assertTrue(os.path.exists(data_path(file_obj)))
+            self.assertEqual(os.path.exists(old_paths[file_obj.id]), file_obj.volume == "a")
+            self.assertEqual(
+                self.read_body(self.client.get(f"/api/files/{file_obj.id}/download/")),
+                f"file {ids.index(file_obj.id)}".encode(),
+            )
+        # Ссылка, выданная до переноса, находит данные на новом томе
+        self.assertEqual(
+            self.read_body(self.client.get(urlparse(share_url).path)), f"file {ids.index(moving.id)}".encode(),
+        )
+
+        call_command("rebalance_volumes", stdout=out)
+        self.assertIn("Перенесено объектов: 0 ", out.getvalue().splitlines()[-1])
@@ -0,0 +1,201 @@
+"""Корзина: отложенное окончательное удаление файлов.
+
+Удаление файла только отмечает его ``deleted_at``; строки, квота и данные на
+диске освобождаются позже (квота очищенной корзины — сразу) — фоновым потоком воркера (``FILES_TRASH_PURGER``)
+или командой ``purge_trash``. Очистка идёт пачками по
+``FILES_TRASH_PURGE_BATCH`` файлов с паузой ``FILES_TRASH_PURGE_PAUSE``
+секунд и только в часы ``FILES_TRASH_PURGE_HOURS``, чтобы не нагружать
+диск в часы пик. Тот же поток удаляет заброшенные сессии загрузки.
+
+Поток запускается в каждом воркере, но очищает только тот, кто держит
+файловую блокировку ``FILES_TRASH_PURGER_LOCK``; остальные ждут и
+подхватывают очистку, если этот воркер завершится. Воркеры на разных хостах
+не удаляют одни и те же файлы дважды: строки берутся с SKIP LOCKED.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.utils import timezone
+
+try:
+    import fcntl  # type: ignore
+    _FCNTL_AVAILABLE = True
+except Exception:
+    fcntl = None  # type: ignore
+    _FCNTL_AVAILABLE = False
+
+from . import renditions
+from .models import File
+from .quota import release_usage
+from .storage import release_blobs, remove_paths, safe_path
+from .upload_sessions import purge_expired_sessions
+
+logger = logging.getLogger(__name__)
+
+# Пауза потока очистки, когда удалять нечего или сейчас не время
+IDLE_SLEEP = 300
+
+_lock = threading.Lock()
+_purger = None
+# Открытый файл блокировки ведущего воркера (держится до конца процесса)
+_leader_lock = None
+
+
+def purge_at(deleted_at):
+    """Когда файл из корзины будет удалён окончательно."""
+    return deleted_at + timedelta(days=settings.FILES_TRASH_RETENTION_DAYS)
+
+
+def trash_cutoff():
+    """Файлы, удалённые раньше этого момента, ждут окончательного удаления."""
+    return timezone.now() - timedelta(days=settings.FILES_TRASH_RETENTION_DAYS)
+
+
+def expired_trash():
+    return File.objects.trashed().filter(deleted_at__lt=trash_cutoff())
+
+
+def restorable_trash():
+    """Файлы корзины, которые ещё можно восстановить."""
+    return File.objects.trashed().filter(deleted_at__gte=trash_cutoff())
+
+
+def empty_trash(owner_id):
+    """Очищает корзину: файлы сразу становятся истёкшими и удаляются обычной очисткой.
+
+    Квота освобождается сразу, в той же транзакции. Данные удаляет фоновый
+    поток или purge_trash — теми же пачками с паузами и в те же часы, что и
+    файлы с истёкшим сроком.
+    """
+    expired_at = trash_cutoff() - timedelta(seconds=1)
+    with transaction.atomic():
+        # Блокировка строк: параллельное восстановление не вернёт файл, чья квота уже снята
+        rows = list(
+            restorable_trash().filter(owner_id=owner_id, usage_released=False)
+            .select_for_update().values_list("id", "size")
+        )
+        if not rows:
+            return 0
+        File.objects.filter(id__in=[file_id for file_id, _ in rows]).update(
+            deleted_at=expired_at, usage_released=True,
+        )
+        release_usage(owner_id, sum(size for _, size in rows), count=len(rows))
+    return len(rows)
+
+
+def purge_files(file_ids):
+    """Окончательно удаляет файлы из корзины: строки, квоту и данные. Возвращает их число."""
+    with transaction.atomic():
+        # Строки, которые уже чистит другой воркер, пропускаются
+        rows = list(
+            File.objects.trashed().filter(id__in=file_ids)
+            .select_for_update(skip_locked=True)
+            .values("id", "owner_id", "file", "volume", "blob_id", "size", "usage_released")
+        )
+        if not rows:
+            return 0
+        usage = {}
+        blob_refs = {}
+        paths = []
+        for row in rows:
+            if not row["usage_released"]:
+                size, count = usage.get(row["owner_id"], (0, 0))
+                usage[row["owner_id"]] = (size + row["size"], count + 1)
+            if row["blob_id"]:
+                blob_refs[row["blob_id"]] = blob_refs.get(row["blob_id"], 0) + 1
+            else:
+                file_path = safe_path(row["file"], row["volume"])
+                if file_path:
+                    paths.append(file_path)
+        File.objects.filter(id__in=[row["id"] for row in rows]).delete()
+        for owner_id, (size, count) in usage.items():
+            release_usage(owner_id, size, count=count)
+        paths += release_blobs(blob_refs)
+
+    remove_paths(paths)
+    for row in rows:
+        renditions.invalidate(row["id"])
+    return len(rows)
+
+
+def purge_expired_batch(batch_size=None):
+    """Удаляет одну пачку файлов с истёкшим сроком хранения в корзине."""
+    batch_size = batch_size or settings.FILES_TRASH_PURGE_BATCH
+    ids = list(expired_trash().order_by("deleted_at").values_list("id", flat=True)[:batch_size])
+    return purge_files(ids) if ids else 0
+
+
+def parse_purge_hours(spec):
+    """Разбирает FILES_TRASH_PURGE_HOURS ("1-6", "22-5") -> (начало, конец); пусто — None."""
+    spec = spec.strip()
+    if not spec:
+        return None
+    start, sep, end = spec.partition("-")
+    try:
+        hours = int(start), int(end)
+    except ValueError:
+        hours = None
+    if not sep or hours is None or not all(0 <= hour <= 23 for hour in hours):
+        raise ImproperlyConfigured(f"Invalid FILES_TRASH_PURGE_HOURS: {spec!r}")
+    return hours
+
+
+def in_purge_window(moment=None):
+    """Попадает ли момент в часы очистки FILES_TRASH_PURGE_HOURS (пусто — всегда)."""
+    hours = parse_purge_hours(settings.FILES_TRASH_PURGE_HOURS)
+    if hours is None:
+        return True
+    start, end = hours
+    hour = timezone.localtime(moment).hour
+    if start <= end:
+        return start <= hour <= end
+    # Окно через полночь
+    return hour >= start or hour <= end
+
+
+def _become_leader():
+    """Берёт файловую блокировку очистки; False — очистку ведёт другой воркер."""
+    global _leader_lock
+    if _leader_lock is not None or not _FCNTL_AVAILABLE:
+        return True
+    handle = open(settings.FILES_TRASH_PURGER_LOCK, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _leader_lock = handle
+    return True
+
+
+def _purge_loop():
+    while True:
+        purged = 0
+        try:
+            if _become_leader() and in_purge_window():
+                purged = purge_expired_batch()
+                if purged:
+                    logger.info("Trash purger: removed %d files", purged)
+                purged += purge_expired_sessions(settings.FILES_TRASH_PURGE_BATCH)
+        except Exception:
+            # Поток не должен умирать: следующая попытка — после паузы
+            logger.exception("Trash purger failed")
+        finally:
+            connections.close_all()
+        time.sleep(settings.FILES_TRASH_PURGE_PAUSE if purged else IDLE_SLEEP)
+
+
+def ensure_purger():
+    """Запускает фоновый поток очистки корзины в этом процессе (один раз)."""
+    global _purger
+    if _purger is not None or not settings.FILES_TRASH_PURGER:
+        return
+    with _lock:
+        if _purger is None:
+            _purger = threading.Thread(target=_purge_loop, name="files-trash-purger", daemon=True)
+            _purger.start()
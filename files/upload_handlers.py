@@ -0,0 +1,191 @@
+"""Потоковая загрузка файлов за один проход.
+
+Обработчик проверяет имя и расширение при начале файла, MIME — по первому
+блоку данных, считает SHA-256 и пишет байты сразу в итоговый путь
+``user_storage_path`` — сжимая их на лету, если формат сжимаемый и
+включён ``FILES_COMPRESSION``. Слишком большие или запрещённые файлы
+отклоняются посреди загрузки, без записи остатка тела на диск.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+from .compression import CODEC_NONE, open_writer, upload_codec
+from .models import File, user_storage_path
+from .storage import place_file, safe_path
+from .validation import (
+    MIME_SNIFF_BYTES,
+    clean_file_name,
+    detect_mime,
+    is_extension_allowed,
+    is_mime_allowed,
+)
+
+# Запас на заголовки multipart и текстовые поля формы
+MULTIPART_OVERHEAD = 64 * 1024
+HASH_BUFFER = 1024 * 1024
+QUOTA_EXCEEDED_MESSAGE = "Storage quota exceeded"
+
+
+def file_sha256(path):
+    """SHA-256 файла на диске."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BUFFER), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StoredUploadedFile(UploadedFile):
+    """Файл, уже записанный обработчиком в хранилище под ``storage_name``."""
+
+    def __init__(self, storage_name, name, content_type, size, sha256, codec=CODEC_NONE, stored_size=None,
+                 volume=""):
+        super().__init__(file=None, name=name, content_type=content_type, size=size)
+        self.storage_name = storage_name
+        self.volume = volume
+        self.sha256 = sha256
+        self.codec = codec
+        self.stored_size = size if stored_size is None else stored_size
+
+    def close(self):
+        pass
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """Принимает единственное поле ``file`` и пишет его в хранилище владельца.
+
+    При отказе в ``error`` остаётся пара (сообщение, HTTP-статус), а в
+    ``reason`` — причина для метрик (size, extension, mime, quota, name, path).
+    ``quota_remaining`` — свободное место в квоте владельца (None — без ограничения).
+    """
+
+    field_name = "file"
+
+    def __init__(self, request=None, max_size=None, quota_remaining=None):
+        super().__init__(request)
+        self.max_size = max_size if max_size is not None else settings.FILES_UPLOAD_MAX_SIZE
+        self.quota_remaining = quota_remaining
+        self.error = None
+        self.reason = None
+        self.uploaded = None
+        self.storage_name = None
+        self.volume = ""
+        self._path = None
+        self._head = b""
+        self._sniffed = False
+        self._size = 0
+        self._digest = None
+        self.codec = CODEC_NONE
+
+    def reject(self, message, status_code, reason):
+        self.error = (message, status_code)
+        self.reason = reason
+        self.discard()
+        raise StopUpload(connection_reset=True)
+
+    def discard(self):
+        """Удаляет частично записанный файл."""
+        if getattr(self, "file", None) is not None:
+            self.file.close()
+        if self._path and os.path.exists(self._path):
+            os.remove(self._path)
+        self._path = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > self.max_size + MULTIPART_OVERHEAD:
+            # Тело не читается вовсе: отказ по заголовку Content-Length
+            self.error = (f"File too large (>{self.max_size // (1024 * 1024)}MB)", 413)
+            self.reason = "size"
+            return QueryDict(encoding=encoding), MultiValueDict()
+        if self._over_quota(content_length - MULTIPART_OVERHEAD if content_length else 0):
+            self.error = (QUOTA_EXCEEDED_MESSAGE, 413)
+            self.reason = "quota"
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def _over_quota(self, size):
+        return self.quota_remaining is not None and size > self.quota_remaining
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name != self.field_name or self.storage_name is not None:
+            raise SkipFile()
+
+        original_name = clean_file_name(file_name)
+        if not original_name:
+            self.reject("Invalid file name", 400, "name")
+        if not is_extension_allowed(original_name):
+            self.reject("This file type is not allowed", 400, "extension")
+        if content_length is not None and content_length > self.max_size:
+            self.reject(f"File too large (>{self.max_size // (1024 * 1024)}MB)", 413, "size")
+        if content_length is not None and self._over_quota(content_length):
+            self.reject(QUOTA_EXCEEDED_MESSAGE, 413, "quota")
+
+        self.file_name = original_name
+        self.codec = upload_codec(original_name)
+        self.storage_name = user_storage_path(File(owner=self.request.user), original_name)
+        self.volume = place_file(self.storage_name)
+        self._digest = hashlib.sha256()
+
+    def _open_target(self):
+        """Проверяет MIME по накопленному началу файла и открывает итоговый файл."""
+        self._sniffed = True
+        detected_mime = detect_mime(self._head, self.content_type)
+        if not is_mime_allowed(detected_mime):
+            self.reject("MIME type is not allowed", 400, "mime")
+        self.content_type = detected_mime
+
+        path = safe_path(self.storage_name, self.volume)
+        if path is None:
+            self.reject("Invalid file path", 400, "path")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._path = path
+        # Лимиты и хеш считаются по исходным байтам, на диск они идут сжатыми
+        self.file = open_writer(path, self.codec)
+        self._write(self._head)
+        self._head = b""
+
+    def _write(self, data):
+        self._size += len(data)
+        if self._size > self.max_size:
+            self.reject(f"File too large (>{self.max_size // (1024 * 1024)}MB)", 413, "size")
+        if self._over_quota(self._size):
+            self.reject(QUOTA_EXCEEDED_MESSAGE, 413, "quota")
+        self._digest.update(data)
+        self.file.write(data)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._sniffed:
+            self._write(raw_data)
+            return None
+        self._head += raw_data
+        if len(self._head) >= MIME_SNIFF_BYTES:
+            self._open_target()
+        return None
+
+    def file_complete(self, file_size):
+        if self.storage_name is None or self.uploaded is not None:
+            return None
+        if not self._sniffed:
+            self._open_target()
+        self.file.close()
+        self.uploaded = StoredUploadedFile(
+            storage_name=self.storage_name,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=self._size,
+            sha256=self._digest.hexdigest(),
+            codec=self.codec,
+            stored_size=os.path.getsize(self._path) if self.codec else self._size,
+            volume=self.volume,
+        )
+        return self.uploaded
+
+    def upload_interrupted(self):
+        self.discard()
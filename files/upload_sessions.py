@@ -0,0 +1,56 @@
+"""Сессии загрузки по частям: отмена и удаление заброшенных сессий.
+
+Место под файл сессии резервируется в квоте владельца при создании сессии
+(как будущий файл: ``bytes_used`` и ``file_count``); при завершении резерв
+переходит к созданному File, при отмене или истечении срока — освобождается.
+Сессия считается заброшенной, если за ``FILES_UPLOAD_SESSION_TTL`` секунд в
+неё не пришло ни одной части; такие сессии удаляет фоновый поток очистки
+корзины и команда ``purge_upload_sessions``.
+"""
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadSession
+from .quota import release_usage
+from .storage import safe_path
+
+logger = logging.getLogger(__name__)
+
+
+def remove_session(session):
+    """Удаляет сессию и её данные и освобождает зарезервированное место."""
+    with transaction.atomic():
+        # Сессию могли уже удалить параллельно: квота освобождается один раз
+        deleted, _ = UploadSession.objects.filter(id=session.id).delete()
+        if deleted:
+            release_usage(session.owner_id, session.size)
+    if not deleted:
+        return False
+    file_path = safe_path(session.storage_name, session.volume)
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
+    return True
+
+
+def expired_sessions():
+    """Сессии без новых частей дольше FILES_UPLOAD_SESSION_TTL."""
+    cutoff = timezone.now() - timedelta(seconds=settings.FILES_UPLOAD_SESSION_TTL)
+    return UploadSession.objects.filter(created_at__lt=cutoff).exclude(chunks__received_at__gte=cutoff)
+
+
+def purge_expired_sessions(limit=None):
+    """Удаляет заброшенные сессии (не больше limit). Возвращает их число."""
+    sessions = expired_sessions().order_by("created_at")
+    if limit:
+        sessions = sessions[:limit]
+    removed = 0
+    for session in list(sessions):
+        if remove_session(session):
+            removed += 1
+            logger.info("Removed expired upload session %s", session.id)
+    return removed
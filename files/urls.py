@@ -1,26 +1,56 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     FileListView,
+    FileChangesView,
     FileUploadView,
     FileDownloadView,
     FileDetailView,
     FileRenameView,
     FileCommentView,
     FileDeleteView,
+    FileBulkDeleteView,
+    FileRestoreView,
+    FileTrashView,
     FileSharedView,
     FileDownloadSharedView,
     FileContentView,
+    FileArchiveView,
+    FileThumbnailView,
+    StorageStatsView,
+    UploadSessionCreateView,
+    UploadSessionDetailView,
+    UploadChunkView,
+    UploadSessionCompleteView,
 )
 
+if settings.FILES_ASYNC_VIEWS:
+    from .async_views import (
+        AsyncFileContentView as FileContentView,
+        AsyncFileDownloadSharedView as FileDownloadSharedView,
+        AsyncFileDownloadView as FileDownloadView,
+    )
+
 urlpatterns = [
     path("", FileListView.as_view(), name="file_list"),
     path("upload/", FileUploadView.as_view(), name="file_upload"),
+    path("changes/", FileChangesView.as_view(), name="file_changes"),
+    path("archive/", FileArchiveView.as_view(), name="file_archive"),
+    path("bulk-delete/", FileBulkDeleteView.as_view(), name="file_bulk_delete"),
+    path("trash/", FileTrashView.as_view(), name="file_trash"),
+    path("stats/", StorageStatsView.as_view(), name="storage_stats"),
     path("<int:pk>/download/", FileDownloadView.as_view(), name="file_download"),
     path("<int:pk>", FileDetailView.as_view(), name="file_detail"),
+    path("<int:pk>/restore/", FileRestoreView.as_view(), name="file_restore"),
     path("<int:pk>/rename/", FileRenameView.as_view(), name="file_rename"),
     path("<int:pk>/comment/", FileCommentView.as_view(), name="file_comment"),
     path("<int:pk>/", FileDeleteView.as_view(), name="file_delete"),
     path("shared/<int:pk>/", FileSharedView.as_view(), name="file_shared"),
     path("shared/<str:token>/", FileDownloadSharedView.as_view(), name="file_shared_download"),
     path("<int:pk>/content/", FileContentView.as_view(), name="file_content"),
+    path("<int:pk>/thumbnail/", FileThumbnailView.as_view(), name="file_thumbnail"),
+    path("uploads/", UploadSessionCreateView.as_view(), name="upload_session_create"),
+    path("uploads/<uuid:session_id>/", UploadSessionDetailView.as_view(), name="upload_session_detail"),
+    path("uploads/<uuid:session_id>/chunks/<int:index>/", UploadChunkView.as_view(), name="upload_chunk"),
+    path("uploads/<uuid:session_id>/complete/", UploadSessionCompleteView.as_view(), name="upload_session_complete"),
 ]
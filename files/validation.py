@@ -0,0 +1,75 @@
+"""Проверки загружаемых файлов: имя, расширение, MIME."""
+import os
+
+try:
+    import magic  # type: ignore
+    _MAGIC_AVAILABLE = True
+except Exception:
+    magic = None  # type: ignore
+    _MAGIC_AVAILABLE = False
+
+ALLOWED_EXTENSIONS = {
+    "txt", "pdf", "png", "jpg", "jpeg", "gif",
+    "csv", "json",
+    "doc", "docx", "xls", "xlsx", "ppt", "pptx",
+    "zip", "7z", "tar", "gz",
+    "mp3", "wav", "mp4", "mov", "avi",
+}
+
+# Форматы, которые уже сжаты: повторно сжимать их бессмысленно
+COMPRESSED_EXTENSIONS = {
+    "zip", "7z", "gz",
+    "docx", "xlsx", "pptx",
+    "png", "jpg", "jpeg", "gif",
+    "mp3", "mp4", "mov", "avi",
+}
+
+ALLOWED_MIMES = {
+    # текст/документы
+    "text/plain", "application/pdf", "text/csv", "application/json",
+    "application/msword", "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.ms-powerpoint", "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    # изображения
+    "image/png", "image/jpeg", "image/gif",
+    # архивы
+    "application/zip", "application/x-7z-compressed", "application/x-tar", "application/gzip",
+    # медиа
+    "audio/mpeg", "audio/wav", "video/mp4", "video/quicktime", "video/x-msvideo",
+}
+
+DANGEROUS_EXTENSIONS = {
+    ".exe", ".dll", ".so", ".js", ".jsp", ".php", ".asp", ".aspx", ".cgi",
+    ".sh", ".bat", ".cmd", ".ps1", ".py", ".com", ".msi",
+}
+
+# Сколько первых байт нужно для определения MIME
+MIME_SNIFF_BYTES = 2048
+
+
+def clean_file_name(name):
+    """Возвращает безопасное имя файла или None, если имя недопустимо."""
+    original_name = os.path.basename(name or "")
+    if not original_name or ".." in original_name or "/" in original_name or "\\" in original_name:
+        return None
+    return original_name
+
+
+def is_extension_allowed(name):
+    _, ext = os.path.splitext(name.lower())
+    return ext not in DANGEROUS_EXTENSIONS and ext.lstrip(".") in ALLOWED_EXTENSIONS
+
+
+def detect_mime(head, fallback=None):
+    """Определяет MIME по первым байтам, при неудаче — по заявленному клиентом типу."""
+    detected_mime = None
+    if _MAGIC_AVAILABLE and head is not None:
+        try:
+            detected_mime = magic.from_buffer(head, mime=True)  # type: ignore
+        except Exception:
+            detected_mime = None
+    return detected_mime or fallback
+
+
+def is_mime_allowed(mime):
+    return bool(mime) and mime in ALLOWED_MIMES
@@ -1,11 +1,16 @@
 import os
 import uuid
 import logging
+import mimetypes
 from django.conf import settings
-from django.http import FileResponse
-from django.http import HttpResponse
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header, http_date
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
@@ -13,183 +18,467 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import File
+from accounts.models import User
+from monitoring import metrics
+
+from . import analytics
+from .archive import iter_zip
+from .background import submit_on_commit
+from .changes import (
+    acquire_waiter,
+    latest_change_id,
+    record_change,
+    record_changes,
+    release_waiter,
+    wait_for_changes,
+)
+from .listing import LISTING_FIELDS, ListingError, paginate, parse_filters
+from .models import ExtensionStat, File, FileChange, MonthlyStat, UploadChunk, UploadSession
+from .models import user_storage_path
+from .preview import TEXT_PREVIEW_TYPES, PreviewError, read_window
+from . import renditions
+from .responses import (
+    conditional_response,
+    content_etag,
+    content_last_modified,
+    file_response,
+    listing_etag,
+)
+from .sharing import (
+    ShareError,
+    count_download,
+    is_signed_token,
+    make_share_token,
+    mark_shared,
+    revoke_shares,
+    share_target,
+    shared_file_path,
+    verify_share_token,
+)
+from .quota import remaining_quota, reserve_usage
+from .stats import record_download
+from .trash import empty_trash, purge_at, restorable_trash
+from .storage import data_path, place_file, release_file_data, safe_path, store_file_data
+from .upload_sessions import remove_session
+from .upload_handlers import QUOTA_EXCEEDED_MESSAGE, StreamingUploadHandler, file_sha256
+from .validation import (
+    MIME_SNIFF_BYTES,
+    clean_file_name,
+    detect_mime,
+    is_extension_allowed,
+    is_mime_allowed,
+)
 
 logger = logging.getLogger(__name__)
 
-try:
-    import magic  # type: ignore
-    _MAGIC_AVAILABLE = True
-except Exception:
-    magic = None  # type: ignore
-    _MAGIC_AVAILABLE = False
-
-ALLOWED_EXTENSIONS = {
-    "txt", "pdf", "png", "jpg", "jpeg", "gif",
-    "csv", "json",
-    "doc", "docx", "xls", "xlsx", "ppt", "pptx",
-    "zip", "7z", "tar", "gz",
-    "mp3", "wav", "mp4", "mov", "avi",
-}
+# Буфер чтения/записи тела запроса при загрузке частей
+UPLOAD_COPY_BUFFER = 64 * 1024
+UPLOAD_MIN_CHUNK_SIZE = 256 * 1024
+UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def _schedule_renditions(file_obj):
+    """Построение миниатюр в фоне после фиксации транзакции (FILES_THUMBNAILS_EAGER)."""
+    if settings.FILES_THUMBNAILS_EAGER and renditions.supports_rendition(file_obj):
+        submit_on_commit(renditions.generate_thumbnails, file_obj.id)
 
-ALLOWED_MIMES = {
-    # текст/документы
-    "text/plain", "application/pdf", "text/csv", "application/json",
-    "application/msword", "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    "application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    "application/vnd.ms-powerpoint", "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-    # изображения
-    "image/png", "image/jpeg", "image/gif",
-    # архивы
-    "application/zip", "application/x-7z-compressed", "application/x-tar", "application/gzip",
-    # медиа
-    "audio/mpeg", "audio/wav", "video/mp4", "video/quicktime", "video/x-msvideo",
-}
+
+def receive_upload(request):
+    """Приём файла потоковым обработчиком: проверки и запись идут по мере поступления байт.
+
+    Возвращает пару (данные ответа, HTTP-статус).
+    """
+    handler = StreamingUploadHandler(request, quota_remaining=remaining_quota(request.user.id))
+    request.upload_handlers = [handler]
+    try:
+        uploaded_file = request.FILES.get("file")
+    except Exception:
+        handler.discard()
+        raise
+    if handler.error:
+        message, status_code = handler.error
+        metrics.UPLOAD_REJECTIONS.inc(reason=handler.reason)
+        return {"error": message}, status_code
+    if not uploaded_file:
+        return {"error": "No file uploaded"}, status.HTTP_400_BAD_REQUEST
+
+    comment = request.POST.get("comment", "")
+    file_obj = File(
+        owner=request.user,
+        original_name=uploaded_file.name,
+        name=uploaded_file.name,
+        comment=comment,
+        size=uploaded_file.size,
+        sha256=uploaded_file.sha256,
+        codec=uploaded_file.codec,
+        stored_size=uploaded_file.stored_size,
+        volume=uploaded_file.volume,
+    )
+    # Файл уже лежит на месте, повторное копирование через file.save не нужно
+    file_obj.file.name = uploaded_file.storage_name
+    with transaction.atomic():
+        # Квота проверяется ещё раз атомарно: параллельные загрузки могли её занять
+        if not reserve_usage(file_obj.owner_id, file_obj.size):
+            release_file_data(file_obj)
+            metrics.UPLOAD_REJECTIONS.inc(reason="quota")
+            return {"error": QUOTA_EXCEEDED_MESSAGE}, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        store_file_data(file_obj)
+        file_obj.save()
+        record_change(file_obj.owner_id, file_obj.id, FileChange.CREATED)
+        _schedule_renditions(file_obj)
+
+    metrics.UPLOADED_BYTES.inc(file_obj.size, kind="form")
+    return {
+        "id": file_obj.id,
+        "name": file_obj.name,
+        "comment": file_obj.comment,
+        "file": request.build_absolute_uri(file_obj.file.url),
+        "size": file_obj.size,
+    }, status.HTTP_201_CREATED
+
+
+def _handle_upload(request):
+    data, status_code = receive_upload(request)
+    return Response(data, status=status_code)
 
 
 class FileListView(APIView):
-    """Список файлов"""
+    """Список файлов: страница по курсору, сортировка sort=, фильтры ext/size/даты"""
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         storage_user_id = request.query_params.get("user_id")
         if storage_user_id and request.user.is_admin:
-            files = File.objects.filter(owner_id=storage_user_id)
+            owner_id = storage_user_id
         else:
-            files = File.objects.filter(owner=request.user)
-        data = [
-            {
-                "id": f.id,
-                "name": f.name,
-                "comment": f.comment,
-                "size": f.size,
-                "uploaded_at": f.uploaded_at,
-                "updated_at": f.updated_at,
-                "last_downloaded_at": f.last_downloaded_at,
-                "share_token": f.share_token,
-            }
-            for f in files
-        ]
+            owner_id = request.user.id
+        files = File.objects.alive().filter(owner_id=owner_id)
+
+        # Версия берётся из базы, а не из request.user, чтобы не зависеть от кеша пользователя.
+        # Статистика скачиваний версию не меняет, поэтому порядок по ней не кешируется
+        version = User.objects.filter(pk=owner_id).values_list("files_version", "files_changed_at").first()
+        etag = last_modified = None
+        if version is not None and "last_downloaded_at" not in request.query_params.get("sort", ""):
+            etag = listing_etag(owner_id, version[0], request.META.get("QUERY_STRING", ""))
+            last_modified = int(version[1].timestamp()) if version[1] else None
+            not_modified = conditional_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+        try:
+            data, next_cursor = paginate(files, request.query_params)
+        except ListingError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
         logger.info("%s requested file list", request.user.username)
-        return Response(data)
+        response = Response(data)
+        if next_cursor:
+            query = request.query_params.copy()
+            query["cursor"] = next_cursor
+            response["X-Next-Cursor"] = next_cursor
+            response["Link"] = f'<{request.build_absolute_uri(request.path)}?{query.urlencode()}>; rel="next"'
+        if etag:
+            response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
     def post(self, request):
         """Загрузка файла (REST: POST /files/)"""
-        uploaded_file = request.FILES.get("file")
-        if not uploaded_file:
-            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        return _handle_upload(request)
 
-        max_size_mb = 100
-        max_size_bytes = max_size_mb * 1024 * 1024
-        if hasattr(uploaded_file, "size") and uploaded_file.size > max_size_bytes:
-            return Response({"error": f"File too large (>{max_size_mb}MB)"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
 
-        original_name = os.path.basename(uploaded_file.name or "")
-        if not original_name or ".." in original_name or "/" in original_name or "\\" in original_name:
-            return Response({"error": "Invalid file name"}, status=status.HTTP_400_BAD_REQUEST)
+class FileUploadView(APIView):
+    """Загрузка файла"""
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        return _handle_upload(request)
+
+
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 5000
+# Через сколько секунд повторить long-poll, если все места ожидания заняты
+CHANGES_RETRY_AFTER = 5
 
-        name_lower = original_name.lower()
-        dangerous_ext = {".exe", ".dll", ".so", ".js", ".jsp", ".php", ".asp", ".aspx", ".cgi", ".sh", ".bat", ".cmd", ".ps1", ".py", ".com", ".msi"}
-        _, ext = os.path.splitext(name_lower)
-        ext_no_dot = ext.lstrip(".")
-        if ext in dangerous_ext or ext_no_dot not in ALLOWED_EXTENSIONS:
-            return Response({"error": "This file type is not allowed"}, status=status.HTTP_400_BAD_REQUEST)
 
-        detected_mime = None
+class FileChangesView(APIView):
+    """Изменения файлов после курсора для клиентов синхронизации.
+
+    ?cursor= — номер последнего полученного изменения (без него возвращается
+    только текущий курсор), limit, wait — сколько секунд ждать изменений
+    (long-poll), если их пока нет. Ожидание занимает поток воркера, поэтому
+    в процессе одновременно ждут не более FILES_CHANGES_MAX_WAITERS запросов.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        owner_id = request.user.id
+        cursor = request.query_params.get("cursor")
+        if cursor in (None, ""):
+            return Response({"changes": [], "cursor": latest_change_id(owner_id), "has_more": False})
         try:
-            head = uploaded_file.read(2048)
+            cursor = int(cursor)
+            limit = int(request.query_params.get("limit") or CHANGES_PAGE_SIZE)
+            wait = float(request.query_params.get("wait") or 0)
+        except ValueError:
+            return Response({"error": "Invalid cursor, limit or wait"}, status=status.HTTP_400_BAD_REQUEST)
+        if cursor < 0 or limit <= 0 or wait < 0:
+            return Response({"error": "Invalid cursor, limit or wait"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, CHANGES_MAX_PAGE_SIZE)
+        wait = min(wait, settings.FILES_CHANGES_MAX_WAIT)
+
+        if wait:
+            if not acquire_waiter(settings.FILES_CHANGES_MAX_WAITERS):
+                response = Response(
+                    {"error": "Too many waiting requests"}, status=status.HTTP_429_TOO_MANY_REQUESTS,
+                )
+                response["Retry-After"] = str(CHANGES_RETRY_AFTER)
+                return response
             try:
-                uploaded_file.seek(0)
-            except Exception:
-                pass
-            if _MAGIC_AVAILABLE and head is not None:
-                try:
-                    detected_mime = magic.from_buffer(head, mime=True)  # type: ignore
-                except Exception:
-                    detected_mime = None
-        except Exception:
-            detected_mime = None
-
-        if not detected_mime:
-            detected_mime = getattr(uploaded_file, "content_type", None)
-        if not detected_mime or detected_mime not in ALLOWED_MIMES:
-            return Response({"error": "MIME type is not allowed"}, status=status.HTTP_400_BAD_REQUEST)
+                changed = wait_for_changes(owner_id, cursor, wait, settings.FILES_CHANGES_POLL_INTERVAL)
+            finally:
+                release_waiter()
+            if not changed:
+                return Response({"changes": [], "cursor": cursor, "has_more": False})
+
+        rows = list(
+            FileChange.objects.filter(owner_id=owner_id, id__gt=cursor)
+            .order_by("id")
+            .values("id", "file_id", "action", "changed_at")[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        # Текущее состояние затронутых файлов — одним запросом
+        files = {
+            row["id"]: row
+            for row in File.objects.alive().filter(
+                owner_id=owner_id, id__in={row["file_id"] for row in rows}
+            ).values(*LISTING_FIELDS)
+        }
+        changes = [
+            {
+                "seq": row["id"],
+                "action": row["action"],
+                "file_id": row["file_id"],
+                "changed_at": row["changed_at"],
+                # Файла может уже не быть: его удаление придёт в этой же или следующей порции
+                "file": files.get(row["file_id"]) if row["action"] != FileChange.DELETED else None,
+            }
+            for row in rows
+        ]
+        return Response({
+            "changes": changes,
+            "cursor": rows[-1]["id"] if rows else cursor,
+            "has_more": has_more,
+        })
+
+
+def _received_ranges(session, indices):
+    """Склеивает номера принятых частей в диапазоны байт [start, end] включительно."""
+    ranges = []
+    for index in indices:
+        offset, length = session.chunk_bounds(index)
+        if ranges and ranges[-1][1] + 1 == offset:
+            ranges[-1][1] = offset + length - 1
+        else:
+            ranges.append([offset, offset + length - 1])
+    return ranges
 
-        comment = request.data.get("comment", "")
-        file_obj = File(owner=request.user, original_name=original_name, name=original_name, comment=comment)
-        file_obj.file.save(original_name, uploaded_file, save=False)
-        file_obj.size = getattr(uploaded_file, "size", 0)
-        file_obj.save()
 
-        return Response(
-            {
-                "id": file_obj.id,
-                "name": file_obj.name,
-                "comment": file_obj.comment,
-                "file": request.build_absolute_uri(file_obj.file.url),
-                "size": file_obj.size,
-            },
-            status=status.HTTP_201_CREATED,
-        )
+def _session_data(session):
+    indices = sorted(session.chunks.values_list("index", flat=True))
+    received = set(indices)
+    return {
+        "id": session.id,
+        "name": session.original_name,
+        "size": session.size,
+        "chunk_size": session.chunk_size,
+        "total_chunks": session.total_chunks,
+        "received": _received_ranges(session, indices),
+        "missing_chunks": [i for i in range(session.total_chunks) if i not in received],
+    }
 
 
-class FileUploadView(APIView):
-    """Загрузка файла"""
+class UploadSessionCreateView(APIView):
+    """Создание сессии загрузки файла по частям."""
 
     permission_classes = [IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request):
-        uploaded_file = request.FILES.get("file")
-        if not uploaded_file:
-            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
-
-        max_size_mb = 100
-        max_size_bytes = max_size_mb * 1024 * 1024
-        if hasattr(uploaded_file, "size") and uploaded_file.size > max_size_bytes:
-            return Response({"error": f"File too large (>{max_size_mb}MB)"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
-
-        original_name = os.path.basename(uploaded_file.name or "")
-        if not original_name or ".." in original_name or "/" in original_name or "\\" in original_name:
+        original_name = clean_file_name(request.data.get("name"))
+        if not original_name:
+            metrics.UPLOAD_REJECTIONS.inc(reason="name")
             return Response({"error": "Invalid file name"}, status=status.HTTP_400_BAD_REQUEST)
 
-        name_lower = original_name.lower()
-        dangerous_ext = {".exe", ".dll", ".so", ".js", ".jsp", ".php", ".asp", ".aspx", ".cgi", ".sh", ".bat", ".cmd", ".ps1", ".py", ".com", ".msi"}
-        _, ext = os.path.splitext(name_lower)
-        ext_no_dot = ext.lstrip(".")
-        if ext in dangerous_ext or ext_no_dot not in ALLOWED_EXTENSIONS:
+        if not is_extension_allowed(original_name):
+            metrics.UPLOAD_REJECTIONS.inc(reason="extension")
             return Response({"error": "This file type is not allowed"}, status=status.HTTP_400_BAD_REQUEST)
 
-        detected_mime = None
         try:
+            size = int(request.data.get("size"))
+            chunk_size = int(request.data.get("chunk_size") or settings.FILES_UPLOAD_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid file size"}, status=status.HTTP_400_BAD_REQUEST)
+        if size <= 0:
+            return Response({"error": "Invalid file size"}, status=status.HTTP_400_BAD_REQUEST)
+        if size > settings.FILES_UPLOAD_SESSION_MAX_SIZE:
+            metrics.UPLOAD_REJECTIONS.inc(reason="size")
+            return Response({"error": "File too large"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        chunk_size = max(UPLOAD_MIN_CHUNK_SIZE, min(chunk_size, UPLOAD_MAX_CHUNK_SIZE))
+
+        session = UploadSession(
+            owner=request.user,
+            original_name=original_name,
+            comment=request.data.get("comment", ""),
+            size=size,
+            chunk_size=chunk_size,
+        )
+        session.storage_name = user_storage_path(session, original_name)
+        session.volume = place_file(session.storage_name)
+        file_path = safe_path(session.storage_name, session.volume)
+        if file_path is None:
+            return Response({"error": "Invalid file path"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Место резервируется сразу; UPDATE блокирует строку пользователя,
+            # поэтому параллельные создания сессий считаются по очереди
+            if not reserve_usage(request.user.id, size):
+                metrics.UPLOAD_REJECTIONS.inc(reason="quota")
+                return Response({"error": QUOTA_EXCEEDED_MESSAGE}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            if UploadSession.objects.filter(owner=request.user).count() >= settings.FILES_UPLOAD_MAX_SESSIONS:
+                transaction.set_rollback(True)
+                return Response(
+                    {"error": "Too many open upload sessions"}, status=status.HTTP_429_TOO_MANY_REQUESTS,
+                )
+            session.save()
+            # Части пишутся в файл по смещениям; место на диске занимают только принятые
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            open(file_path, "wb").close()
+
+        logger.info("%s started upload session %s for %s", request.user.username, session.id, original_name)
+        return Response(_session_data(session), status=status.HTTP_201_CREATED)
+
+
+class UploadSessionDetailView(APIView):
+    """Состояние сессии загрузки (GET) и её отмена (DELETE)."""
 
-            head = uploaded_file.read(2048)
-            try:
-                uploaded_file.seek(0)
-            except Exception:
-                pass
-            if _MAGIC_AVAILABLE and head is not None:
-                try:
-                    detected_mime = magic.from_buffer(head, mime=True)  # type: ignore
-                except Exception:
-                    detected_mime = None
-        except Exception:
-            detected_mime = None
-
-        if not detected_mime:
-            detected_mime = getattr(uploaded_file, "content_type", None)
-
-        if not detected_mime or detected_mime not in ALLOWED_MIMES:
-            return Response({"error": "MIME type is not allowed"}, status=status.HTTP_400_BAD_REQUEST)
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request, session_id):
+        session = get_object_or_404(UploadSession, id=session_id, owner=request.user)
+        return Response(_session_data(session))
+
+    def delete(self, request, session_id):
+        session = get_object_or_404(UploadSession, id=session_id, owner=request.user)
+        remove_session(session)
+        logger.info("%s aborted upload session %s", request.user.username, session_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadChunkView(APIView):
+    """Приём одной части файла: PUT с телом части без multipart."""
+
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, session_id, index):
+        session = get_object_or_404(UploadSession, id=session_id, owner=request.user)
+        if index >= session.total_chunks:
+            return Response({"error": "Invalid chunk index"}, status=status.HTTP_400_BAD_REQUEST)
+
+        offset, length = session.chunk_bounds(index)
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+        if content_length != length:
+            return Response({"error": f"Chunk {index} must be {length} bytes"}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_path = safe_path(session.storage_name, session.volume)
+        if file_path is None:
+            return Response({"error": "Invalid file path"}, status=status.HTTP_400_BAD_REQUEST)
+        if not os.path.exists(file_path):
+            return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Тело читается потоком и пишется прямо в итоговый файл
+        written = 0
+        stream = request.stream
+        with open(file_path, "r+b") as f:
+            f.seek(offset)
+            while written < length:
+                block = stream.read(min(UPLOAD_COPY_BUFFER, length - written))
+                if not block:
+                    break
+                f.write(block)
+                written += len(block)
+        metrics.UPLOADED_BYTES.inc(written, kind="chunk")
+        if written != length:
+            return Response({"error": "Incomplete chunk"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            UploadChunk.objects.update_or_create(session=session, index=index, defaults={"size": length})
+        except IntegrityError:
+            # Та же часть параллельно принята другим запросом
+            pass
+        return Response({"index": index, "offset": offset, "size": length})
 
-        comment = request.data.get("comment", "")
-        file_obj = File(owner=request.user, original_name=original_name, name=original_name, comment=comment)
-        file_obj.file.save(original_name, uploaded_file, save=False)
-        file_obj.size = getattr(uploaded_file, "size", 0)
-        file_obj.save()
 
+class UploadSessionCompleteView(APIView):
+    """Завершение сессии: проверка частей и MIME, создание File."""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, session_id):
+        session = get_object_or_404(UploadSession, id=session_id, owner=request.user)
+        data = _session_data(session)
+        if data["missing_chunks"]:
+            return Response(
+                {"error": "Upload is incomplete", "missing_chunks": data["missing_chunks"]},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        file_path = safe_path(session.storage_name, session.volume)
+        if file_path is None:
+            return Response({"error": "Invalid file path"}, status=status.HTTP_400_BAD_REQUEST)
+        if not os.path.exists(file_path):
+            return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        with open(file_path, "rb") as f:
+            head = f.read(MIME_SNIFF_BYTES)
+        detected_mime = detect_mime(head, mimetypes.guess_type(session.original_name)[0])
+        if not is_mime_allowed(detected_mime):
+            remove_session(session)
+            metrics.UPLOAD_REJECTIONS.inc(reason="mime")
+            return Response({"error": "MIME type is not allowed"}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_obj = File(
+            owner=request.user,
+            original_name=session.original_name,
+            name=session.original_name,
+            comment=session.comment,
+            size=session.size,
+            volume=session.volume,
+        )
+        # Файл сессии хранится без сжатия: части пишутся по смещениям, а сжатие
+        # собранного многогигабайтного файла заняло бы воркер на всё время работы
+        file_obj.sha256, file_obj.stored_size = file_sha256(file_path), session.size
+        file_obj.file.name = session.storage_name
+        with transaction.atomic():
+            if not UploadSession.objects.filter(id=session.id).delete()[0]:
+                # Сессию параллельно завершили или отменили
+                return Response({"error": "Upload session not found"}, status=status.HTTP_404_NOT_FOUND)
+            # Место в квоте зарезервировано при создании сессии и переходит к файлу
+            store_file_data(file_obj)
+            file_obj.save()
+            record_change(file_obj.owner_id, file_obj.id, FileChange.CREATED)
+            _schedule_renditions(file_obj)
+
+        logger.info("%s completed upload session %s", request.user.username, session_id)
         return Response(
             {
                 "id": file_obj.id,
@@ -202,40 +491,115 @@ class FileUploadView(APIView):
         )
 
 
+def _is_new_download(request):
+    """Докачка и перемотка (Range не с нулевого байта) не считаются новым скачиванием."""
+    range_header = request.META.get("HTTP_RANGE", "")
+    return not range_header or range_header.replace(" ", "").startswith("bytes=0-")
+
+
 class FileDownloadView(APIView):
     """Скачивание файла"""
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
-        file_obj = get_object_or_404(File, id=pk)
+        file_obj = get_object_or_404(File.objects.alive(), id=pk)
         if file_obj.owner != request.user and not request.user.is_admin:
             return Response({"error": "Permission denied"}, status=403)
 
-        file_obj.last_downloaded_at = timezone.now()
-        file_obj.save(update_fields=["last_downloaded_at"])
+        etag = content_etag(file_obj)
+        last_modified = content_last_modified(file_obj)
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
 
         # Безопасный путь через FileField
-        file_path = file_obj.file.path
-        real_media = os.path.realpath(settings.MEDIA_ROOT)
-        real_path = os.path.realpath(file_path)
-        if not real_path.startswith(real_media + os.sep):
+        file_path = data_path(file_obj)
+        if file_path is None:
             return Response({"error": "Invalid file path"}, status=400)
         if not os.path.exists(file_path):
             return Response({"error": "File not found"}, status=404)
 
-        response = FileResponse(open(file_path, "rb"), as_attachment=True, filename=file_obj.original_name)
+        response = file_response(
+            request, file_path, file_obj.original_name, etag=etag, last_modified=last_modified,
+            codec=file_obj.codec, size=file_obj.size,
+        )
+        if _is_new_download(request):
+            record_download(file_obj)
         logger.info("%s downloaded file %s", request.user.username, file_obj.name)
         return response
 
 
+class FileArchiveView(APIView):
+    """Скачивание нескольких файлов одним ZIP-архивом, собираемым на лету.
+
+    GET ?ids=1,2,3 или POST {"ids": [...]}; {"all": true} — все свои файлы
+    (администратор может добавить "user_id"). Не больше FILES_ARCHIVE_MAX_FILES
+    файлов за запрос.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return self._archive(request, request.query_params)
+
+    def post(self, request):
+        return self._archive(request, request.data)
+
+    def _too_many(self, max_files):
+        return Response(
+            {"error": f"Too many files, at most {max_files} per archive"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def _archive(self, request, params):
+        max_files = settings.FILES_ARCHIVE_MAX_FILES
+        if str(params.get("all", "")).lower() in ("1", "true"):
+            owner_id = request.user.id
+            if params.get("user_id") and request.user.is_admin:
+                owner_id = params.get("user_id")
+            files = File.objects.alive().filter(owner_id=owner_id).order_by("id")
+            if files[max_files:max_files + 1].exists():
+                return self._too_many(max_files)
+        else:
+            ids = params.get("ids")
+            if isinstance(ids, str):
+                ids = ids.split(",")
+            try:
+                ids = {int(i) for i in ids or []}
+            except (TypeError, ValueError):
+                return Response({"error": "Invalid file ids"}, status=status.HTTP_400_BAD_REQUEST)
+            if not ids:
+                return Response({"error": "No files selected"}, status=status.HTTP_400_BAD_REQUEST)
+            if len(ids) > max_files:
+                return self._too_many(max_files)
+
+            # Права проверяются одним запросом для всего набора
+            owners = dict(File.objects.alive().filter(id__in=ids).values_list("id", "owner_id"))
+            missing = sorted(ids - owners.keys())
+            if missing:
+                return Response({"error": "File not found", "missing": missing}, status=404)
+            if not request.user.is_admin and any(owner != request.user.id for owner in owners.values()):
+                return Response({"error": "Permission denied"}, status=403)
+            files = File.objects.alive().filter(id__in=ids).order_by("id")
+
+        filename = f"files-{timezone.now():%Y%m%d-%H%M%S}.zip"
+        response = StreamingHttpResponse(
+            iter_zip(files.iterator(chunk_size=500), on_file=record_download),
+            content_type="application/zip",
+        )
+        response["Content-Disposition"] = content_disposition_header(True, filename)
+        logger.info("%s downloaded archive of files", request.user.username)
+        return response
+
+
 class FileRenameView(APIView):
     """Переименование файла"""
 
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        file_obj = get_object_or_404(File, id=pk)
+        file_obj = get_object_or_404(File.objects.alive(), id=pk)
         if file_obj.owner != request.user and not request.user.is_admin:
             return Response({"error": "Permission denied"}, status=403)
 
@@ -244,7 +608,9 @@ class FileRenameView(APIView):
             return Response({"error": "No new name provided"}, status=400)
 
         file_obj.name = new_name
-        file_obj.save(update_fields=["name"])
+        with transaction.atomic():
+            file_obj.save(update_fields=["name"])
+            record_change(file_obj.owner_id, file_obj.id, FileChange.UPDATED)
         logger.info("%s renamed file %s to %s", request.user.username, file_obj.id, new_name)
         return Response({"id": file_obj.id, "name": file_obj.name})
 
@@ -255,44 +621,188 @@ class FileCommentView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        file_obj = get_object_or_404(File, id=pk)
+        file_obj = get_object_or_404(File.objects.alive(), id=pk)
         if file_obj.owner != request.user and not request.user.is_admin:
             return Response({"error": "Permission denied"}, status=403)
 
         comment = request.data.get("comment", "")
         file_obj.comment = comment
-        file_obj.save(update_fields=["comment"])
+        with transaction.atomic():
+            file_obj.save(update_fields=["comment"])
+            record_change(file_obj.owner_id, file_obj.id, FileChange.UPDATED)
         logger.info("%s updated comment for file %s", request.user.username, file_obj.id)
         return Response({"id": file_obj.id, "comment": file_obj.comment})
 
 
 class FileDeleteView(APIView):
-    """Удаление файла."""
+    """Удаление файла в корзину: данные освобождаются при очистке корзины."""
 
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, pk):
-        file_obj = get_object_or_404(File, id=pk)
+        file_obj = get_object_or_404(File.objects.alive(), id=pk)
         if file_obj.owner != request.user and not request.user.is_admin:
             return Response({"error": "Permission denied"}, status=403)
 
-        file_path = file_obj.file.path
-        real_media = os.path.realpath(settings.MEDIA_ROOT)
-        real_path = os.path.realpath(file_path)
-        if real_path.startswith(real_media + os.sep) and os.path.exists(file_path):
-            os.remove(file_path)
-        file_obj.delete()
-        logger.info("%s deleted file %s", request.user.username, pk)
+        with transaction.atomic():
+            # update, а не save(): только отметка, без обращения к диску
+            File.objects.alive().filter(pk=pk).update(deleted_at=timezone.now())
+            revoke_shares(pk)
+            record_change(file_obj.owner_id, pk, FileChange.DELETED)
+        logger.info("%s moved file %s to trash", request.user.username, pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+BULK_DELETE_MAX_FILES = 10000
+
+
+class FileBulkDeleteView(APIView):
+    """Удаление многих файлов одним запросом.
+
+    POST {"ids": [...]} или {"filter": {ext, min_size, max_size, uploaded_after,
+    uploaded_before}} — по фильтру удаляются свои файлы (администратор может
+    добавить "user_id"). Файлы переносятся в корзину одной транзакцией.
+    В ответе — результат по каждому id.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        results = {}
+        if "filter" in request.data:
+            conditions = request.data.get("filter") or {}
+            if not isinstance(conditions, dict):
+                return Response({"error": "Invalid filter"}, status=status.HTTP_400_BAD_REQUEST)
+            owner_id = request.user.id
+            if request.data.get("user_id") and request.user.is_admin:
+                owner_id = request.data.get("user_id")
+            try:
+                files = File.objects.alive().filter(parse_filters(conditions), owner_id=owner_id)
+            except ListingError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            ids = request.data.get("ids")
+            if isinstance(ids, str):
+                ids = ids.split(",")
+            try:
+                ids = {int(i) for i in ids or []}
+            except (TypeError, ValueError):
+                return Response({"error": "Invalid file ids"}, status=status.HTTP_400_BAD_REQUEST)
+            if not ids:
+                return Response({"error": "No files selected"}, status=status.HTTP_400_BAD_REQUEST)
+            results = {file_id: "not_found" for file_id in ids}
+            files = File.objects.alive().filter(id__in=ids)
+
+        with transaction.atomic():
+            # Права проверяются одним запросом для всего набора; строки блокируются,
+            # чтобы параллельное удаление не записало те же изменения дважды
+            rows = list(
+                files.select_for_update().order_by("id")
+                .values("id", "owner_id")[:BULK_DELETE_MAX_FILES + 1]
+            )
+            if len(rows) > BULK_DELETE_MAX_FILES:
+                return Response(
+                    {"error": f"Too many files, at most {BULK_DELETE_MAX_FILES} per request"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            by_owner = {}
+            for row in rows:
+                if row["owner_id"] == request.user.id or request.user.is_admin:
+                    by_owner.setdefault(row["owner_id"], []).append(row["id"])
+                else:
+                    results[row["id"]] = "permission_denied"
+            allowed_ids = [file_id for owner_ids in by_owner.values() for file_id in owner_ids]
+
+            File.objects.filter(id__in=allowed_ids).update(deleted_at=timezone.now())
+            for owner_id, owner_ids in by_owner.items():
+                record_changes(owner_id, owner_ids, FileChange.DELETED)
+            revoke_shares(*allowed_ids)
+
+        for file_id in allowed_ids:
+            results[file_id] = "deleted"
+        logger.info("%s moved %d files to trash", request.user.username, len(allowed_ids))
+        return Response({
+            "deleted": len(allowed_ids),
+            "results": [{"id": file_id, "status": results[file_id]} for file_id in sorted(results)],
+        })
+
+
+class FileRestoreView(APIView):
+    """Восстановление файла из корзины."""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        file_obj = get_object_or_404(restorable_trash(), id=pk)
+        if file_obj.owner != request.user and not request.user.is_admin:
+            return Response({"error": "Permission denied"}, status=403)
+
+        with transaction.atomic():
+            restored = restorable_trash().filter(pk=pk).update(deleted_at=None)
+            if not restored:
+                # Файл успели восстановить или окончательно удалить параллельно
+                return Response({"error": "File not found"}, status=404)
+            # Для клиентов синхронизации файл появляется заново
+            record_change(file_obj.owner_id, pk, FileChange.CREATED)
+        logger.info("%s restored file %s from trash", request.user.username, pk)
+        return Response({"id": file_obj.id, "name": file_obj.name})
+
+
+TRASH_PAGE_SIZE = 100
+TRASH_MAX_PAGE_SIZE = 1000
+
+
+class FileTrashView(APIView):
+    """Корзина пользователя.
+
+    GET — удалённые файлы с датой окончательного удаления (limit, offset;
+    администратор может указать ?user_id=), DELETE — очистить корзину, не
+    дожидаясь срока хранения: файлы сразу пропадают из неё и освобождают
+    квоту, а данные удаляет фоновая очистка.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def _owner_id(self, request):
+        storage_user_id = request.query_params.get("user_id")
+        if storage_user_id and request.user.is_admin:
+            return storage_user_id
+        return request.user.id
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit") or TRASH_PAGE_SIZE)
+            offset = int(request.query_params.get("offset") or 0)
+        except ValueError:
+            return Response({"error": "Invalid limit or offset"}, status=400)
+        if limit <= 0 or offset < 0:
+            return Response({"error": "Invalid limit or offset"}, status=400)
+        limit = min(limit, TRASH_MAX_PAGE_SIZE)
+
+        rows = list(
+            restorable_trash().filter(owner_id=self._owner_id(request))
+            .order_by("-deleted_at", "-id")
+            .values(*LISTING_FIELDS, "deleted_at")[offset:offset + limit]
+        )
+        for row in rows:
+            row["purge_at"] = purge_at(row["deleted_at"])
+        return Response({"files": rows, "limit": limit, "offset": offset})
+
+    def delete(self, request):
+        # Файлы отмечаются истёкшими, квота освобождается сразу; данные удалит
+        # обычная очистка корзины — пачками с паузами, а не все сразу
+        emptied = empty_trash(self._owner_id(request))
+        logger.info("%s emptied trash (%d files)", request.user.username, emptied)
+        return Response({"purged": emptied}, status=status.HTTP_202_ACCEPTED)
+
+
 class FileDetailView(APIView):
     """REST детали файла: PATCH (name/comment), DELETE."""
 
     permission_classes = [IsAuthenticated]
 
     def patch(self, request, pk):
-        file_obj = get_object_or_404(File, id=pk)
+        file_obj = get_object_or_404(File.objects.alive(), id=pk)
         if file_obj.owner != request.user and not request.user.is_admin:
             return Response({"error": "Permission denied"}, status=403)
         name = request.data.get("name")
@@ -306,78 +816,316 @@ class FileDetailView(APIView):
             updated.append("comment")
         if not updated:
             return Response({"error": "No fields to update"}, status=400)
-        file_obj.save(update_fields=updated)
+        with transaction.atomic():
+            file_obj.save(update_fields=updated)
+            record_change(file_obj.owner_id, file_obj.id, FileChange.UPDATED)
         return Response({"id": file_obj.id, "name": file_obj.name, "comment": file_obj.comment}, status=200)
 
     def delete(self, request, pk):
         return FileDeleteView().delete(request, pk)
 
 
+def _positive_int(value, name):
+    """Необязательный положительный целый параметр запроса."""
+    if value in (None, ""):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}") from None
+    if number <= 0:
+        raise ValueError(f"Invalid {name}")
+    return number
+
+
 class FileSharedView(APIView):
-    """Создание публичной ссылки для файла."""
+    """Создание (POST) и отзыв (DELETE) публичных ссылок на файл.
+
+    POST принимает необязательные expires_in (секунды) и max_downloads.
+    """
 
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        file_obj = get_object_or_404(File, id=pk)
+        file_obj = get_object_or_404(File.objects.alive(), id=pk)
         if file_obj.owner != request.user and not request.user.is_admin:
             return Response({"error": "Permission denied"}, status=403)
 
-        if not file_obj.share_token:
-            file_obj.share_token = uuid.uuid4().hex
-            file_obj.save(update_fields=["share_token"])
-
-        share_url = request.build_absolute_uri(f"/api/files/shared/{file_obj.share_token}/")
+        try:
+            expires_in = _positive_int(request.data.get("expires_in"), "expires_in")
+            max_downloads = _positive_int(request.data.get("max_downloads"), "max_downloads")
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        if expires_in is None and settings.FILES_SHARE_DEFAULT_TTL > 0:
+            expires_in = settings.FILES_SHARE_DEFAULT_TTL
+
+        with transaction.atomic():
+            mark_shared(file_obj)
+            record_change(file_obj.owner_id, file_obj.id, FileChange.UPDATED)
+        token, expires_at = make_share_token(file_obj, expires_in, max_downloads)
+        share_url = request.build_absolute_uri(f"/api/files/shared/{token}/")
         logger.info("%s created share link for file %s", request.user.username, pk)
-        return Response({"file_id": file_obj.id, "share_url": share_url})
+        return Response({
+            "file_id": file_obj.id,
+            "share_url": share_url,
+            "expires_at": http_date(expires_at),
+            "max_downloads": max_downloads,
+        })
+
+    def delete(self, request, pk):
+        file_obj = get_object_or_404(File.objects.alive(), id=pk)
+        if file_obj.owner != request.user and not request.user.is_admin:
+            return Response({"error": "Permission denied"}, status=403)
+
+        with transaction.atomic():
+            revoke_shares(file_obj.id)
+            # Старая ссылка по share_token тоже перестаёт работать
+            file_obj.share_token = uuid.uuid4()
+            file_obj.save(update_fields=["share_token"])
+            record_change(file_obj.owner_id, file_obj.id, FileChange.UPDATED)
+        logger.info("%s revoked share links for file %s", request.user.username, pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class FileDownloadSharedView(APIView):
-    """Скачивание файла по публичной ссылке."""
+    """Скачивание файла по публичной ссылке.
+
+    Подписанная ссылка проверяется без запросов к базе; ссылки старого
+    формата (share_token) ищутся в базе.
+    """
 
     def get(self, request, token):
-        file_obj = get_object_or_404(File, share_token=token)
-        file_path = file_obj.file.path
-        real_media = os.path.realpath(settings.MEDIA_ROOT)
-        real_path = os.path.realpath(file_path)
-        if not real_path.startswith(real_media + os.sep):
+        if not is_signed_token(token):
+            return self._get_legacy(request, token)
+
+        try:
+            payload = verify_share_token(token)
+        except ShareError as exc:
+            return Response({"error": str(exc)}, status=exc.status)
+        target = share_target(payload["f"])
+        if target is None:
+            return Response({"error": "File not found"}, status=404)
+        not_modified = conditional_response(request, target["etag"], target["last_modified"])
+        if not_modified is not None:
+            return not_modified
+
+        target, file_path = shared_file_path(target)
+        if file_path is None:
+            return Response({"error": "File not found"}, status=404)
+
+        if _is_new_download(request):
+            if not count_download(payload):
+                return Response({"error": "Download limit reached"}, status=410)
+            record_download(File(id=target["id"], owner_id=target["owner_id"]))
+        response = file_response(
+            request, file_path, target["name"], etag=target["etag"], last_modified=target["last_modified"],
+            codec=target["codec"], size=target["size"],
+        )
+        logger.info("Shared file downloaded: %s", payload["f"])
+        return response
+
+    def _get_legacy(self, request, token):
+        try:
+            file_obj = File.objects.alive().get(share_token=token)
+        except (File.DoesNotExist, ValidationError):
+            return Response({"error": "Share link not found"}, status=404)
+        etag = content_etag(file_obj)
+        last_modified = content_last_modified(file_obj)
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        file_path = data_path(file_obj)
+        if file_path is None:
             return Response({"error": "Invalid file path"}, status=400)
         if not os.path.exists(file_path):
             return Response({"error": "File not found"}, status=404)
 
-        response = FileResponse(open(file_path, "rb"), as_attachment=True, filename=file_obj.original_name)
+        response = file_response(
+            request, file_path, file_obj.original_name, etag=etag, last_modified=last_modified,
+            codec=file_obj.codec, size=file_obj.size,
+        )
+        if _is_new_download(request):
+            record_download(file_obj)
         logger.info("Shared file downloaded: %s", file_obj.id)
         return response
-    
+
+
+PREVIEW_CONTENT_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".pdf": "application/pdf",
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".mp4": "video/mp4",
+    ".mov": "video/quicktime",
+    ".avi": "video/x-msvideo",
+}
+
+
+def content_response(request, file_obj, params, async_stream=False):
+    """Ответ предпросмотра файла (общий для синхронного и асинхронного представлений)."""
+    etag = content_etag(file_obj)
+    last_modified = content_last_modified(file_obj)
+    not_modified = conditional_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    file_path = data_path(file_obj)
+    if file_path is None:
+        return HttpResponse("Invalid file path", status=400)
+    if not os.path.exists(file_path):
+        return HttpResponse("File not found", status=404)
+
+    _, ext = os.path.splitext(file_obj.name.lower())
+
+    if ext in TEXT_PREVIEW_TYPES:
+        # Текст отдаётся окном ограниченного размера, а не целиком
+        try:
+            data, start, end, size = read_window(file_path, params, codec=file_obj.codec, size=file_obj.size)
+        except PreviewError as exc:
+            return HttpResponse(str(exc), status=400)
+        content = data.decode("utf-8", errors="ignore")
+        response = HttpResponse(content, content_type=f"{TEXT_PREVIEW_TYPES[ext]}; charset=utf-8")
+        response["X-Preview-Start"] = str(start)
+        response["X-Preview-End"] = str(end)
+        response["X-Preview-Size"] = str(size)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    content_type = PREVIEW_CONTENT_TYPES.get(ext, "application/octet-stream")
+    return file_response(
+        request, file_path, file_obj.name,
+        content_type=content_type, as_attachment=False, etag=etag, last_modified=last_modified,
+        codec=file_obj.codec, size=file_obj.size, async_stream=async_stream,
+    )
+
 
 class FileContentView(APIView):
-    """Возвращает содержимое файла для предпросмотра."""
+    """Возвращает содержимое файла для предпросмотра.
+
+    Для txt/csv/json — окно текста: ?mode=head|tail, offset, line, limit.
+    """
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
-        file_obj = get_object_or_404(File, id=pk)
+        file_obj = get_object_or_404(File.objects.alive(), id=pk)
 
         if file_obj.owner != request.user and not getattr(request.user, "is_admin", False):
             return HttpResponse("Permission denied", status=403)
 
-        if not os.path.exists(file_obj.file.path):
-            return HttpResponse("File not found", status=404)
+        return content_response(request, file_obj, request.query_params)
 
-        _, ext = os.path.splitext(file_obj.name.lower())
 
-        if ext == ".txt":
-            with open(file_obj.file.path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read()
-            return HttpResponse(content, content_type="text/plain; charset=utf-8")
+class FileThumbnailView(APIView):
+    """Миниатюра изображения для галереи: ?size=128|256|512."""
 
-        mime_map = {
-            ".png": "image/png",
-            ".jpg": "image/jpeg",
-            ".jpeg": "image/jpeg",
-            ".gif": "image/gif",
-            ".pdf": "application/pdf",
-        }
-        content_type = mime_map.get(ext, "application/octet-stream")
-        return FileResponse(file_obj.file, content_type=content_type, filename=file_obj.name)
-    
\ No newline at end of file
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        file_obj = get_object_or_404(File.objects.alive(), id=pk)
+        if file_obj.owner != request.user and not getattr(request.user, "is_admin", False):
+            return Response({"error": "Permission denied"}, status=403)
+
+        try:
+            size = int(request.query_params.get("size", renditions.DEFAULT_THUMBNAIL_SIZE))
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid thumbnail size"}, status=400)
+        if size not in renditions.THUMBNAIL_SIZES:
+            return Response({"error": "Invalid thumbnail size"}, status=400)
+
+        # Миниатюра меняется вместе с оригиналом, размер входит в ETag
+        etag = f'{content_etag(file_obj)[:-1]}-{size}"'
+        last_modified = content_last_modified(file_obj)
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            thumbnail_path = renditions.get_thumbnail(file_obj, size)
+        except renditions.RenditionError as exc:
+            return Response({"error": str(exc)}, status=404)
+
+        stem = os.path.splitext(file_obj.name)[0] or "thumbnail"
+        return file_response(
+            request, thumbnail_path, f"{stem}-{size}.jpg",
+            content_type="image/jpeg", as_attachment=False, etag=etag, last_modified=last_modified,
+        )
+
+
+STATS_USER_SORT_FIELDS = {
+    "username": "username",
+    "file_count": "file_count",
+    "bytes_used": "bytes_used",
+    "last_activity": "files_changed_at",
+}
+STATS_USERS_PAGE_SIZE = 100
+STATS_USERS_MAX_PAGE_SIZE = 1000
+
+
+class StorageStatsView(APIView):
+    """Статистика хранилища для администратора.
+
+    Пользователи — из поддерживаемых счётчиков (?sort=, limit, offset),
+    разбивки по расширениям и месяцам — из предрасчитанных таблиц.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_admin:
+            return Response({"error": "Permission denied"}, status=403)
+
+        sort = request.query_params.get("sort") or "-bytes_used"
+        field = STATS_USER_SORT_FIELDS.get(sort.lstrip("-"))
+        if field is None:
+            return Response({"error": "Invalid sort field"}, status=400)
+        try:
+            limit = int(request.query_params.get("limit") or STATS_USERS_PAGE_SIZE)
+            offset = int(request.query_params.get("offset") or 0)
+        except ValueError:
+            return Response({"error": "Invalid limit or offset"}, status=400)
+        if limit <= 0 or offset < 0:
+            return Response({"error": "Invalid limit or offset"}, status=400)
+        limit = min(limit, STATS_USERS_MAX_PAGE_SIZE)
+
+        refreshed_at = analytics.ensure_fresh()
+        order = F(field).desc(nulls_last=True) if sort.startswith("-") else F(field).asc(nulls_last=True)
+        users = (
+            User.objects.order_by(order, "id")
+            .values("id", "username", "full_name", "file_count", "bytes_used", "files_changed_at")
+            [offset:offset + limit]
+        )
+        totals = User.objects.aggregate(users=Count("id"), files=Sum("file_count"), bytes=Sum("bytes_used"))
+
+        return Response({
+            "totals": {
+                "users": totals["users"],
+                "files": totals["files"] or 0,
+                "bytes": totals["bytes"] or 0,
+            },
+            "users": [
+                {
+                    "id": row["id"],
+                    "username": row["username"],
+                    "full_name": row["full_name"],
+                    "file_count": row["file_count"],
+                    "total_bytes": row["bytes_used"],
+                    "last_activity": row["files_changed_at"],
+                }
+                for row in users
+            ],
+            "by_extension": list(
+                ExtensionStat.objects.order_by("-total_bytes").values("extension", "file_count", "total_bytes")
+            ),
+            "by_month": [
+                {"month": f"{row['month']:%Y-%m}", "file_count": row["file_count"], "total_bytes": row["total_bytes"]}
+                for row in MonthlyStat.objects.order_by("month").values("month", "file_count", "total_bytes")
+            ],
+            "refreshed_at": refreshed_at,
+        })
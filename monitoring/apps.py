@@ -0,0 +1,34 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def _query_wrappers():
+    """Постоянные обёртки SQL — только для включённых метрик.
+
+    Профилирование ставит свою обёртку на время профилируемого запроса.
+    """
+    from .metrics import count_query
+
+    return [count_query] if settings.METRICS_ENABLED else []
+
+
+def _install_query_wrappers(sender, connection, **kwargs):
+    # Сигнал приходит при каждом переподключении того же объекта соединения
+    for wrapper in _query_wrappers():
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+
+    def ready(self):
+        from .views import allowed_networks
+
+        # Ошибка в METRICS_ALLOWED_IPS — при запуске, а не на запросе /metrics
+        allowed_networks()
+        if not _query_wrappers():
+            return
+        connection_created.connect(_install_query_wrappers, dispatch_uid="monitoring.query_wrappers")
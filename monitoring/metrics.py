@@ -0,0 +1,356 @@
+"""Метрики приложения в формате Prometheus.
+
+Значения копятся в памяти процесса (словарь под одним замком — запись
+метрики не ходит ни в базу, ни на диск). Чтобы ``/metrics`` показывал сумму
+по всем воркерам gunicorn, каждый процесс раз в ``METRICS_FLUSH_INTERVAL``
+секунд сохраняет свой снимок в ``METRICS_DIR/<pid>.json``, а обработчик
+``/metrics`` складывает снимки всех процессов. Счётчики и гистограммы
+завершившихся воркеров переносятся в ``archive.json`` и продолжают
+учитываться, их gauge-значения отбрасываются.
+"""
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+try:
+    import fcntl  # type: ignore
+    _FCNTL_AVAILABLE = True
+except Exception:
+    fcntl = None  # type: ignore
+    _FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FILE = "archive.json"
+LOCK_FILE = ".lock"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_lock = threading.Lock()
+_registry = []
+_dirty = False
+_flusher = None
+
+# Счётчик SQL-запросов текущего запроса (см. count_query)
+_query_counter = ContextVar("monitoring_query_counter", default=None)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        global _dirty
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            _dirty = True
+        _ensure_flusher()
+
+
+class Gauge(Metric):
+    """Текущее значение; при сложении снимков учитываются только живые процессы."""
+
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        global _dirty
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            _dirty = True
+        _ensure_flusher()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        global _dirty
+        key = self._key(labels)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Счётчики по корзинам (последняя — +Inf), сумма и число наблюдений
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+            _dirty = True
+        _ensure_flusher()
+
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by URL name, method and status",
+    ("view", "method", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time until the view returned a response, by URL name",
+    ("view", "method"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL queries per request, by URL name",
+    ("view",), buckets=QUERY_BUCKETS,
+)
+STREAMS_IN_FLIGHT = Gauge(
+    "http_streaming_responses_in_flight", "Streaming responses still being sent, by URL name",
+    ("view",),
+)
+DOWNLOADED_BYTES = Counter(
+    "files_downloaded_bytes_total", "File bytes sent in streaming responses, by URL name",
+    ("view",),
+)
+UPLOADED_BYTES = Counter(
+    "files_uploaded_bytes_total", "File bytes received: form uploads and upload session chunks",
+    ("kind",),
+)
+UPLOAD_REJECTIONS = Counter(
+    "files_upload_rejections_total", "Rejected uploads by reason (size, extension, mime, quota, name, path)",
+    ("reason",),
+)
+
+
+def count_query(execute, sql, params, many, context):
+    """Обёртка выполнения SQL: считает запросы в счётчик текущего запроса."""
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def start_query_count():
+    """Начинает подсчёт SQL-запросов; вернёт токен и изменяемый счётчик [число]."""
+    counter = [0]
+    return _query_counter.set(counter), counter
+
+
+def stop_query_count(token):
+    _query_counter.reset(token)
+
+
+def _snapshot():
+    with _lock:
+        return [
+            [metric.name, list(key), _copy(value)]
+            for metric in _registry
+            for key, value in metric._values.items()
+        ]
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return [list(value[0]), value[1], value[2]]
+    return value
+
+
+def _metrics_dir():
+    return settings.METRICS_DIR
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def flush():
+    """Сохраняет снимок метрик процесса в METRICS_DIR (если он задан)."""
+    global _dirty
+    directory = _metrics_dir()
+    if not directory:
+        return
+    with _lock:
+        _dirty = False
+    try:
+        os.makedirs(directory, exist_ok=True)
+        _write_json(os.path.join(directory, f"{os.getpid()}.json"), {"pid": os.getpid(), "samples": _snapshot()})
+    except OSError:
+        logger.exception("Failed to write metrics snapshot")
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        if _dirty:
+            flush()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive() or not _metrics_dir():
+        return
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name="metrics-flusher", daemon=True)
+            _flusher.start()
+
+
+def _pid_alive(pid):
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(totals, samples, include_gauges=True):
+    kinds = {metric.name: metric.kind for metric in _registry}
+    for name, key, value in samples:
+        kind = kinds.get(name)
+        if kind is None or (kind == "gauge" and not include_gauges):
+            continue
+        sample_key = (name, tuple(key))
+        current = totals.get(sample_key)
+        if kind == "histogram":
+            if current is None or len(current[0]) != len(value[0]):
+                totals[sample_key] = _copy(value)
+            else:
+                current[0] = [a + b for a, b in zip(current[0], value[0])]
+                current[1] += value[1]
+                current[2] += value[2]
+        else:
+            totals[sample_key] = (current or 0) + value
+
+
+def _read_snapshots(directory):
+    snapshots = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".json") and entry.name != ARCHIVE_FILE:
+            data = _read_json(entry.path)
+            if data is not None:
+                snapshots.append((entry.path, data))
+    return snapshots
+
+
+def _collect_dir(directory):
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    totals = {}
+    _merge(totals, (_read_json(archive_path) or {}).get("samples", []), include_gauges=False)
+    live = []
+    dead = []
+    for path, data in _read_snapshots(directory):
+        if _pid_alive(data.get("pid", 0)):
+            live.append(data.get("samples", []))
+        else:
+            _merge(totals, data.get("samples", []), include_gauges=False)
+            dead.append(path)
+    if dead and _FCNTL_AVAILABLE:
+        # Под замком сбора: параллельный сбор не посчитает снимки дважды
+        _write_json(archive_path, {"samples": [[name, list(key), value] for (name, key), value in totals.items()]})
+        for path in dead:
+            os.remove(path)
+    for samples in live:
+        _merge(totals, samples)
+    return totals
+
+
+def collect():
+    """Значения метрик всех процессов: {(имя, значения меток): значение}."""
+    directory = _metrics_dir()
+    totals = {}
+    if not directory:
+        _merge(totals, _snapshot())
+        return totals
+
+    flush()
+    if not _FCNTL_AVAILABLE:
+        return _collect_dir(directory)
+    with open(os.path.join(directory, LOCK_FILE), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _collect_dir(directory)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def render():
+    """Текст в формате экспозиции Prometheus 0.0.4."""
+    totals = collect()
+    by_name = {}
+    for (name, key), value in sorted(totals.items()):
+        by_name.setdefault(name, []).append((key, value))
+
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in by_name.get(metric.name, []):
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_labels(metric.labelnames, key)} {_number(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket in zip(metric.buckets + (math.inf,), counts):
+                cumulative += bucket
+                le = _number(float(bound))
+                lines.append(f"{metric.name}_bucket{_labels(metric.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{metric.name}_sum{_labels(metric.labelnames, key)} {_number(float(total))}")
+            lines.append(f"{metric.name}_count{_labels(metric.labelnames, key)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+atexit.register(flush)
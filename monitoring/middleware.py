@@ -0,0 +1,206 @@
+"""Сбор метрик запросов и профилирование запросов по требованию."""
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Запросы, не сопоставленные ни с одним URL (404), — одной меткой
+UNMATCHED_VIEW = "unmatched"
+
+
+def view_label(request):
+    """Метка запроса: имя URL (file_list, file_download, ...) или шаблон пути."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return UNMATCHED_VIEW
+    return match.view_name or match.route or UNMATCHED_VIEW
+
+
+class MetricsMiddleware:
+    """Записывает метрики каждого запроса; работает и под WSGI, и под ASGI.
+
+    Время запроса — до возврата ответа представлением; отдача тела потокового
+    ответа учитывается отдельно (число активных ответов и отправленные байты).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, queries = metrics.start_query_count()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop_query_count(token)
+        return self._record(request, response, time.perf_counter() - started, queries[0])
+
+    async def __acall__(self, request):
+        token, queries = metrics.start_query_count()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop_query_count(token)
+        return self._record(request, response, time.perf_counter() - started, queries[0])
+
+    def _record(self, request, response, elapsed, query_count):
+        view = view_label(request)
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        metrics.REQUEST_QUERIES.observe(query_count, view=view)
+        if response.streaming:
+            _track_stream(response, view)
+        return response
+
+
+def _track_stream(response, view):
+    """Учитывает потоковый ответ как активный до его закрытия сервером."""
+    metrics.STREAMS_IN_FLIGHT.inc(view=view)
+    close = response.close
+    closed = False
+
+    def close_and_record():
+        nonlocal closed
+        try:
+            close()
+        finally:
+            if not closed:
+                closed = True
+                metrics.STREAMS_IN_FLIGHT.dec(view=view)
+
+    response.close = close_and_record
+
+    if getattr(response, "file_to_stream", None) is not None:
+        # FileResponse отдаётся через wsgi.file_wrapper (sendfile) мимо
+        # streaming_content — объём берётся из Content-Length
+        length = response.get("Content-Length")
+        if length and length.isdigit():
+            metrics.DOWNLOADED_BYTES.inc(int(length), view=view)
+    elif response.is_async:
+        response.streaming_content = _acount_bytes(response.streaming_content, view)
+    else:
+        response.streaming_content = _count_bytes(response.streaming_content, view)
+
+
+def _count_bytes(iterator, view):
+    sent = 0
+    try:
+        for chunk in iterator:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        metrics.DOWNLOADED_BYTES.inc(sent, view=view)
+
+
+async def _acount_bytes(iterator, view):
+    sent = 0
+    try:
+        async for chunk in iterator:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        metrics.DOWNLOADED_BYTES.inc(sent, view=view)
+
+
+def _is_admin_request(request):
+    """Запрос от администратора: заголовок Authorization проверяется классами DRF."""
+    for authenticator in (auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES):
+        try:
+            result = authenticator.authenticate(request)
+        except APIException:
+            return False
+        if result is not None:
+            return bool(getattr(result[0], "is_admin", False))
+    return False
+
+
+class ProfilingMiddleware:
+    """Профиль CPU и SQL для запроса администратора с ``X-Profile: 1`` или выборки трафика.
+
+    Без заголовка и при нулевой PROFILING_SAMPLE_RATE запрос проходит без
+    изменений; с PROFILING_ENABLED=False middleware не подключается вовсе.
+    Под ASGI профиль CPU покрывает только поток цикла событий, SQL — весь запрос.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _trigger(self, request):
+        if request.META.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+            return "header" if _is_admin_request(request) else None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        capture = profiling.Capture(trigger)
+        capture.wrap_queries()
+        capture.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            capture.stop()
+            capture.unwrap_queries()
+        return self._save(capture, request, response)
+
+    async def __acall__(self, request):
+        if PROFILE_HEADER in request.META:
+            trigger = await sync_to_async(self._trigger)(request)
+        else:
+            trigger = self._trigger(request)
+        if trigger is None:
+            return await self.get_response(request)
+        capture = profiling.Capture(trigger)
+        await sync_to_async(capture.wrap_queries)()
+        capture.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            capture.stop()
+            await sync_to_async(capture.unwrap_queries)()
+        return await sync_to_async(self._save)(capture, request, response)
+
+    def _save(self, capture, request, response):
+        try:
+            report_id = profiling.save_report(capture, request, response, view_label(request))
+        except OSError:
+            logger.exception("Failed to save profiling report")
+            return response
+        response[PROFILE_ID_HEADER] = report_id
+        logger.info("Profiled %s %s: report %s", request.method, request.path, report_id)
+        return response
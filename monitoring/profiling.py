@@ -0,0 +1,186 @@
+"""Профилирование отдельных запросов по требованию.
+
+Администратор включает профиль для своего запроса заголовком
+``X-Profile: 1``; кроме того, доля ``PROFILING_SAMPLE_RATE`` всех запросов
+профилируется выборочно. Для такого запроса пишутся профиль CPU (cProfile)
+и выполненные SQL-запросы с временем. Отчёты лежат в ``PROFILING_DIR`` —
+кольцевом буфере из не более ``PROFILING_MAX_REPORTS`` последних отчётов:
+``<id>.json`` (сводка, SQL и топ функций) и ``<id>.prof`` (данные для pstats
+или snakeviz).
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import connections
+
+# Сколько SQL-запросов и строк профиля сохраняется в отчёте
+MAX_QUERIES = 1000
+MAX_SQL_LENGTH = 2000
+TOP_FUNCTIONS = 50
+
+REPORT_ID_RE = re.compile(r"^[0-9]{20}-[0-9a-f]{8}$")
+
+# cProfile в Python 3.12+ не допускает двух активных профилей одновременно,
+# поэтому в процессе профилируется не больше одного запроса за раз
+_profile_lock = threading.Lock()
+
+
+class Capture:
+    """Профиль CPU и SQL одного запроса (профиль CPU — в потоке, где вызван start).
+
+    Обёртка SQL ставится на соединения только между wrap_queries и
+    unwrap_queries: запросы без профиля не проходят через неё вовсе.
+    """
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self.queries = []
+        self.profile = None
+        self._wrappers = None
+        self._started = None
+
+    def capture_query(self, execute, sql, params, many, context):
+        """Обёртка выполнения SQL: пишет запросы профилируемого запроса."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    "sql": sql[:MAX_SQL_LENGTH],
+                    "many": many,
+                    "time_ms": round((time.perf_counter() - started) * 1000, 3),
+                })
+
+    def wrap_queries(self):
+        """Ставит обёртку на соединения потока, где выполняется view.
+
+        Под ASGI вызывается через sync_to_async: у цикла событий свои объекты
+        соединений, запросы view через них не идут.
+        """
+        self._wrappers = ExitStack()
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(self.capture_query))
+
+    def unwrap_queries(self):
+        self._wrappers.close()
+
+    def start(self):
+        if _profile_lock.acquire(blocking=False):
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                # Профилировщик уже включён другим инструментом
+                self.profile = None
+                _profile_lock.release()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self._started
+        if self.profile is not None:
+            self.profile.disable()
+            _profile_lock.release()
+
+
+def new_report_id():
+    # Время в начале: имена сортируются от старых отчётов к новым
+    return f"{time.time_ns():020d}-{secrets.token_hex(4)}"
+
+
+def _report_path(report_id, extension):
+    return os.path.join(settings.PROFILING_DIR, f"{report_id}.{extension}")
+
+
+def save_report(capture, request, response, view):
+    """Сохраняет отчёт и удаляет самые старые сверх PROFILING_MAX_REPORTS. Возвращает id."""
+    report_id = new_report_id()
+    user = getattr(request, "user", None)
+    report = {
+        "id": report_id,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "trigger": capture.trigger,
+        "method": request.method,
+        "path": request.get_full_path(),
+        "view": view,
+        "user": user.username if user is not None and user.is_authenticated else None,
+        "status": response.status_code,
+        "duration_ms": round(capture.duration * 1000, 3),
+        "query_count": len(capture.queries),
+        "query_time_ms": round(sum(query["time_ms"] for query in capture.queries), 3),
+        "queries": capture.queries,
+        "profile": None,
+    }
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    if capture.profile is not None:
+        output = io.StringIO()
+        stats = pstats.Stats(capture.profile, stream=output)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+        report["profile"] = output.getvalue()
+        stats.dump_stats(_report_path(report_id, "prof"))
+    tmp_path = _report_path(report_id, "json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False)
+    os.replace(tmp_path, _report_path(report_id, "json"))
+    _prune()
+    return report_id
+
+
+def _report_ids():
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(name[:-5] for name in names if name.endswith(".json") and REPORT_ID_RE.match(name[:-5]))
+
+
+def _prune():
+    ids = _report_ids()
+    for report_id in ids[:max(0, len(ids) - settings.PROFILING_MAX_REPORTS)]:
+        for extension in ("json", "prof"):
+            try:
+                os.remove(_report_path(report_id, extension))
+            except FileNotFoundError:
+                # Отчёт уже удалил другой воркер
+                pass
+
+
+def list_reports():
+    """Сводки сохранённых отчётов, новые первыми (без SQL и профиля)."""
+    summaries = []
+    for report_id in reversed(_report_ids()):
+        report = load_report(report_id)
+        if report is None:
+            continue
+        report.pop("queries", None)
+        report.pop("profile", None)
+        summaries.append(report)
+    return summaries
+
+
+def load_report(report_id):
+    if not REPORT_ID_RE.match(report_id):
+        return None
+    try:
+        with open(_report_path(report_id, "json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def profile_path(report_id):
+    """Путь к данным cProfile отчёта или None."""
+    if not REPORT_ID_RE.match(report_id):
+        return None
+    path = _report_path(report_id, "prof")
+    return path if os.path.exists(path) else None
@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.authentication import VersionedRefreshToken
+from accounts.models import User
+
+from . import metrics, profiling
+from .apps import _query_wrappers
+from .views import allowed_networks
+
+# pid, которого заведомо нет: снимок завершившегося воркера
+DEAD_PID = 2 ** 22 + 17
+
+
+class MetricsAggregationTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="metrics_test_")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.counter = metrics.Counter("test_events_total", "Test events", ("kind",))
+        self.gauge = metrics.Gauge("test_in_flight", "Test gauge")
+        self.histogram = metrics.Histogram("test_seconds", "Test histogram", buckets=(0.1, 1))
+        for metric in (self.counter, self.gauge, self.histogram):
+            self.addCleanup(metrics._registry.remove, metric)
+
+    def write(self, pid, samples):
+        with open(os.path.join(self.directory, f"{pid}.json"), "w", encoding="utf-8") as f:
+            json.dump({"pid": pid, "samples": samples}, f)
+
+    def test_snapshots_of_all_workers_are_summed(self):
+        self.write(os.getppid(), [
+            ["test_events_total", ["a"], 3],
+            ["test_in_flight", [], 2],
+            ["test_seconds", [], [[1, 0, 0], 0.05, 1]],
+        ])
+        self.write(DEAD_PID, [
+            ["test_events_total", ["a"], 4],
+            ["test_in_flight", [], 5],
+            ["test_seconds", [], [[0, 1, 1], 2.5, 2]],
+        ])
+
+        totals = metrics._collect_dir(self.directory)
+        self.assertEqual(totals[("test_events_total", ("a",))], 7)
+        # gauge завершившегося процесса не учитывается
+        self.assertEqual(totals[("test_in_flight", ())], 2)
+        self.assertEqual(totals[("test_seconds", ())], [[1, 1, 1], 2.55, 3])
+
+        # Снимок завершившегося воркера перенесён в архив и не считается дважды
+        self.assertFalse(os.path.exists(os.path.join(self.directory, f"{DEAD_PID}.json")))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, metrics.ARCHIVE_FILE)))
+        totals = metrics._collect_dir(self.directory)
+        self.assertEqual(totals[("test_events_total", ("a",))], 7)
+
+    def test_unreadable_snapshot_is_skipped(self):
+        with open(os.path.join(self.directory, "123.json"), "w") as f:
+            f.write("{broken")
+        self.write(os.getppid(), [["test_events_total", ["b"], 1]])
+        self.assertEqual(metrics._collect_dir(self.directory), {("test_events_total", ("b",)): 1})
+
+    @override_settings(METRICS_DIR="")
+    def test_render(self):
+        self.counter.inc(kind='say "hi"\n')
+        self.histogram.observe(0.5)
+        self.histogram.observe(7)
+        lines = metrics.render().splitlines()
+
+        self.assertIn("# TYPE test_events_total counter", lines)
+        self.assertIn('test_events_total{kind="say \\"hi\\"\\n"} 1', lines)
+        start = lines.index("# TYPE test_seconds histogram")
+        self.assertEqual(lines[start + 1:start + 6], [
+            'test_seconds_bucket{le="0.1"} 0',
+            'test_seconds_bucket{le="1.0"} 1',
+            'test_seconds_bucket{le="+Inf"} 2',
+            "test_seconds_sum 7.5",
+            "test_seconds_count 2",
+        ])
+
+
+@override_settings(METRICS_DIR="")
+class MetricsEndpointTests(TestCase):
+    def test_closed_without_configuration(self):
+        with override_settings(METRICS_TOKEN="", METRICS_ALLOWED_IPS=""):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+    @override_settings(METRICS_TOKEN="secret", METRICS_ALLOWED_IPS="")
+    def test_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+
+    @override_settings(METRICS_TOKEN="", METRICS_ALLOWED_IPS="10.0.0.0/8, 127.0.0.1")
+    def test_allowed_networks(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.1.2.3").status_code, 200)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="192.168.0.1").status_code, 403)
+        response = self.client.get("/metrics")
+        self.assertIn(b"# TYPE http_requests_total counter", response.content)
+        # Запрос к /metrics учтён middleware
+        self.assertIn(
+            b'http_requests_total{view="metrics",method="GET",status="403"}',
+            self.client.get("/metrics").content,
+        )
+
+    def test_invalid_allowed_ips(self):
+        with override_settings(METRICS_ALLOWED_IPS="10.0.0.0/33"):
+            with self.assertRaises(ImproperlyConfigured):
+                allowed_networks()
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="profiles_test_")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        profiles = override_settings(PROFILING_DIR=self.directory, PROFILING_MAX_REPORTS=2, METRICS_DIR="")
+        profiles.enable()
+        self.addCleanup(profiles.disable)
+        self.admin = self.client_for("admin", is_admin=True)
+        self.user = self.client_for("alice")
+
+    def client_for(self, username, **fields):
+        user = User.objects.create_user(
+            username=username, password="Qwe123!", email=f"{username}@test.com", **fields
+        )
+        client = APIClient()
+        # Профиль включается по JWT из заголовка, а не по force_authenticate
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {VersionedRefreshToken.for_user(user).access_token}")
+        return client
+
+    def test_admin_request_is_profiled(self):
+        response = self.admin.get("/api/files/", HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        report_id = response["X-Profile-Id"]
+
+        report = self.admin.get(f"/api/monitoring/profiles/{report_id}/").data
+        self.assertEqual((report["trigger"], report["view"], report["user"]), ("header", "file_list", "admin"))
+        self.assertEqual(report["query_count"], len(report["queries"]))
+        self.assertTrue(any("files_file" in query["sql"] for query in report["queries"]))
+        self.assertIn("function calls", report["profile"])
+
+        response = self.admin.get(f"/api/monitoring/profiles/{report_id}/", {"kind": "prof"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Disposition"], f'attachment; filename="{report_id}.prof"')
+
+    def test_other_requests_are_not_profiled(self):
+        self.assertNotIn("X-Profile-Id", self.user.get("/api/files/", HTTP_X_PROFILE="1"))
+        self.assertNotIn("X-Profile-Id", self.admin.get("/api/files/"))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_query_wrapper_only_during_capture(self):
+        wrappers = list(connection.execute_wrappers)
+        capture = profiling.Capture("header")
+        capture.wrap_queries()
+        try:
+            self.assertIn(capture.capture_query, connection.execute_wrappers)
+            User.objects.count()
+        finally:
+            capture.unwrap_queries()
+        User.objects.count()
+        self.assertEqual(connection.execute_wrappers, wrappers)
+        self.assertEqual(len(capture.queries), 1)
+
+    async def test_async_request_queries_are_captured(self):
+        user = await User.objects.aget(username="admin")
+        response = await self.async_client.get("/api/files/", headers={
+            "X-Profile": "1",
+            "Authorization": f"Bearer {VersionedRefreshToken.for_user(user).access_token}",
+        })
+        report = profiling.load_report(response["X-Profile-Id"])
+        self.assertTrue(any("files_file" in query["sql"] for query in report["queries"]))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_requests(self):
+        # Доля выборки читается при создании middleware
+        response = APIClient().get("/api/")
+        self.assertEqual(profiling.load_report(response["X-Profile-Id"])["trigger"], "sample")
+
+    def test_reports_are_a_ring_buffer(self):
+        ids = [self.admin.get("/api/files/", HTTP_X_PROFILE="1")["X-Profile-Id"] for _ in range(3)]
+        listing = self.admin.get("/api/monitoring/profiles/").data["results"]
+        self.assertEqual([report["id"] for report in listing], ids[:0:-1])
+        self.assertNotIn("queries", listing[0])
+        self.assertEqual(self.admin.get(f"/api/monitoring/profiles/{ids[0]}/").status_code, 404)
+
+    def test_reports_are_admin_only(self):
+        report_id = self.admin.get("/api/files/", HTTP_X_PROFILE="1")["X-Profile-Id"]
+        self.assertEqual(self.user.get("/api/monitoring/profiles/").status_code, 403)
+        self.assertEqual(self.user.get(f"/api/monitoring/profiles/{report_id}/").status_code, 403)
+        self.assertEqual(self.admin.get("/api/monitoring/profiles/../../etc/").status_code, 404)
+
+
+class QueryWrapperTests(SimpleTestCase):
+    def test_only_enabled_wrappers_are_installed(self):
+        with override_settings(METRICS_ENABLED=True):
+            self.assertEqual(_query_wrappers(), [metrics.count_query])
+        # Профилирование не ставит постоянной обёртки
+        with override_settings(METRICS_ENABLED=False, PROFILING_ENABLED=True):
+            self.assertEqual(_query_wrappers(), [])
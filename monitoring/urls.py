@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import ProfileDetailView, ProfileListView
+
+urlpatterns = [
+    path("profiles/", ProfileListView.as_view(), name="profile_list"),
+    path("profiles/<str:report_id>/", ProfileDetailView.as_view(), name="profile_detail"),
+]
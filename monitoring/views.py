@@ -0,0 +1,99 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import require_GET
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import metrics, profiling
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (строка METRICS_ALLOWED_IPS, разобранные сети) — разбор повторяется при её смене
+_networks_cache = (None, ())
+
+
+def allowed_networks():
+    """Сети из METRICS_ALLOWED_IPS ("10.0.0.0/8, 127.0.0.1")."""
+    global _networks_cache
+    spec = settings.METRICS_ALLOWED_IPS
+    if _networks_cache[0] != spec:
+        try:
+            networks = tuple(
+                ipaddress.ip_network(item.strip(), strict=False) for item in spec.split(",") if item.strip()
+            )
+        except ValueError as exc:
+            raise ImproperlyConfigured(f"Invalid METRICS_ALLOWED_IPS: {exc}") from exc
+        _networks_cache = (spec, networks)
+    return _networks_cache[1]
+
+
+def _token_matches(request):
+    if not settings.METRICS_TOKEN:
+        return False
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    return hmac.compare_digest(request.META.get("HTTP_AUTHORIZATION", ""), expected)
+
+
+def _address_allowed(request):
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in network for network in allowed_networks())
+
+
+@require_GET
+def metrics_view(request):
+    """Метрики всех воркеров в формате Prometheus.
+
+    Доступ — с заголовком ``Authorization: Bearer <METRICS_TOKEN>`` или с
+    адресов из METRICS_ALLOWED_IPS; если не задано ни то, ни другое, закрыт.
+    """
+    if not (_token_matches(request) or _address_allowed(request)):
+        if settings.METRICS_TOKEN:
+            return HttpResponse("Unauthorized", status=401, content_type="text/plain")
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+class ProfileListView(APIView):
+    """Сохранённые отчёты профилирования, новые первыми (только для администратора)."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_admin:
+            return Response({"error": "Permission denied"}, status=403)
+        return Response({"results": profiling.list_reports()})
+
+
+class ProfileDetailView(APIView):
+    """Отчёт профилирования: JSON с SQL и топом функций, ?kind=prof — данные cProfile."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, report_id):
+        if not request.user.is_admin:
+            return Response({"error": "Permission denied"}, status=403)
+
+        if request.query_params.get("kind") == "prof":
+            path = profiling.profile_path(report_id)
+            if path is None:
+                return Response({"error": "Profile not found"}, status=404)
+            return FileResponse(
+                open(path, "rb"), as_attachment=True, filename=f"{report_id}.prof",
+                content_type="application/octet-stream",
+            )
+
+        report = profiling.load_report(report_id)
+        if report is None:
+            return Response({"error": "Profile not found"}, status=404)
+        response = Response(report)
+        response["Content-Disposition"] = content_disposition_header(True, f"{report_id}.json")
+        return response
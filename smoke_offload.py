@@ -0,0 +1,106 @@
+"""Проверка режима отдачи файлов через фронт-прокси без самого прокси.
+
+Скрипт поднимает приложение на тестовой базе (DB_ENGINE=sqlite — в памяти),
+загружает файл и проверяет заголовки X-Accel-Redirect / X-Sendfile у
+FileDownloadView, FileDownloadSharedView и FileContentView, а также отказ
+для чужого пользователя.
+
+    DB_ENGINE=sqlite python smoke_offload.py
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cloud_storage.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from accounts.models import User  # noqa: E402
+from files.models import File  # noqa: E402
+
+
+def client_for(username: str):
+    user = User.objects.create_user(username=username, email=f"{username}@example.com", password="secret123")
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def check(title: str, ok: bool, details="") -> bool:
+    print(f"{title}:", "OK" if ok else "FAIL", details)
+    return ok
+
+
+def run() -> int:
+    owner = client_for("offloadowner")
+    other = client_for("offloadother")
+
+    sc = owner.post(
+        "/api/files/upload/",
+        {"file": SimpleUploadedFile("movie.mp4", b"\x00\x00\x00\x18ftypmp42" + b"0" * 4096, "video/mp4")},
+        format="multipart",
+    )
+    if not check("upload", sc.status_code == 201, sc.status_code):
+        return 1
+    file_obj = File.objects.get(id=sc.json()["id"])
+    relative = file_obj.file.name.replace(os.sep, "/")
+    real_path = os.path.realpath(file_obj.file.path)
+
+    with override_settings(FILES_DOWNLOAD_OFFLOAD="x-accel", FILES_ACCEL_REDIRECT_PREFIX="/protected-media/"):
+        r = owner.get(f"/api/files/{file_obj.id}/download/")
+        if not check("x-accel download", r.status_code == 200 and r.get("X-Accel-Redirect") == f"/protected-media/{relative}",
+                     r.get("X-Accel-Redirect")):
+            return 2
+        if not check("x-accel no body", not r.streaming and r.content == b""):
+            return 3
+        if not check("x-accel disposition", r.get("Content-Disposition", "").startswith("attachment"), r.get("Content-Disposition")):
+            return 4
+
+        r = owner.get(f"/api/files/{file_obj.id}/content/")
+        if not check("x-accel content", r.get("X-Accel-Redirect") == f"/protected-media/{relative}"
+                     and r.get("Content-Type") == "video/mp4"
+                     and r.get("Content-Disposition", "").startswith("inline"), r.get("Content-Type")):
+            return 5
+
+        r = APIClient().get(f"/api/files/shared/{file_obj.share_token}/")
+        if not check("x-accel shared", r.get("X-Accel-Redirect") == f"/protected-media/{relative}", r.status_code):
+            return 6
+
+        r = other.get(f"/api/files/{file_obj.id}/download/")
+        if not check("x-accel other user", r.status_code == 403 and not r.has_header("X-Accel-Redirect"), r.status_code):
+            return 7
+
+    with override_settings(FILES_DOWNLOAD_OFFLOAD="x-sendfile"):
+        r = owner.get(f"/api/files/{file_obj.id}/download/")
+        if not check("x-sendfile download", r.get("X-Sendfile") == real_path, r.get("X-Sendfile")):
+            return 8
+
+    r = owner.get(f"/api/files/{file_obj.id}/download/")
+    if not check("no offload", r.streaming and not r.has_header("X-Accel-Redirect"), r.status_code):
+        return 9
+
+    print("SMOKE OFFLOAD: OK")
+    return 0
+
+
+def main() -> int:
+    setup_test_environment()
+    media_root = tempfile.mkdtemp(prefix="smoke_offload_")
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with override_settings(MEDIA_ROOT=media_root):
+            return run()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())